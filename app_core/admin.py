@@ -3,13 +3,22 @@ from django.utils import timezone
 import pytz
 from .models import *
 from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
 from django.utils.html import format_html
 import logging
 
 logger = logging.getLogger(__name__)
 
-from app_core.bot.services.admin_notification_service import send_mass_notification_sync
-from app_core.bot.services.admin_notification_service import send_custom_notification_sync
+from app_core.bot.services.job_service import (
+    enqueue_dead_letter_resend, enqueue_mass_notification, start_mass_notification
+)
+
+
+def job_queued_message(job):
+    url = reverse("admin:app_core_backgroundjob_change", args=[job.pk])
+    return format_html('Задача <a href="{}">#{}</a> поставлена в очередь', url, job.pk)
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -20,15 +29,15 @@ class UserAdmin(admin.ModelAdmin):
     actions = ['send_custom_notification']
 
     def send_custom_notification(self, request, queryset):
-        message_title = "Сообщение от организаторов"
-        message_text = "У нас для вас важную информацию! Следите за анонсами."
+        notification = MassNotification.objects.create(
+            title="Сообщение от организаторов",
+            message="У нас для вас важную информацию! Следите за анонсами.",
+            target_users='custom'
+        )
+        notification.custom_users.set(queryset)
         
-        try:
-            user_ids = [user.id for user in queryset]
-            success, failed, message = send_custom_notification_sync(user_ids, message_title, message_text)
-            self.message_user(request, f"Сообщение отправлено. Успешно: {success}, Ошибок: {failed}")
-        except Exception as e:
-            self.message_user(request, f"Ошибка при отправке: {str(e)}", level='error')
+        job = enqueue_mass_notification(notification)
+        self.message_user(request, job_queued_message(job))
     
     send_custom_notification.short_description = "Отправить сообщение выбранным пользователям"
 
@@ -55,7 +64,8 @@ class EventAdmin(admin.ModelAdmin):
         updated = queryset.update(
             notification_sent=False,
             notification_sent_week=False,
-            notification_sent_day=False
+            notification_sent_day=False,
+            updated_at=timezone.now()
         )
         self.message_user(request, f"Флаги уведомлений сброшены для {updated} мероприятий")
     reset_notification_flags.short_description = "Сбросить флаги уведомлений"
@@ -148,11 +158,14 @@ class MassNotificationAdmin(admin.ModelAdmin):
     list_display = ['title', 'target_users_display', 'status_display', 'sent_to_count', 'failed_count', 'sent_at', 'created_at']
     list_filter = ['status', 'target_users', 'created_at']
     readonly_fields = ['status', 'sent_to_count', 'failed_count', 'sent_at', 'created_at', 'stats_display']
-    actions = ['send_selected_notifications']
+    actions = ['send_selected_notifications', 'resume_selected_notifications']
     fieldsets = [
         ('Основная информация', {
             'fields': ['title', 'message', 'target_users', 'custom_users']
         }),
+        ('Вложение', {
+            'fields': ['attachment', 'attachment_type']
+        }),
         ('Статистика', {
             'fields': ['stats_display', 'status', 'sent_to_count', 'failed_count', 'sent_at', 'created_at'],
             'classes': ['collapse']
@@ -170,6 +183,7 @@ class MassNotificationAdmin(admin.ModelAdmin):
     def status_display(self, obj):
         status_colors = {
             'draft': 'gray',
+            'queued': 'blue',
             'sending': 'orange', 
             'sent': 'green',
             'failed': 'red'
@@ -183,30 +197,128 @@ class MassNotificationAdmin(admin.ModelAdmin):
     status_display.short_description = "Статус"
     
     def stats_display(self, obj):
-        if obj.sent_to_count > 0 or obj.failed_count > 0:
-            return f"Успешно: {obj.sent_to_count}, Ошибок: {obj.failed_count}"
+        pending = obj.deliveries.filter(status='pending').count()
+        if obj.sent_to_count > 0 or obj.failed_count > 0 or pending:
+            return f"Успешно: {obj.sent_to_count}, Ошибок: {obj.failed_count}, Ожидают: {pending}"
         return "Еще не отправлялась"
     stats_display.short_description = "Статистика отправки"
     
     def send_selected_notifications(self, request, queryset):
-        results = []
-        
         for notification in queryset:
-            if notification.status in ['sending', 'sent']:
-                results.append(f"Рассылка '{notification.title}' уже отправлена или отправляется")
+            if notification.status in ['queued', 'sending', 'sent']:
+                self.message_user(request, f"Рассылка '{notification.title}' уже отправлена или отправляется")
                 continue
             
-            success, failed, message = send_mass_notification_sync(notification)
-            results.append(f"'{notification.title}': {message}")
-        
-        for result in results:
-            self.message_user(request, result)
+            job, reason = start_mass_notification(notification)
+            if job is None:
+                self.message_user(request, f"Рассылка '{notification.title}': {reason}", level='warning')
+                continue
+            self.message_user(request, format_html("'{}': {}", notification.title, job_queued_message(job)))
     
     send_selected_notifications.short_description = "Отправить выбранные рассылки"
     
+    def resume_selected_notifications(self, request, queryset):
+        """Дослать прерванные рассылки тем, кто ещё не получил сообщение
+
+        Проваленным (failed) рассылкам повторяется отправка получателям с ошибками.
+        """
+        for notification in queryset:
+            if notification.status not in ['sending', 'failed']:
+                self.message_user(request, f"Рассылка '{notification.title}' не была прервана")
+                continue
+            
+            job, reason = start_mass_notification(notification)
+            if job is None:
+                self.message_user(request, f"Рассылка '{notification.title}': {reason}", level='warning')
+                continue
+            self.message_user(request, format_html("'{}': {}", notification.title, job_queued_message(job)))
+    
+    resume_selected_notifications.short_description = "Продолжить прерванные или повторить проваленные рассылки"
+    
     def get_queryset(self, request):
         return super().get_queryset(request).prefetch_related('custom_users')
 
+@admin.register(DeliveryHealth)
+class DeliveryHealthAdmin(admin.ModelAdmin):
+    list_display = ["user", "is_blocked", "consecutive_failures", "last_error_at"]
+    list_filter = ["is_blocked"]
+    list_editable = ["is_blocked"]
+    search_fields = ["user__first_name", "user__telegram_id"]
+    readonly_fields = ["last_error", "last_error_at"]
+    
+    def save_model(self, request, obj, form, change):
+        """Разблокированный пользователь начинает с чистого счётчика ошибок
+
+        Пользователь сохраняется заново, чтобы бот сбросил его из кэша
+        (в этом процессе - сигналом, в других - по updated_at).
+        """
+        if 'is_blocked' in form.changed_data and not obj.is_blocked:
+            obj.consecutive_failures = 0
+        super().save_model(request, obj, form, change)
+        if 'is_blocked' in form.changed_data:
+            obj.user.save(update_fields=['updated_at'])
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("user")
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "status", "sent_count", "failed_count", "queued_count", "eta_display", "created_at"]
+    list_filter = ["status", "kind", "created_at"]
+    readonly_fields = [
+        "kind", "payload", "status", "total_count", "sent_count", "failed_count",
+        "queued_count", "eta_display", "result", "worker", "created_at", "started_at", "finished_at"
+    ]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def queued_count(self, obj):
+        return obj.queued_count
+    queued_count.short_description = "Осталось"
+    
+    def eta_display(self, obj):
+        eta = obj.eta_seconds
+        if eta is None:
+            return "—"
+        minutes, seconds = divmod(int(eta), 60)
+        return f"{minutes} мин {seconds} с"
+    eta_display.short_description = "Осталось времени"
+    
+    def get_urls(self):
+        urls = [
+            path(
+                "<int:job_id>/progress/",
+                self.admin_site.admin_view(self.progress_view),
+                name="app_core_backgroundjob_progress",
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def progress_view(self, request, job_id):
+        """Текущие счётчики задачи для автообновления страницы"""
+        job = get_object_or_404(BackgroundJob, pk=job_id)
+        return JsonResponse({
+            "status": job.get_status_display(),
+            "total_count": job.total_count,
+            "sent_count": job.sent_count,
+            "failed_count": job.failed_count,
+            "queued_count": job.queued_count,
+            "eta_display": self.eta_display(job),
+            "result": job.result,
+            "is_active": job.is_active,
+        })
+
+@admin.register(NotificationDelivery)
+class NotificationDeliveryAdmin(admin.ModelAdmin):
+    list_display = ["notification", "user", "status", "attempts", "updated_at"]
+    list_filter = ["status", "notification"]
+    search_fields = ["user__telegram_id", "user__first_name", "notification__title"]
+    readonly_fields = ["notification", "user", "status", "attempts", "last_error", "updated_at"]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("notification", "user")
+
 @admin.register(NetworkingProfile)
 class NetworkingProfileAdmin(admin.ModelAdmin):
     list_display = [
@@ -340,4 +452,53 @@ class NetworkingInteractionAdmin(admin.ModelAdmin):
     mutual_info.short_description = "Информация о взаимности"
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related("viewer", "profile", "profile__user")
\ No newline at end of file
+        return super().get_queryset(request).select_related("viewer", "profile", "profile__user")
+@admin.register(LeaderLease)
+class LeaderLeaseAdmin(admin.ModelAdmin):
+    list_display = ["name", "holder", "expires_at", "updated_at"]
+    readonly_fields = ["name", "holder", "expires_at", "updated_at"]
+    
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(TelegramFile)
+class TelegramFileAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "media_type", "bot_id", "created_at"]
+    readonly_fields = ["bot_id", "sha256", "media_type", "file_id", "created_at"]
+    
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(DeadLetter)
+class DeadLetterAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "source", "status", "notification", "short_error", "created_at", "resent_at"]
+    list_filter = ["status", "source", "created_at"]
+    search_fields = ["chat_id", "text", "error"]
+    readonly_fields = ["chat_id", "text", "parse_mode", "source", "notification", "error", "status", "created_at", "resent_at"]
+    actions = ['resend_selected']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def short_error(self, obj):
+        return obj.error[:80]
+    short_error.short_description = "Ошибка"
+    
+    def resend_selected(self, request, queryset):
+        """Поставить выбранные сообщения в очередь на повторную отправку"""
+        if not queryset.filter(status='dead').exists():
+            self.message_user(request, "Среди выбранных нет недоставленных сообщений", level='warning')
+            return
+        job = enqueue_dead_letter_resend(queryset)
+        self.message_user(request, job_queued_message(job))
+    resend_selected.short_description = "Отправить повторно"
+
+@admin.register(FSMState)
+class FSMStateAdmin(admin.ModelAdmin):
+    list_display = ["key", "state", "updated_at"]
+    list_filter = ["state"]
+    search_fields = ["key"]
+    readonly_fields = ["key", "state", "data", "updated_at"]
+    
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,157 @@
+import asyncio
+import time
+import tracemalloc
+from datetime import timedelta
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from asgiref.sync import sync_to_async
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from app_core.bot.services.admin_notification_service import send_mass_notification
+from app_core.bot.services.notification_service import send_due_reminders
+from app_core.bot.services.telegram_client import create_bot
+from app_core.models import Event, MassNotification, User
+from .fake_bot_api import FakeBotAPIProcess
+
+BENCHMARK_TOKEN = "123456:benchmark"
+USERS_BATCH_SIZE = 5000
+WARMUP_CHAT_ID = 1
+
+
+class LatencyRecorder(BaseRequestMiddleware):
+    """Время HTTP-запросов к Bot API, без ожидания в очередях отправки"""
+
+    def __init__(self):
+        self.samples = []
+
+    async def __call__(self, make_request, bot, method):
+        started_at = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            self.samples.append(time.perf_counter() - started_at)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class BenchmarkResult:
+    def __init__(self, scenario, users, elapsed, sent, failed, latency, memory_peak, api_stats):
+        self.scenario = scenario
+        self.users = users
+        self.elapsed = elapsed
+        self.sent = sent
+        self.failed = failed
+        self.p50 = latency.percentile(50)
+        self.p99 = latency.percentile(99)
+        self.memory_peak = memory_peak
+        self.throttled = api_stats['throttled']
+        self.blocked = api_stats['blocked']
+
+    @property
+    def messages_per_second(self):
+        return (self.sent + self.failed) / self.elapsed if self.elapsed else 0.0
+
+    HEADER = (
+        f"{'сценарий':<10} {'польз.':>8} {'отпр.':>8} {'ошиб.':>7} {'время, с':>9} "
+        f"{'сообщ./с':>9} {'p50, мс':>8} {'p99, мс':>8} {'память, МБ':>11} {'429':>5} {'403':>6}"
+    )
+
+    def __str__(self):
+        return (
+            f"{self.scenario:<10} {self.users:>8} {self.sent:>8} {self.failed:>7} {self.elapsed:>9.2f} "
+            f"{self.messages_per_second:>9.1f} {self.p50 * 1000:>8.1f} {self.p99 * 1000:>8.1f} "
+            f"{self.memory_peak / 2 ** 20:>11.2f} {self.throttled:>5} {self.blocked:>6}"
+        )
+
+
+def create_audience(count: int):
+    """Синтетические подписчики с числовыми telegram_id"""
+    User.objects.all().delete()
+    for start in range(0, count, USERS_BATCH_SIZE):
+        User.objects.bulk_create([
+            User(telegram_id=str(10 ** 9 + i), first_name=f"Участник {i}", is_subscribed=True)
+            for i in range(start, min(start + USERS_BATCH_SIZE, count))
+        ])
+
+
+def prepare_mass_notification():
+    MassNotification.objects.all().delete()
+    return MassNotification.objects.create(
+        title="Нагрузочный тест", message="Проверка скорости рассылки", target_users='all'
+    )
+
+
+def prepare_reminder():
+    Event.objects.all().delete()
+    start_date = timezone.now() + timedelta(hours=12)
+    Event.objects.create(
+        title="Нагрузочный тест", description="Проверка скорости напоминаний",
+        start_date=start_date, end_date=start_date + timedelta(hours=3),
+        notification_sent_week=True,
+    )
+
+
+async def run_scenario(scenario: str, users: int, api: FakeBotAPIProcess) -> BenchmarkResult:
+    await sync_to_async(create_audience)(users)
+    if scenario == 'mass':
+        notification = await sync_to_async(prepare_mass_notification)()
+    else:
+        await sync_to_async(prepare_reminder)()
+
+    bot = create_bot(BENCHMARK_TOKEN, api_server=api.url)
+    latency = LatencyRecorder()
+    bot.session.middleware(latency)
+    # Первые запросы достраивают модели типов aiogram, в замер это не входит
+    await bot.get_me()
+    await bot.send_message(chat_id=WARMUP_CHAT_ID, text="warmup")
+    api_before = await api.stats(await bot.session.create_session())
+    latency.samples.clear()
+
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    try:
+        if scenario == 'mass':
+            sent, failed, _ = await send_mass_notification(bot, notification)
+        else:
+            sent = await send_due_reminders(bot)
+            failed = None
+        elapsed = time.perf_counter() - started_at
+        _, memory_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    try:
+        api_after = await api.stats(await bot.session.create_session())
+    finally:
+        await bot.session.close()
+    api_stats = {key: api_after[key] - api_before[key] for key in api_after}
+    if failed is None:
+        failed = api_stats['blocked']
+    return BenchmarkResult(scenario, users, elapsed, sent, failed, latency, memory_peak, api_stats)
+
+
+def run_benchmark(scenarios, audiences, api_options: dict, rate: float, concurrency: int, report=print):
+    """Прогнать сценарии на синтетических аудиториях и вывести результаты
+
+    Должен выполняться в отдельной (тестовой) базе данных: пользователи,
+    рассылки и мероприятия в ней удаляются.
+    """
+    report(BenchmarkResult.HEADER)
+    results = []
+    api = FakeBotAPIProcess(**api_options)
+    api.start()
+    try:
+        with override_settings(TELEGRAM_BROADCAST_RATE=rate, TELEGRAM_BROADCAST_CONCURRENCY=concurrency):
+            for users in audiences:
+                for scenario in scenarios:
+                    result = asyncio.run(run_scenario(scenario, users, api))
+                    report(str(result))
+                    results.append(result)
+    finally:
+        api.close()
+    return results
@@ -0,0 +1,151 @@
+import asyncio
+import itertools
+import multiprocessing
+import random
+import time
+import zlib
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    """Локальная замена Telegram Bot API для нагрузочных замеров
+
+    Отвечает на sendMessage, sendPhoto и sendDocument с задержкой latency
+    (плюс случайная добавка до jitter секунд), часть запросов отклоняет
+    ответом 429 retry_after, а часть получателей считает заблокировавшими
+    бота (403). Выбор заблокированных детерминирован по chat_id.
+    """
+
+    SEND_METHODS = {'sendmessage', 'sendphoto', 'senddocument'}
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, retry_after_ratio: float = 0.0,
+                 retry_after: int = 1, blocked_ratio: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after_ratio = retry_after_ratio
+        self.retry_after = retry_after
+        self.blocked_ratio = blocked_ratio
+        self._random = random.Random(seed)
+        self._message_ids = itertools.count(1)
+        self._runner = None
+        self.url = None
+        self.requests = 0
+        self.delivered = 0
+        self.throttled = 0
+        self.blocked = 0
+
+    def is_blocked(self, chat_id) -> bool:
+        return zlib.crc32(str(chat_id).encode()) % 10000 < self.blocked_ratio * 10000
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        app.router.add_get('/stats', self.handle_stats)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'delivered': self.delivered,
+            'throttled': self.throttled,
+            'blocked': self.blocked,
+        }
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        method = request.match_info['method'].lower()
+        data = await request.post()
+        await asyncio.sleep(self.latency + self._random.random() * self.jitter)
+
+        if method == 'getme':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'
+            }})
+        if method not in self.SEND_METHODS:
+            return web.json_response({'ok': True, 'result': True})
+
+        chat_id = data.get('chat_id')
+        if self.retry_after_ratio and self._random.random() < self.retry_after_ratio:
+            self.throttled += 1
+            return web.json_response({
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            }, status=429)
+        if self.is_blocked(chat_id):
+            self.blocked += 1
+            return web.json_response({
+                'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user',
+            }, status=403)
+
+        self.delivered += 1
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+        }
+        if method == 'sendmessage':
+            message['text'] = data.get('text', '')
+        else:
+            file_id = f"fake-{method}-file"
+            if method == 'sendphoto':
+                message['photo'] = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 1, 'height': 1}]
+            else:
+                message['document'] = {'file_id': file_id, 'file_unique_id': file_id}
+            message['caption'] = data.get('caption', '')
+        return web.json_response({'ok': True, 'result': message})
+
+
+def _serve(connection, options):
+    async def serve():
+        api = FakeBotAPI(**options)
+        connection.send(await api.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+class FakeBotAPIProcess:
+    """FakeBotAPI в отдельном процессе
+
+    Сервер не делит процессор и цикл событий с замеряемым кодом и не
+    попадает в замер памяти.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.url = None
+        self._process = None
+
+    def start(self) -> str:
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve, args=(child, self.options), daemon=True)
+        self._process.start()
+        self.url = parent.recv()
+        return self.url
+
+    async def stats(self, session) -> dict:
+        async with session.get(f"{self.url}/stats") as response:
+            return await response.json()
+
+    def close(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
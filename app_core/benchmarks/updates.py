@@ -0,0 +1,139 @@
+import asyncio
+import itertools
+import logging
+import time
+from datetime import timedelta
+
+import aiohttp
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from app_core.bot.sharding import ShardedDispatcher
+from app_core.models import Event
+from .broadcast import BENCHMARK_TOKEN, create_audience
+from .fake_bot_api import FakeBotAPIProcess
+
+FIRST_USER_ID = 10 ** 9
+# Кнопки, которые участники жмут в день митапа; каждая даёт ровно один sendMessage
+BUTTONS = ("Программа", "🟢 Сегодня и завтра", "📅 Митапы на неделю")
+STATS_POLL_INTERVAL = 0.05
+
+
+class UpdatesBenchmarkResult:
+    def __init__(self, workers, concurrency, updates, elapsed, baseline=None):
+        self.workers = workers
+        self.concurrency = concurrency
+        self.updates = updates
+        self.elapsed = elapsed
+        self.baseline = baseline
+
+    @property
+    def updates_per_second(self):
+        return self.updates / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def speedup(self):
+        return self.updates_per_second / self.baseline.updates_per_second if self.baseline else 1.0
+
+    HEADER = (
+        f"{'процессов':>9} {'обработчиков':>12} {'апдейтов':>9} {'время, с':>9} {'апд./с':>9} {'ускорение':>10}"
+    )
+
+    def __str__(self):
+        return (
+            f"{self.workers:>9} {self.concurrency:>12} {self.updates:>9} {self.elapsed:>9.2f} "
+            f"{self.updates_per_second:>9.1f} {self.speedup:>9.2f}x"
+        )
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"Участник {user_id}"},
+            'text': text,
+        },
+    }
+
+
+def prepare_program():
+    """Мероприятия на сегодня, завтра и неделю - чтобы обработчики программы ходили в базу"""
+    Event.objects.all().delete()
+    now = timezone.now()
+    for days in (0, 1, 3):
+        start_date = now + timedelta(days=days, hours=1)
+        Event.objects.create(
+            title=f"Нагрузочный тест +{days} д.", description="Проверка обработки апдейтов",
+            start_date=start_date, end_date=start_date + timedelta(hours=3),
+        )
+
+
+async def wait_delivered(api: FakeBotAPIProcess, session, target: int):
+    while (await api.stats(session))['delivered'] < target:
+        await asyncio.sleep(STATS_POLL_INTERVAL)
+
+
+async def run_workers(workers: int, concurrency: int, users: int, per_user: int, api: FakeBotAPIProcess,
+                      database_name: str, chat_rate: float) -> UpdatesBenchmarkResult:
+    sharded = ShardedDispatcher(
+        BENCHMARK_TOKEN, workers,
+        worker_settings={
+            'TELEGRAM_API_SERVER': api.url,
+            'TELEGRAM_CHAT_RATE': chat_rate,
+            'BOT_HANDLER_CONCURRENCY': concurrency,
+        },
+        database_name=database_name, scheduler=False, log_level=logging.ERROR,
+    )
+    update_ids = itertools.count(1)
+    await asyncio.get_running_loop().run_in_executor(None, sharded.start)
+    async with aiohttp.ClientSession() as session:
+        try:
+            # Первый апдейт в каждом процессе достраивает модели aiogram, в замер это не входит
+            delivered = (await api.stats(session))['delivered']
+            for shard in range(workers):
+                await sharded.put(make_update(next(update_ids), FIRST_USER_ID + shard, BUTTONS[0]))
+            delivered += workers
+            await wait_delivered(api, session, delivered)
+
+            # Апдейты участников идут вперемешку, как в день митапа: по кругу, per_user от каждого
+            started_at = time.perf_counter()
+            for round_index in range(per_user):
+                for user_index in range(users):
+                    text = BUTTONS[(user_index + round_index) % len(BUTTONS)]
+                    await sharded.put(make_update(next(update_ids), FIRST_USER_ID + user_index, text))
+            await wait_delivered(api, session, delivered + users * per_user)
+            elapsed = time.perf_counter() - started_at
+        finally:
+            await sharded.stop()
+    return UpdatesBenchmarkResult(workers, concurrency, users * per_user, elapsed)
+
+
+def run_benchmark(worker_counts, concurrency_levels, users: int, per_user: int, api_options: dict,
+                  database_name: str, rate: float, chat_rate: float, report=print):
+    """Прогнать одну и ту же нагрузку при разном числе процессов и одновременных обработчиков в процессе
+
+    Должен выполняться в отдельной (тестовой) базе данных, доступной всем
+    процессам: пользователи и мероприятия в ней удаляются.
+    """
+    create_audience(users)
+    prepare_program()
+    report(UpdatesBenchmarkResult.HEADER)
+    results = []
+    api = FakeBotAPIProcess(**api_options)
+    api.start()
+    try:
+        with override_settings(TELEGRAM_BROADCAST_RATE=rate):
+            for concurrency in concurrency_levels:
+                for workers in worker_counts:
+                    result = asyncio.run(
+                        run_workers(workers, concurrency, users, per_user, api, database_name, chat_rate)
+                    )
+                    result.baseline = results[0] if results else None
+                    report(str(result))
+                    results.append(result)
+    finally:
+        api.close()
+    return results
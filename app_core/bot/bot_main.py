@@ -9,19 +9,21 @@ logger = logging.getLogger(__name__)
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pythonmeetup_service.settings')
 django.setup()
 
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-
 async def setup_bot(token: str):
-    bot = Bot(token=token)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    from .services.telegram_client import get_bot
+    from .services.fsm_storage import create_fsm_storage
+    from .dispatcher import ConcurrentDispatcher
+    
+    bot = get_bot(token)
+    storage = create_fsm_storage()
+    dp = ConcurrentDispatcher(storage=storage)
     
     from .middlewares.django import DjangoORMMiddleware
     
     dp.update.outer_middleware(DjangoORMMiddleware())
-    dp.message.middleware(DjangoORMMiddleware())
-    dp.callback_query.middleware(DjangoORMMiddleware())
+    if hasattr(storage, 'flush'):
+        from .middlewares.fsm import FSMFlushMiddleware
+        dp.update.outer_middleware(FSMFlushMiddleware(storage))
     
     from .handlers import (
         start_router, 
@@ -45,24 +47,74 @@ async def setup_bot(token: str):
 
     return bot, dp
 
-async def start_bot_with_scheduler(token: str):
-    bot, dp = await setup_bot(token)
-    
+# Роль ведущего процесса бота: планировщик уведомлений и фоновые задачи
+LEADER_ROLE = 'notification_scheduler'
+
+def start_scheduler(bot):
+    """Запустить планировщик уведомлений и обработчик фоновых задач
+
+    Работают только в ведущем процессе, остальные ждут в резерве. Рассылки
+    из админки идут через тот же Bot, что и ответы пользователям, - под
+    общим лимитом отправки и с приоритетом ответов.
+    """
     from .services.scheduler import NotificationScheduler
+    from .services.job_service import JobWorker
+    from .services.leader_election import LeaderElection
     
     scheduler = NotificationScheduler(bot)
-    scheduler_task = asyncio.create_task(scheduler.start())
+    jobs = JobWorker(bot)
+    
+    async def on_elected():
+        await scheduler.start()
+        await jobs.start()
+    
+    async def on_demoted():
+        await asyncio.gather(scheduler.stop(), jobs.stop())
+    
+    election = LeaderElection(LEADER_ROLE)
+    return asyncio.create_task(election.run(on_elected, on_demoted))
+
+async def stop_scheduler(scheduler_task):
+    """Выйти из выборов ведущего; ведущий перед этим даёт начатым отправкам завершиться"""
+    if scheduler_task is None:
+        return
+    scheduler_task.cancel()
+    try:
+        await scheduler_task
+    except asyncio.CancelledError:
+        pass
+
+async def shutdown_bot(dp, scheduler_task):
+    """Остановить бота, когда апдейты уже не принимаются
+
+    Начатые обработчики апдейтов и отправки планировщика получают
+    BOT_SHUTDOWN_TIMEOUT секунд на завершение, прерванные рассылки
+    сохраняются для повторной отправки. Затем закрываются хранилище FSM,
+    сессия Telegram и пул БД.
+    """
+    from django.conf import settings
+    logger.info("🚦 Остановка бота: новые апдейты не принимаются, завершаем начатое")
+    await asyncio.gather(dp.drain(settings.BOT_SHUTDOWN_TIMEOUT), stop_scheduler(scheduler_task))
+    from .services.telegram_client import close_bot
+    from .services.db_pool import db_pool
+    await dp.storage.close()
+    await close_bot()
+    db_pool.shutdown()
+
+async def start_bot_with_scheduler(token: str):
+    bot, dp = await setup_bot(token)
+    scheduler_task = start_scheduler(bot)
     
     try:
         logger.info("Бот запущен с планировщиком уведомлений")
-        await dp.start_polling(bot)
+        # Long polling не работает, пока у бота установлен webhook
+        await bot.delete_webhook()
+        # Сессию закрывает shutdown_bot, когда начатые обработчики и рассылки завершатся
+        await dp.start_polling(bot, close_bot_session=False)
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
     finally:
-        await scheduler.stop()
-        if not scheduler_task.done():
-            scheduler_task.cancel()
-        await bot.session.close()
+        await shutdown_bot(dp, scheduler_task)
         logger.info("Бот остановлен")
 
 def run(token: str):
@@ -0,0 +1,128 @@
+import asyncio
+import contextlib
+import functools
+import logging
+
+from aiogram import Bot, Dispatcher, methods
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.methods.base import Response, TelegramMethod
+from aiogram.types import Update
+from django.conf import settings
+
+from .services.drain import drain_tasks
+
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def build_response_models():
+    """Заранее построить модели ответов Bot API (Response[...]) для всех методов
+
+    aiogram строит модель ответа при первом вызове метода, и pydantic
+    добавляет её в общий кэш в contextvar. sync_to_async в это же время
+    сравнивает значения contextvars в потоке ORM и может упасть с
+    «dictionary changed size during iteration», если обработчики работают
+    параллельно. Построенные при запуске модели в кэш больше не добавляются.
+    """
+    for name in methods.__all__:
+        method = getattr(methods, name)
+        if isinstance(method, type) and issubclass(method, TelegramMethod) and method is not TelegramMethod:
+            Response[method.__returning__]
+
+
+class ChatLocks:
+    """Блокировки по чатам со счётчиком ожидающих
+
+    Запись чата создаётся при первом апдейте и удаляется, как только его
+    никто не держит и не ждёт, поэтому таблица не растёт с числом
+    пользователей, писавших боту.
+    """
+
+    def __init__(self):
+        self._locks: dict[int, list] = {}
+
+    @contextlib.asynccontextmanager
+    async def hold(self, chat_id: int):
+        entry = self._locks.get(chat_id)
+        if entry is None:
+            entry = self._locks[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[chat_id]
+
+    def __len__(self):
+        return len(self._locks)
+
+
+class ConcurrentDispatcher(Dispatcher):
+    """Диспетчер, обрабатывающий апдейты разных чатов одновременно
+
+    Апдейты одного чата обрабатываются строго по очереди (блокировка чата
+    берётся до чтения состояния FSM), апдейты разных чатов - параллельно,
+    но не более concurrency обработчиков одновременно. Медленный запрос к
+    базе или Telegram для одного пользователя не задерживает остальных.
+    """
+
+    def __init__(self, *args, concurrency: int | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        build_response_models()
+        self.concurrency = concurrency or settings.BOT_HANDLER_CONCURRENCY
+        self.chat_locks = ChatLocks()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # Задачи, обрабатывающие апдейты: их дожидается остановка (drain)
+        self._tasks: set[asyncio.Task] = set()
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs):
+        # Задачи long polling aiogram создаёт сам, поэтому задача учитывается здесь
+        task = asyncio.current_task()
+        tracked = task is not None and task not in self._tasks
+        if tracked:
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        try:
+            return await self._feed_in_chat(bot, update, **kwargs)
+        finally:
+            if tracked:
+                self._tasks.discard(task)
+
+    async def _feed_in_chat(self, bot: Bot, update: Update, **kwargs):
+        context = UserContextMiddleware.resolve_event_context(update)
+        chat_id = context.chat.id if context.chat else context.user.id if context.user else None
+        if chat_id is None:
+            async with self._semaphore:
+                return await super().feed_update(bot, update, **kwargs)
+        async with self.chat_locks.hold(chat_id):
+            async with self._semaphore:
+                return await super().feed_update(bot, update, **kwargs)
+
+    def feed_in_background(self, bot: Bot, update: Update) -> asyncio.Task:
+        """Обработать апдейт в фоновой задаче; порядок внутри чата сохраняется"""
+        task = asyncio.create_task(self._feed_logged(bot, update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _feed_logged(self, bot: Bot, update: Update):
+        try:
+            await self.feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"💥 Ошибка обработки апдейта {update.update_id}: {e}", exc_info=True)
+
+    @property
+    def pending(self) -> int:
+        """Апдейты в фоне: обрабатываются или ждут своей очереди"""
+        return len(self._tasks)
+
+    async def wait_below(self, limit: int):
+        """Подождать, пока в фоне останется меньше limit апдейтов"""
+        while len(self._tasks) >= limit:
+            await asyncio.wait(list(self._tasks), return_when=asyncio.FIRST_COMPLETED)
+
+    async def drain(self, timeout: float) -> int:
+        """Дождаться начатых апдейтов не дольше timeout секунд; вернуть число прерванных"""
+        return await drain_tasks(self._tasks, timeout, "Обработчики апдейтов")
@@ -9,11 +9,10 @@ from aiogram.types import (
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from django.conf import settings
-from asgiref.sync import sync_to_async
-from django.utils import timezone
 from decimal import Decimal
-from app_core.models import Event, User, Donation
+from app_core.models import User
 from ..keyboards.main import get_back_keyboard, get_guest_keyboard, get_donation_keyboard
+from ..services import repository
 
 router = Router()
 
@@ -21,63 +20,6 @@ class DonationAmount(StatesGroup):
     waiting_for_amount = State()
 
 
-@sync_to_async
-def _get_active_event():
-    now = timezone.now()
-    return (
-        Event.objects.filter(start_date__lte=now, end_date__gte=now)
-        .order_by("start_date")
-        .first()
-    )
-
-
-@sync_to_async
-def _get_relevant_event():
-    now = timezone.now()
-    # 1) Активное
-    active = (
-        Event.objects.filter(start_date__lte=now, end_date__gte=now)
-        .order_by("start_date")
-        .first()
-    )
-    if active:
-        return active
-
-    # 2) Последнее прошедшее
-    last_past = (
-        Event.objects.filter(end_date__lt=now)
-        .order_by("-end_date")
-        .first()
-    )
-    if last_past:
-        return last_past
-
-    # 3) Ближайшее будущее
-    next_future = (
-        Event.objects.filter(start_date__gt=now)
-        .order_by("start_date")
-        .first()
-    )
-    return next_future
-
-
-@sync_to_async
-def _ensure_user(tg_id: str, username: str | None, first_name: str | None):
-    user, _ = User.objects.get_or_create(
-        telegram_id=tg_id,
-        defaults={
-            "first_name": first_name or "",
-            "username": username or "",
-        },
-    )
-    return user
-
-
-@sync_to_async
-def _create_donation(event: Event, user: User, amount: Decimal):
-    return Donation.objects.create(event=event, from_user=user, amount=amount)
-
-
 @router.message(lambda message: message.text and "Донат" in message.text)
 async def show_donations(message: types.Message):
     await message.answer(
@@ -196,11 +138,9 @@ async def pre_checkout_query(pre_checkout_query: PreCheckoutQuery):
 
 
 @router.message(F.successful_payment)
-async def successful_payment(message: Message):
+async def successful_payment(message: Message, user: User):
     amount_rub = Decimal(message.successful_payment.total_amount) / Decimal(100)
 
-    event = await _get_relevant_event()
-    tg = message.from_user
-    user = await _ensure_user(str(tg.id), tg.username, tg.first_name)
-    await _create_donation(event, user, amount_rub)
+    event = await repository.get_relevant_event()
+    await repository.create_donation(event, user, amount_rub)
     return
\ No newline at end of file
@@ -1,11 +1,11 @@
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
-from asgiref.sync import sync_to_async
 import logging
-from django.db import models
+import random
 
-from app_core.models import User, NetworkingProfile, NetworkingInteraction
+from app_core.models import User, NetworkingProfile
+from ..services import repository
 from ..states.networking import NetworkingStates
 from ..keyboards.main import (
     get_networking_main_keyboard, 
@@ -17,41 +17,8 @@ from ..keyboards.main import (
 router = Router()
 logger = logging.getLogger(__name__)
 
-async def notify_waiting_users(new_profile, bot: Bot):
-    try:
-        existing_profiles = await sync_to_async(list)(
-            NetworkingProfile.objects.filter(is_visible=True)
-            .exclude(user=new_profile.user)
-            .select_related('user')
-        )
-        
-        if not existing_profiles:
-            return
-        
-        for profile in existing_profiles:
-            try:
-                await bot.send_message(
-                    chat_id=profile.user.telegram_id,
-                    text=f"🎉 Появился новый участник для знакомств!\n\n"
-                         f"👤 <b>{new_profile.name}</b>\n"
-                         f"🏢 <b>Компания:</b> {new_profile.company if new_profile.company else 'не указана'}\n"
-                         f"🎯 <b>Интересы:</b> {new_profile.interests[:100]}...\n\n"
-                         f"Хотите посмотреть анкету и начать общение?",
-                    reply_markup=ReplyKeyboardMarkup(
-                        keyboard=[
-                            [KeyboardButton(text="👀 Найти собеседников")],
-                            [KeyboardButton(text="Позже")]
-                        ],
-                        resize_keyboard=True
-                    ),
-                    parse_mode="HTML"
-                )
-                logger.info(f"✅ Уведомление отправлено пользователю {profile.user.telegram_id} о новой анкете")
-            except Exception as e:
-                logger.error(f"❌ Ошибка отправки уведомления пользователю {profile.user.telegram_id}: {e}")
-    except Exception as e:
-        logger.error(f"❌ Ошибка в notify_waiting_users: {e}")
-
+# Сколько анкет показывать за один просмотр
+BROWSE_BATCH = 10
 
 @router.message(lambda message: message.text and "Знакомства" in message.text)
 async def networking_main(message: types.Message, state: FSMContext):
@@ -69,22 +36,14 @@ async def networking_main(message: types.Message, state: FSMContext):
     )
 
 @router.message(lambda message: message.text and "📝 Заполнить анкету" in message.text)
-async def start_networking_profile(message: types.Message, state: FSMContext):
+async def start_networking_profile(message: types.Message, state: FSMContext, user: User):
     """Начало заполнения анкеты"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
     # Проверяем, есть ли уже анкета
-    existing_profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user).first()
-    )()
+    existing_profile = await repository.get_profile(user)
     
     if existing_profile:
         # Проверяем, есть ли другие анкеты
-        other_profiles_count = await sync_to_async(
-            NetworkingProfile.objects.filter(is_visible=True)
-            .exclude(user=user)
-            .count
-        )()
+        other_profiles_count = await repository.count_other_profiles(user)
         
         if other_profiles_count == 0 and existing_profile.is_visible:
             # У пользователя есть анкета, но других анкет пока нет
@@ -129,14 +88,10 @@ async def start_networking_profile(message: types.Message, state: FSMContext):
 
 
 @router.message(lambda message: message.text and "✏️ Редактировать анкету" in message.text)
-async def handle_edit_profile(message: types.Message, state: FSMContext):
+async def handle_edit_profile(message: types.Message, state: FSMContext, user: User):
     """Редактирование существующей анкеты"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
     # Получаем текущую анкету
-    profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user).first()
-    )()
+    profile = await repository.get_profile(user)
     
     if not profile:
         await message.answer("❌ У вас еще нет анкеты для редактирования")
@@ -159,22 +114,13 @@ async def handle_edit_profile(message: types.Message, state: FSMContext):
     )
 
 @router.message(lambda message: message.text and "❌ Удалить анкету" in message.text)
-async def handle_delete_profile(message: types.Message, state: FSMContext):
+async def handle_delete_profile(message: types.Message, state: FSMContext, user: User):
     """Удаление анкеты"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
-    profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user).first()
-    )()
+    profile = await repository.get_profile(user)
     
     if profile:
         # Удаляем все взаимодействия с этой анкетой
-        await sync_to_async(
-            NetworkingInteraction.objects.filter(
-                models.Q(profile=profile) | models.Q(viewer=user)
-            ).delete
-        )()
-        await sync_to_async(profile.delete)()
+        await repository.delete_profile(profile, user)
         await message.answer(
             "🗑️ <b>Анкета удалена</b>\n\n"
             "Ваша анкета больше не будет видна другим участникам.",
@@ -353,10 +299,8 @@ async def process_interests(message: types.Message, state: FSMContext):
     )
 
 @router.message(NetworkingStates.waiting_contact_consent)
-async def process_contact_consent(message: types.Message, state: FSMContext, bot: Bot):
+async def process_contact_consent(message: types.Message, state: FSMContext, user: User):
     """Обработка согласия на контакт"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
     if message.text == "✅ Да, делиться контактом":
         contact_consent = True
         consent_text = "✅ Вы согласились делиться контактом"
@@ -371,19 +315,19 @@ async def process_contact_consent(message: types.Message, state: FSMContext, bot
     editing_profile_id = data.get('editing_profile_id')
     
     if editing_profile_id:
-        profile = await sync_to_async(NetworkingProfile.objects.get)(id=editing_profile_id)
+        profile = await NetworkingProfile.objects.aget(id=editing_profile_id)
         profile.name = data['name']
         profile.username = data.get('username', '')
         profile.company = data.get('company', '')
         profile.job_title = data.get('job_title', '')
         profile.interests = data['interests']
         profile.contact_consent = contact_consent
-        await sync_to_async(profile.save)()
+        await profile.asave()
         
         success_message = "✅ <b>Анкета обновлена!</b>"
     else:
-        profile = await sync_to_async(NetworkingProfile.objects.create)(
-            user=user,
+        profile = await repository.create_profile(
+            user,
             name=data['name'],
             username=data.get('username', ''),
             company=data.get('company', ''),
@@ -393,11 +337,7 @@ async def process_contact_consent(message: types.Message, state: FSMContext, bot
         )
         success_message = "🎉 <b>Анкета создана!</b>"
         
-        other_profiles_count = await sync_to_async(
-            NetworkingProfile.objects.filter(is_visible=True)
-            .exclude(user=user)
-            .count
-        )()
+        other_profiles_count = await repository.count_other_profiles(user)
         
         if other_profiles_count == 0:
             success_message = "🎉 <b>Анкета создана! Вы первый!</b>"
@@ -413,8 +353,7 @@ async def process_contact_consent(message: types.Message, state: FSMContext, bot
                 parse_mode="HTML"
             )
             return
-        
-        await notify_waiting_users(profile, bot)
+        # Остальных участников оповестит периодическая сводка о новых анкетах
     
     await state.clear()
     
@@ -435,11 +374,7 @@ async def process_contact_consent(message: types.Message, state: FSMContext, bot
         f"<b>Контакты:</b> {consent_text}\n\n"
     )
     
-    available_count = await sync_to_async(
-        NetworkingProfile.objects.filter(is_visible=True)
-        .exclude(user=user)
-        .count
-    )()
+    available_count = await repository.count_other_profiles(user)
     
     if available_count > 0:
         summary += f"🎯 <b>Уже есть {available_count} анкет для просмотра!</b>\n"
@@ -458,14 +393,10 @@ async def process_contact_consent(message: types.Message, state: FSMContext, bot
 
 
 @router.message(lambda message: message.text and "👀 Найти собеседников" in message.text)
-async def start_browsing_profiles(message: types.Message, state: FSMContext):
+async def start_browsing_profiles(message: types.Message, state: FSMContext, user: User):
     """Начало просмотра анкет"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
     # Проверяем, есть ли анкета у пользователя
-    user_profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user, is_visible=True).first()
-    )()
+    user_profile = await repository.get_profile(user, visible_only=True)
     
     if not user_profile:
         await message.answer(
@@ -474,22 +405,10 @@ async def start_browsing_profiles(message: types.Message, state: FSMContext):
         )
         return
     
-    # Ищем анкеты для показа
-    shown_profiles = await sync_to_async(list)(
-        NetworkingInteraction.objects.filter(viewer=user).values_list('profile_id', flat=True)
-    )
+    # Показываем до BROWSE_BATCH непросмотренных анкет в случайном порядке
+    total = min(await repository.count_unseen_profiles(user), BROWSE_BATCH)
     
-    available_profiles = await sync_to_async(list)(
-        NetworkingProfile.objects.filter(
-            is_visible=True
-        ).exclude(
-            user=user
-        ).exclude(
-            id__in=shown_profiles
-        ).order_by('?')[:10]  # Случайные 10 анкет
-    )
-    
-    if not available_profiles:
+    if not total:
         await message.answer(
             "👀 <b>Пока нет новых анкет для просмотра</b>\n\n"
             "Все доступные анкеты уже просмотрены. "
@@ -500,20 +419,26 @@ async def start_browsing_profiles(message: types.Message, state: FSMContext):
         return
     
     await state.set_state(NetworkingStates.browsing_profiles)
+    # В состоянии только seed порядка и позиция, а не список анкет
     await state.update_data(
-        available_profiles=[p.id for p in available_profiles],
-        current_index=0
+        seed=random.randrange(1, repository.BROWSE_MODULUS),
+        cursor=0,
+        total=total
     )
     
-    await show_next_profile(message, state)
+    await show_next_profile(message, state, user)
 
-async def show_next_profile(message: types.Message, state: FSMContext):
+async def show_next_profile(message: types.Message, state: FSMContext, user: User):
     """Показать следующую анкету"""
     data = await state.get_data()
-    available_profiles = data.get('available_profiles', [])
-    current_index = data.get('current_index', 0)
+    cursor = data.get('cursor', 0)
+    total = data.get('total', 0)
+    
+    profile = None
+    if cursor < total:
+        profile = await repository.next_profile_to_browse(user, data['seed'])
     
-    if current_index >= len(available_profiles):
+    if profile is None:
         await message.answer(
             "🎉 <b>Вы просмотрели все доступные анкеты!</b>\n\n"
             "Возвращайтесь позже, чтобы увидеть новые анкеты.",
@@ -523,16 +448,9 @@ async def show_next_profile(message: types.Message, state: FSMContext):
         await state.clear()
         return
     
-    profile_id = available_profiles[current_index]
-    profile = await sync_to_async(NetworkingProfile.objects.select_related('user').get)(id=profile_id)
-    
     # Сохраняем просмотр
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    await sync_to_async(NetworkingInteraction.objects.get_or_create)(
-        viewer=user,
-        profile=profile,
-        defaults={'status': 'viewed'}
-    )
+    await repository.record_view(user, profile)
+    await state.update_data(cursor=cursor + 1, profile_id=profile.id)
     
     # Формируем текст анкеты
     profile_text = (
@@ -546,7 +464,7 @@ async def show_next_profile(message: types.Message, state: FSMContext):
     
     profile_text += (
         f"🎯 <b>Интересы:</b>\n{profile.interests}\n\n"
-        f"📊 Анкета {current_index + 1} из {len(available_profiles)}"
+        f"📊 Анкета {cursor + 1} из {total}"
     )
     
     await message.answer(
@@ -556,45 +474,22 @@ async def show_next_profile(message: types.Message, state: FSMContext):
     )
 
 @router.message(NetworkingStates.browsing_profiles, F.text == "✅ Знакомиться!")
-async def like_profile(message: types.Message, state: FSMContext, bot: Bot):
+async def like_profile(message: types.Message, state: FSMContext, bot: Bot, user: User):
     """Лайк анкеты с уведомлением обоих пользователей"""
     data = await state.get_data()
-    available_profiles = data.get('available_profiles', [])
-    current_index = data.get('current_index', 0)
+    profile_id = data.get('profile_id')
     
-    if current_index >= len(available_profiles):
+    if profile_id is None:
         await message.answer("❌ Больше нет анкет для просмотра")
         return
     
-    profile_id = available_profiles[current_index]
-    profile = await sync_to_async(NetworkingProfile.objects.select_related('user').get)(id=profile_id)
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
-    # Обновляем статус на "понравилось"
-    interaction, created = await sync_to_async(NetworkingInteraction.objects.get_or_create)(
-        viewer=user,
-        profile=profile,
-        defaults={'status': 'liked'}
-    )
-    
-    if not created:
-        interaction.status = 'liked'
-        await sync_to_async(interaction.save)()
-    
-    # Проверяем взаимный интерес
-    mutual_like = await sync_to_async(
-        NetworkingInteraction.objects.filter(
-            viewer=profile.user,
-            profile__user=user,
-            status='liked'
-        ).exists
-    )()
+    profile = await repository.get_profile_with_user(profile_id)
+    # Обновляем статус на "понравилось"; при взаимном интересе - сразу на "matched"
+    mutual_like = await repository.register_like(user, profile)
     
     if mutual_like:
         # Взаимный интерес - уведомляем обоих пользователей
-        user_profile = await sync_to_async(
-            NetworkingProfile.objects.get
-        )(user=user)
+        user_profile = await repository.get_profile(user)
         
         # Уведомление текущему пользователю
         if profile.contact_consent and profile.username:
@@ -661,16 +556,6 @@ async def like_profile(message: types.Message, state: FSMContext, bot: Bot):
             except Exception as e:
                 logger.error(f"Не удалось отправить уведомление пользователю {profile.user.telegram_id}: {e}")
         
-        # Обновляем статус на "matched" для обоих взаимодействий
-        await sync_to_async(NetworkingInteraction.objects.filter(
-            viewer=profile.user,
-            profile__user=user,
-            status='liked'
-        ).update)(status='matched')
-        
-        interaction.status = 'matched'
-        await sync_to_async(interaction.save)()
-        
     else:
         await message.answer(
             "✅ <b>Вы выразили интерес!</b>\n\n"
@@ -681,17 +566,12 @@ async def like_profile(message: types.Message, state: FSMContext, bot: Bot):
         )
     
     # Показываем следующую анкету
-    await state.update_data(current_index=current_index + 1)
-    await show_next_profile(message, state)
+    await show_next_profile(message, state, user)
 
 @router.message(NetworkingStates.browsing_profiles, F.text == "➡️ Следующий")
-async def skip_profile(message: types.Message, state: FSMContext):
+async def skip_profile(message: types.Message, state: FSMContext, user: User):
     """Пропустить анкету"""
-    data = await state.get_data()
-    current_index = data.get('current_index', 0)
-    
-    await state.update_data(current_index=current_index + 1)
-    await show_next_profile(message, state)
+    await show_next_profile(message, state, user)
 
 @router.message(NetworkingStates.browsing_profiles, F.text == "🏠 В главное меню")
 async def back_to_main_from_browsing(message: types.Message, state: FSMContext):
@@ -700,22 +580,18 @@ async def back_to_main_from_browsing(message: types.Message, state: FSMContext):
     await networking_main(message, state)
 
 @router.message(NetworkingStates.browsing_profiles, F.text == "📊 Моя анкета")
-async def show_my_profile_from_browsing(message: types.Message, state: FSMContext):
+async def show_my_profile_from_browsing(message: types.Message, state: FSMContext, user: User):
     """Показать свою анкету во время просмотра"""
-    await show_my_profile(message)
+    await show_my_profile(message, user)
     # Сохраняем состояние просмотра
     data = await state.get_data()
     await state.set_state(NetworkingStates.browsing_profiles)
     await state.update_data(data)
 
 @router.message(lambda message: message.text and "📊 Моя анкета" in message.text)
-async def show_my_profile(message: types.Message):
+async def show_my_profile(message: types.Message, user: User):
     """Показать свою анкету"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
-    profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user).first()
-    )()
+    profile = await repository.get_profile(user)
     
     if not profile:
         await message.answer(
@@ -725,23 +601,7 @@ async def show_my_profile(message: types.Message):
         return
     
     # Получаем статистику
-    likes_received = await sync_to_async(
-        NetworkingInteraction.objects.filter(
-            profile=profile, 
-            status='liked'
-        ).count
-    )()
-    
-    profiles_viewed = await sync_to_async(
-        NetworkingInteraction.objects.filter(viewer=user).count
-    )()
-    
-    mutual_matches = await sync_to_async(
-        NetworkingInteraction.objects.filter(
-            viewer=user,
-            status='matched'
-        ).count
-    )()
+    likes_received, profiles_viewed, mutual_matches = await repository.get_profile_stats(user, profile)
     
     profile_text = (
         "📊 <b>Ваша анкета для знакомств</b>\n\n"
@@ -779,13 +639,9 @@ async def show_my_profile(message: types.Message):
     )
 
 @router.message(lambda message: message.text and "👀 Кто вас лайкнул" in message.text)
-async def show_likes_received(message: types.Message):
+async def show_likes_received(message: types.Message, user: User):
     """Показать пользователей, которые лайкнули анкету"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
-    profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user).first()
-    )()
+    profile = await repository.get_profile(user)
     
     if not profile:
         await message.answer(
@@ -795,13 +651,7 @@ async def show_likes_received(message: types.Message):
         return
     
     # Получаем лайки к нашей анкете
-    likes = await sync_to_async(list)(
-        NetworkingInteraction.objects.filter(
-            profile=profile,
-            status='liked'
-        ).select_related('viewer', 'viewer__networking_profile')
-        .order_by('-created_at')
-    )
+    likes = await repository.get_likes_received(profile)
     
     if not likes:
         await message.answer(
@@ -835,18 +685,10 @@ async def show_likes_received(message: types.Message):
     )
 
 @router.message(lambda message: message.text and "🤝 Ваши мэтчи" in message.text)
-async def show_mutual_matches(message: types.Message):
+async def show_mutual_matches(message: types.Message, user: User):
     """Показать взаимные мэтчи"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
     # Находим взаимные мэтчи
-    mutual_matches = await sync_to_async(list)(
-        NetworkingInteraction.objects.filter(
-            viewer=user,
-            status='matched'
-        ).select_related('profile')
-        .order_by('-created_at')
-    )
+    mutual_matches = await repository.get_matches(user)
     
     if not mutual_matches:
         await message.answer(
@@ -890,13 +732,9 @@ async def show_mutual_matches(message: types.Message):
     )
 
 @router.message(lambda message: message.text and "👁️ Управление видимостью" in message.text)
-async def manage_visibility(message: types.Message):
+async def manage_visibility(message: types.Message, user: User):
     """Управление видимостью анкеты"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
-    profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user).first()
-    )()
+    profile = await repository.get_profile(user)
     
     if not profile:
         await message.answer(
@@ -906,12 +744,7 @@ async def manage_visibility(message: types.Message):
         return
     
     # Получаем статистику лайков
-    likes_count = await sync_to_async(
-        NetworkingInteraction.objects.filter(
-            profile=profile, 
-            status='liked'
-        ).count
-    )()
+    likes_count = await repository.count_likes_received(profile)
     
     visibility_status = "✅ Видна другим" if profile.is_visible else "❌ Скрыта от других"
     contact_status = "✅ Разрешаю показывать" if profile.contact_consent else "❌ Не разрешаю показывать"
@@ -937,20 +770,16 @@ async def manage_visibility(message: types.Message):
     )
 
 @router.message(lambda message: message.text in ["👁️ Скрыть анкету", "👁️ Показать анкету"])
-async def toggle_visibility(message: types.Message):
+async def toggle_visibility(message: types.Message, user: User):
     """Переключение видимости анкеты"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
-    profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user).first()
-    )()
+    profile = await repository.get_profile(user)
     
     if not profile:
         await message.answer("❌ У вас нет анкеты")
         return
     
     profile.is_visible = not profile.is_visible
-    await sync_to_async(profile.save)()
+    await profile.asave()
     
     status = "скрыта" if not profile.is_visible else "видна"
     await message.answer(
@@ -960,20 +789,16 @@ async def toggle_visibility(message: types.Message):
     )
 
 @router.message(lambda message: message.text in ["📞 Разрешить контакты", "📞 Запретить контакты"])
-async def toggle_contact_consent(message: types.Message):
+async def toggle_contact_consent(message: types.Message, user: User):
     """Переключение согласия на контакты"""
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
-    profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user).first()
-    )()
+    profile = await repository.get_profile(user)
     
     if not profile:
         await message.answer("❌ У вас нет анкеты")
         return
     
     profile.contact_consent = not profile.contact_consent
-    await sync_to_async(profile.save)()
+    await profile.asave()
     
     status = "разрешены" if profile.contact_consent else "запрещены"
     await message.answer(
@@ -984,13 +809,9 @@ async def toggle_contact_consent(message: types.Message):
     )
 
 @router.message(lambda message: message.text and "🔄 Обновить поиск" in message.text)
-async def refresh_search(message: types.Message, state: FSMContext):
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
+async def refresh_search(message: types.Message, state: FSMContext, user: User):
     # Получаем профиль пользователя
-    user_profile = await sync_to_async(
-        lambda: NetworkingProfile.objects.filter(user=user).first()
-    )()
+    user_profile = await repository.get_profile(user)
     
     if not user_profile:
         await message.answer(
@@ -1000,24 +821,10 @@ async def refresh_search(message: types.Message, state: FSMContext):
         return
     
     # Проверяем, есть ли новые анкеты с момента последнего поиска
-    viewed_profiles = await sync_to_async(list)(
-        NetworkingInteraction.objects.filter(viewer=user).values_list('profile_id', flat=True)
-    )
-    
-    new_profiles_count = await sync_to_async(
-        NetworkingProfile.objects.filter(
-            is_visible=True
-        ).exclude(
-            user=user
-        ).exclude(
-            id__in=viewed_profiles
-        ).count
-    )()
+    new_profiles_count = await repository.count_unseen_profiles(user)
     
     # Удаляем историю просмотров
-    await sync_to_async(
-        NetworkingInteraction.objects.filter(viewer=user).delete
-    )()
+    await repository.reset_views(user)
     
     if new_profiles_count > 0:
         message_text = (
@@ -1,9 +1,9 @@
 from aiogram import Router, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from asgiref.sync import sync_to_async
 from ..keyboards.main import get_back_keyboard
-from ...models import Talk, Question, User
+from ..services import repository
+from ...models import Talk, User
 
 router = Router()
 
@@ -14,8 +14,8 @@ class QuestionState(StatesGroup):
 
 
 @router.message(lambda message: message.text and "Вопрос" in message.text)
-async def ask_question(message: types.Message, state: FSMContext):
-    current_talk = await sync_to_async(Talk.objects.filter(is_active=True).first)()
+async def ask_question(message: types.Message, state: FSMContext, user: User):
+    current_talk = await repository.get_active_talk()
 
     if not current_talk:
         await message.answer(
@@ -24,8 +24,6 @@ async def ask_question(message: types.Message, state: FSMContext):
         )
         return
 
-    user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-    
     if user.username:
         await state.set_state(QuestionState.waiting_for_question)
         await state.update_data(talk_id=current_talk.id)
@@ -78,25 +76,20 @@ async def process_username(message: types.Message, state: FSMContext):
 
 
 @router.message(QuestionState.waiting_for_question)
-async def process_question(message: types.Message, state: FSMContext):
+async def process_question(message: types.Message, state: FSMContext, user: User):
     question_text = message.text
     user_data = await state.get_data()
     talk_id = user_data.get("talk_id")
     username = user_data.get("username")
 
     try:
-        talk = await sync_to_async(Talk.objects.get)(id=talk_id)
-        user = await sync_to_async(User.objects.get)(
-            telegram_id=str(message.from_user.id)
-        )
+        talk = await repository.get_talk(talk_id)
         
         if username and user.username != username:
             user.username = username
-            await sync_to_async(user.save)()
+            await user.asave(update_fields=['username', 'updated_at'])
 
-        await sync_to_async(Question.objects.create)(
-            talk=talk, from_user=user, text=question_text, is_answered=False
-        )
+        await repository.create_question(talk, user, question_text)
 
         await message.answer(
             "✅ Ваш вопрос отправлен спикеру!\n\n"
@@ -109,10 +102,5 @@ async def process_question(message: types.Message, state: FSMContext):
             "❌ Ошибка: активный доклад не найден",
             reply_markup=get_back_keyboard(),
         )
-    except User.DoesNotExist:
-        await message.answer(
-            "❌ Ошибка: пользователь не найден",
-            reply_markup=get_back_keyboard(),
-        )
     finally:
         await state.clear()
\ No newline at end of file
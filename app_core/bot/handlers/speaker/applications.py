@@ -1,8 +1,8 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
-from asgiref.sync import sync_to_async
 
-from app_core.models import SpeakerApplication, User
+from app_core.models import User
+from app_core.bot.services import repository
 from app_core.bot.keyboards.speaker import (
     get_speaker_application_main_keyboard,
     get_application_confirmation_keyboard,
@@ -97,24 +97,15 @@ async def process_duration(message: types.Message, state: FSMContext):
     await message.answer(summary, reply_markup=get_application_confirmation_keyboard(), parse_mode="HTML")
 
 @router.message(SpeakerApplicationStates.confirmation, F.text == "✅ Подтвердить заявку")
-async def confirm_application(message: types.Message, state: FSMContext):
+async def confirm_application(message: types.Message, state: FSMContext, user: User):
     print("DEBUG: Хэндлер подтверждения заявки ВЫЗВАН")
     
-    from django.core.exceptions import ObjectDoesNotExist
-    
-    try:
-        user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-        print(f"DEBUG: User from DB: {user}")
-    except ObjectDoesNotExist:
-        await message.answer("❌ Ошибка: пользователь не найден в базе")
-        return
-    
     data = await state.get_data()
     print(f"DEBUG: Данные для сохранения: {data}")
     
     try:
-        application = await sync_to_async(SpeakerApplication.objects.create)(
-            user=user,
+        application = await repository.create_speaker_application(
+            user,
             topic=data['topic'],
             description=data['description'],
             duration=data['duration']
@@ -158,21 +149,10 @@ async def cancel_confirmation(message: types.Message, state: FSMContext):
     )
 
 @router.message(F.text == "📋 Мои заявки")
-async def show_my_applications(message: types.Message):
+async def show_my_applications(message: types.Message, user: User):
     print("DEBUG: Хэндлер показа заявок ВЫЗВАН")
     
-    from django.core.exceptions import ObjectDoesNotExist
-    
-    try:
-        user = await sync_to_async(User.objects.get)(telegram_id=str(message.from_user.id))
-        print(f"DEBUG: User from DB: {user}")
-    except ObjectDoesNotExist:
-        await message.answer("❌ Ошибка: пользователь не найден в базе")
-        return
-    
-    applications = await sync_to_async(list)(
-        SpeakerApplication.objects.filter(user=user).order_by('-created_at')
-    )
+    applications = await repository.get_speaker_applications(user)
     
     if not applications:
         await message.answer(
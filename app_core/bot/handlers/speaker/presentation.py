@@ -1,11 +1,10 @@
 from datetime import timedelta
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
-from asgiref.sync import sync_to_async
 import pytz
 import logging
 
-from app_core.models import Talk, Event, User, Question
+from ...services import repository
 from ...states.speaker import SpeakerStates
 from ...keyboards.main import get_back_keyboard, get_main_keyboard
 from ...keyboards.speaker import get_speaker_keyboard
@@ -24,9 +23,7 @@ async def start_presentation(message: types.Message, state: FSMContext):
         now_moscow = now_utc.astimezone(moscow_tz)
         today = now_moscow.date()
         
-        today_events = await sync_to_async(list)(
-            Event.objects.filter(start_date__date=today)
-        )
+        today_events = await repository.get_events_on(today)
         
         if not today_events:
             await message.answer(
@@ -37,14 +34,7 @@ async def start_presentation(message: types.Message, state: FSMContext):
 
         current_event = today_events[0]
 
-        user_talks = await sync_to_async(
-            lambda: list(
-                Talk.objects.filter(
-                    event=current_event,
-                    speaker__telegram_id=str(user.id)
-                ).order_by('start_time')
-            )
-        )()
+        user_talks = await repository.get_speaker_talks(user.id, event=current_event)
 
         if not user_talks:
             await message.answer(
@@ -97,9 +87,7 @@ async def start_presentation(message: types.Message, state: FSMContext):
             talk_start_moscow = current_user_talk.start_time.astimezone(moscow_tz)
             talk_end_moscow = current_user_talk.end_time.astimezone(moscow_tz)
 
-        active_talk = await sync_to_async(
-            lambda: Talk.objects.filter(event=current_event, is_active=True).first()
-        )()
+        active_talk = await repository.get_active_talk(event=current_event)
         
         if active_talk and active_talk.id != current_user_talk.id:
             await message.answer(
@@ -111,19 +99,10 @@ async def start_presentation(message: types.Message, state: FSMContext):
             )
             return
 
-        await sync_to_async(
-            lambda: Talk.objects.filter(event=current_event, is_active=True).update(is_active=False)
-        )()
-
-        current_user_talk.is_active = True
-        await sync_to_async(current_user_talk.save)()
+        await repository.activate_talk(current_user_talk)
 
         await state.set_state(SpeakerStates.presentation_active)
-        await state.update_data(
-            active_talk_id=current_user_talk.id, 
-            event_id=current_event.id,
-            talk_title=current_user_talk.title
-        )
+        await state.update_data(active_talk_id=current_user_talk.id)
 
         await message.answer(
             f"🎤 Вы начали выступление!\n\n"
@@ -150,27 +129,14 @@ async def end_presentation(message: types.Message, state: FSMContext):
     user = message.from_user
     
     try:
-        active_talk = await sync_to_async(
-            lambda: Talk.objects.filter(
-                speaker__telegram_id=str(user.id),
-                is_active=True
-            ).first()
-        )()
+        active_talk = await repository.get_speaker_active_talk(user.id)
         
         if not active_talk:
             user_data = await state.get_data()
             active_talk_id = user_data.get('active_talk_id')
             
             if active_talk_id:
-                try:
-                    active_talk = await sync_to_async(
-                        lambda: Talk.objects.get(
-                            id=active_talk_id,
-                            speaker__telegram_id=str(user.id)
-                        )
-                    )()
-                except Talk.DoesNotExist:
-                    active_talk = None
+                active_talk = await repository.get_speaker_active_talk(user.id, talk_id=active_talk_id)
         
         if not active_talk:
             await message.answer(
@@ -180,16 +146,11 @@ async def end_presentation(message: types.Message, state: FSMContext):
             return
         
         active_talk.is_active = False
-        await sync_to_async(active_talk.save)()
+        await active_talk.asave()
         
         await state.clear()
         
-        questions_count = await sync_to_async(
-            lambda: Question.objects.filter(talk=active_talk).count()
-        )()
-        unanswered_count = await sync_to_async(
-            lambda: Question.objects.filter(talk=active_talk, is_answered=False).count()
-        )()
+        questions_count, unanswered_count = await repository.count_talk_questions(active_talk)
         
         success_message = (
             f"✅ Выступление завершено!\n\n"
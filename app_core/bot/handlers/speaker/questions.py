@@ -3,11 +3,11 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from asgiref.sync import sync_to_async
 import pytz
 from datetime import timedelta
 from django.utils import timezone
-from app_core.models import Question, Talk, User
+from app_core.models import Question
+from ...services import repository
 from ...keyboards.main import get_back_keyboard
 from ...keyboards.speaker import get_question_management_keyboard
 
@@ -27,11 +27,7 @@ async def show_speaker_questions(message: types.Message, state: FSMContext):
     try:
         moscow_tz = pytz.timezone('Europe/Moscow')
         
-        talks = await sync_to_async(list)(
-            Talk.objects.filter(speaker__telegram_id=str(user.id))
-            .order_by("-start_time")
-            .prefetch_related("questions")
-        )
+        talks = await repository.get_speaker_talks(user.id)
 
         if not talks:
             await message.answer(
@@ -46,11 +42,7 @@ async def show_speaker_questions(message: types.Message, state: FSMContext):
         has_questions = False
 
         for talk in talks:
-            questions = await sync_to_async(list)(
-                Question.objects.filter(talk=talk)
-                .select_related('from_user')
-                .order_by("-created_at")
-            )
+            questions = talk.question_list
 
             if questions:
                 has_questions = True
@@ -106,11 +98,7 @@ async def show_speaker_questions(message: types.Message, state: FSMContext):
         if has_questions:
             questions_text += f"\n📊 <b>Общая статистика:</b>\n"
             questions_text += f"• Всего вопросов: {total_questions}\n"
-            answered_count = await sync_to_async(
-                Question.objects.filter(
-                    talk__speaker__telegram_id=str(user.id), is_answered=True
-                ).count
-            )()
+            answered_count = await repository.count_answered_questions(user.id)
             questions_text += f"• Отвечено: {answered_count}\n"
             questions_text += f"• Осталось ответить: {total_questions - answered_count}"
 
@@ -143,11 +131,7 @@ async def handle_question_response(message: types.Message, state: FSMContext):
     try:
         moscow_tz = pytz.timezone('Europe/Moscow')
         
-        unanswered_questions = await sync_to_async(list)(
-            Question.objects.select_related("talk", "from_user")
-            .filter(talk__speaker__telegram_id=str(user.id), is_answered=False)
-            .order_by("created_at")[:10]
-        )
+        unanswered_questions = await repository.get_unanswered_questions(user.id)
 
         if not unanswered_questions:
             await message.answer(
@@ -206,7 +190,7 @@ async def select_question_for_answer(callback: types.CallbackQuery, state: FSMCo
     question_id = int(callback.data.split("_")[2])
     
     try:
-        question = await sync_to_async(Question.objects.select_related('from_user', 'talk').get)(id=question_id)
+        question = await repository.get_question(question_id)
         
         moscow_tz = pytz.timezone('Europe/Moscow')
         if question.created_at.tzinfo is None:
@@ -222,10 +206,7 @@ async def select_question_for_answer(callback: types.CallbackQuery, state: FSMCo
             user_info = f"👤 {question.from_user.first_name}"
         
         await state.set_state(AnswerStates.waiting_for_answer)
-        await state.update_data(
-            question_id=question.id,
-            user_id=question.from_user.telegram_id
-        )
+        await state.update_data(question_id=question.id)
         
         question_text = (
             f"❓ <b>Вопрос от участника:</b>\n\n"
@@ -274,12 +255,12 @@ async def process_answer(message: types.Message, state: FSMContext, bot: Bot):
     try:
         user_data = await state.get_data()
         question_id = user_data.get('question_id')
-        user_id = user_data.get('user_id')
         
-        question = await sync_to_async(Question.objects.select_related('from_user').get)(id=question_id)
+        question = await repository.get_question(question_id)
+        user_id = question.from_user.telegram_id
         
         question.is_answered = True
-        await sync_to_async(question.save)()
+        await question.asave(update_fields=['is_answered'])
         
         # Формируем информацию о пользователе для уведомления
         user_display = ""
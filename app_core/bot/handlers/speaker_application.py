@@ -1,9 +1,9 @@
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
-from asgiref.sync import sync_to_async
 import logging
 
-from app_core.models import SpeakerApplication, User
+from app_core.models import User
+from ..services import repository
 from ..states.speaker import SpeakerApplicationStates
 from ..keyboards.main import get_back_keyboard, get_main_keyboard
 from ..keyboards.speaker import get_speaker_application_main_keyboard, get_application_cancel_keyboard, get_application_confirmation_keyboard
@@ -112,8 +112,8 @@ async def process_confirmation(message: types.Message, state: FSMContext, user:
         user_data = await state.get_data()
         
         # Сохраняем заявку в базу
-        application = await sync_to_async(SpeakerApplication.objects.create)(
-            user=user,
+        application = await repository.create_speaker_application(
+            user,
             topic=user_data['topic'],
             description=user_data['description'],
             duration=user_data['duration'],
@@ -152,9 +152,7 @@ async def cancel_application(message: types.Message, state: FSMContext, user: Us
 @router.message(lambda message: message.text and "📋 Мои заявки" in message.text)
 async def show_my_applications(message: types.Message, user: User):
     """Показ заявок пользователя"""
-    applications = await sync_to_async(list)(
-        SpeakerApplication.objects.filter(user=user).order_by('-created_at')
-    )
+    applications = await repository.get_speaker_applications(user)
     
     if not applications:
         await message.answer(
@@ -1,7 +1,6 @@
 from aiogram import Router, types
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
-from asgiref.sync import sync_to_async
 from app_core.models import User
 from ..keyboards.main import get_main_keyboard
 
@@ -9,16 +8,7 @@ router = Router()
 
 @router.message(CommandStart())
 @router.message(lambda message: message.text and "Назад" in message.text)
-async def on_start(message: types.Message, state: FSMContext):
-    tg = message.from_user
-
-    user, created = await sync_to_async(User.objects.get_or_create)(
-        telegram_id=str(tg.id),
-        defaults={
-            "first_name": tg.first_name or "",
-        },
-    )
-
+async def on_start(message: types.Message, state: FSMContext, user: User):
     data = await state.get_data()
     is_listener_mode = data.get('is_listener_mode', False)
     user_role = user.role or 'guest'
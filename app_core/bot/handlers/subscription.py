@@ -1,7 +1,6 @@
 from aiogram import Router, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from asgiref.sync import sync_to_async
 from django.utils import timezone
 from ..keyboards.main import get_back_keyboard, get_main_keyboard
 from ..keyboards.subscription import (
@@ -9,48 +8,21 @@ from ..keyboards.subscription import (
     get_subscription_management_keyboard,
     get_simple_subscription_keyboard
 )
-from app_core.models import User, Event
+from ..services import repository
+from app_core.models import User
 
 router = Router()
 
 class SubscriptionStates(StatesGroup):
     waiting_confirmation = State()
 
-async def get_or_create_user(telegram_id, username, first_name, last_name):
-    try:
-        return await sync_to_async(User.objects.get)(telegram_id=str(telegram_id))
-    except User.DoesNotExist:
-        return await sync_to_async(User.objects.create)(
-            telegram_id=str(telegram_id),
-            username=username or "",
-            first_name=first_name or "",
-            last_name=last_name or "",
-            role="guest"
-        )
-
-@sync_to_async
-def get_upcoming_events():
-    now = timezone.now()
-    future_events = Event.objects.filter(
-        start_date__gte=now
-    ).order_by('start_date')[:3]
-    
-    return list(future_events)
-
 @router.message(lambda message: message.text and "Подписаться" in message.text)
-async def handle_subscription(message: types.Message, state: FSMContext):
-    
-    user = await get_or_create_user(
-        message.from_user.id,
-        message.from_user.username,
-        message.from_user.first_name,
-        message.from_user.last_name
-    )
+async def handle_subscription(message: types.Message, state: FSMContext, user: User):
     
     await message.bot.send_chat_action(chat_id=message.chat.id, action="typing")
     
     if user.is_subscribed:
-        upcoming_events = await get_upcoming_events()
+        upcoming_events = await repository.get_upcoming_events()
         events_info = ""
         
         if upcoming_events:
@@ -75,7 +47,7 @@ async def handle_subscription(message: types.Message, state: FSMContext):
         )
         return
     
-    upcoming_events = await get_upcoming_events()
+    upcoming_events = await repository.get_upcoming_events()
     events_preview = ""
     
     if upcoming_events:
@@ -97,26 +69,22 @@ async def handle_subscription(message: types.Message, state: FSMContext):
     await state.update_data(user_id=user.id)
 
 @router.message(SubscriptionStates.waiting_confirmation, lambda message: message.text and "Да, подписаться" in message.text)
-async def confirm_subscription(message: types.Message, state: FSMContext):
+async def confirm_subscription(message: types.Message, state: FSMContext, user: User):
     
     data = await state.get_data()
     user_id = data.get('user_id')
     
-    if user_id:
-        try:
-            user = await sync_to_async(User.objects.get)(id=user_id)
-            user.is_subscribed = True
-            await sync_to_async(user.save)()
-            
-            await message.answer(
-                "🎉 Отлично! Вы подписаны на уведомления!\n\n"
-                "📅 Мы напомним вам за неделю до каждого митапа\n"
-                "💡 Не пропустите интересные встречи с коллегами\n\n"
-                "Программу митапов можно посмотреть в разделе «Программа»",
-                reply_markup=get_subscription_management_keyboard(is_subscribed=True)
-            )
-        except User.DoesNotExist:
-            await message.answer("❌ Ошибка: пользователь не найден", reply_markup=get_simple_subscription_keyboard())
+    if user_id == user.id:
+        user.is_subscribed = True
+        await user.asave(update_fields=['is_subscribed', 'updated_at'])
+        
+        await message.answer(
+            "🎉 Отлично! Вы подписаны на уведомления!\n\n"
+            "📅 Мы напомним вам за неделю до каждого митапа\n"
+            "💡 Не пропустите интересные встречи с коллегами\n\n"
+            "Программу митапов можно посмотреть в разделе «Программа»",
+            reply_markup=get_subscription_management_keyboard(is_subscribed=True)
+        )
     else:
         await message.answer("❌ Ошибка: сессия устарела", reply_markup=get_simple_subscription_keyboard())
     
@@ -133,18 +101,11 @@ async def cancel_subscription(message: types.Message, state: FSMContext):
     await state.clear()
 
 @router.message(lambda message: message.text and "Отписаться от уведомлений" in message.text)
-async def unsubscribe(message: types.Message):
-    
-    user = await get_or_create_user(
-        message.from_user.id,
-        message.from_user.username,
-        message.from_user.first_name,
-        message.from_user.last_name
-    )
+async def unsubscribe(message: types.Message, user: User):
     
     if user.is_subscribed:
         user.is_subscribed = False
-        await sync_to_async(user.save)()
+        await user.asave(update_fields=['is_subscribed', 'updated_at'])
         
         await message.answer(
             "🔕 Вы отписались от уведомлений\n\n"
@@ -159,16 +120,9 @@ async def unsubscribe(message: types.Message):
         )
 
 @router.message(lambda message: message.text and "Назад" in message.text)
-async def back_to_main_menu(message: types.Message, state: FSMContext):
+async def back_to_main_menu(message: types.Message, state: FSMContext, user: User):
     await state.clear()
     
-    user = await get_or_create_user(
-        message.from_user.id,
-        message.from_user.username,
-        message.from_user.first_name,
-        message.from_user.last_name
-    )
-    
     await message.answer(
         "Главное меню:",
         reply_markup=get_main_keyboard(user.role)
@@ -1,47 +1,27 @@
 from aiogram import BaseMiddleware
 from typing import Callable, Dict, Any, Awaitable
-from aiogram.types import Message, CallbackQuery
-from asgiref.sync import sync_to_async
+from aiogram.types import TelegramObject
+
 
 class DjangoORMMiddleware(BaseMiddleware):
+    """Находит пользователя Django один раз на апдейт и передаёт его в data['user']
+
+    Регистрируется как outer-middleware на dp.update; отправителя апдейта
+    aiogram уже положил в data['event_from_user']. Обработчики получают
+    пользователя аргументом user вместо повторного запроса к базе.
+    """
+
     async def __call__(
         self,
-        handler: Callable,
-        event: Message | CallbackQuery,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        print(f"DEBUG MIDDLEWARE: Start processing event type: {type(event).__name__}")
-        
-        if not isinstance(event, (Message, CallbackQuery)):
+        from_user = data.get('event_from_user')
+        if from_user is None or from_user.is_bot:
             return await handler(event, data)
         
-        from_user = event.from_user
-        if not from_user:
-            return await handler(event, data)
-        
-        print(f"DEBUG MIDDLEWARE: Processing user ID: {from_user.id}")
-        
-        from app_core.models import User
-        from django.core.exceptions import ObjectDoesNotExist
-        
-        try:
-            user = await sync_to_async(User.objects.get)(
-                telegram_id=str(from_user.id)
-            )
-            print(f"DEBUG MIDDLEWARE: User found: {user.first_name} (ID: {user.telegram_id})")
-        except ObjectDoesNotExist:
-            user = await sync_to_async(User.objects.create)(
-                telegram_id=str(from_user.id),
-                username=from_user.username or "",
-                first_name=from_user.first_name or "",
-                last_name=from_user.last_name or "",
-                role="guest"
-            )
-            print(f"DEBUG MIDDLEWARE: User created: {user.first_name} (ID: {user.telegram_id})")
-        
-        data['user'] = user
-        print(f"DEBUG MIDDLEWARE: User added to data, keys in data: {list(data.keys())}")
+        from app_core.bot.services.user_cache import resolve_user
         
-        result = await handler(event, data)
-        print(f"DEBUG MIDDLEWARE: Handler completed successfully")
-        return result
\ No newline at end of file
+        data['user'] = await resolve_user(from_user)
+        return await handler(event, data)
@@ -0,0 +1,21 @@
+from aiogram import BaseMiddleware
+from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import TelegramObject
+
+
+class FSMFlushMiddleware(BaseMiddleware):
+    """Записывает изменения состояния FSM в хранилище в конце обработки апдейта"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            await self.storage.flush()
@@ -1,134 +1,238 @@
 from aiogram import Bot
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
-from django.conf import settings
-from app_core.models import User, MassNotification
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, F
+from app_core.models import DeadLetter, MassNotification, NotificationDelivery
 from django.utils import timezone
+from .broadcast_service import BroadcastEngine
+from .db_pool import db_pool
+from .dead_letters import LetterResend, claim_letters, requeue_notification_letters, settle_notification_letters
+from .media_service import get_notification_media
+from .telegram_client import get_bot, close_bot
+from .recipients import get_subscribed_users, exclude_unreachable, iter_values, aiter_values
 import logging
 import asyncio
 
 logger = logging.getLogger(__name__)
 
-async def send_message_to_user(bot: Bot, user_telegram_id: str, text: str):
-    try:
-        await bot.send_message(chat_id=user_telegram_id, text=text)
-        logger.info(f"✅ Сообщение успешно отправлено пользователю {user_telegram_id}")
-        return True
-    except TelegramForbiddenError as e:
-        logger.warning(f"❌ Пользователь {user_telegram_id} заблокировал бота: {e}")
-        return False
-    except TelegramBadRequest as e:
-        if "chat not found" in str(e).lower():
-            logger.warning(f"❌ Чат с пользователем {user_telegram_id} не найден (возможно, бот заблокирован)")
+DELIVERY_BATCH_SIZE = 500
+
+
+class DeliveryRecorder:
+    """Пакетно сохраняет результаты отправки в строки доставки рассылки"""
+
+    def __init__(self, notification, batch_size=DELIVERY_BATCH_SIZE):
+        self.notification = notification
+        self.batch_size = batch_size
+        self._sent = []
+        self._failed = []
+
+    async def __call__(self, chat_id, error):
+        if error is None:
+            self._sent.append(chat_id)
         else:
-            logger.error(f"❌ Ошибка запроса для пользователя {user_telegram_id}: {e}")
-        return False
-    except Exception as e:
-        logger.error(f"❌ Неизвестная ошибка для пользователя {user_telegram_id}: {e}")
-        return False
+            self._failed.append((chat_id, error))
+        if len(self._sent) + len(self._failed) >= self.batch_size:
+            await self.flush()
 
-def send_mass_notification_sync(notification):
+    async def flush(self):
+        sent, self._sent = self._sent, []
+        failed, self._failed = self._failed, []
+        if sent or failed:
+            await db_pool.run(self._save, sent, failed)
+
+    def _save(self, sent, failed):
+        deliveries = NotificationDelivery.objects.filter(notification=self.notification)
+        now = timezone.now()
+        with transaction.atomic():
+            if sent:
+                deliveries.filter(user__telegram_id__in=sent).update(
+                    status='sent', attempts=F('attempts') + 1, last_error='', updated_at=now
+                )
+            for chat_id, error in failed:
+                deliveries.filter(user__telegram_id=chat_id).update(
+                    status='failed', attempts=F('attempts') + 1, last_error=str(error)[:1000], updated_at=now
+                )
+
+
+def get_notification_recipients(notification):
+    if notification.target_users == 'all':
+        return get_subscribed_users()
+    return exclude_unreachable(notification.custom_users.all())
+
+
+def create_deliveries(notification):
+    """Заполнить outbox строками доставки для всех получателей рассылки
+
+    Получатели читаются и записываются пачками, без загрузки всей аудитории в память.
+    """
+    batch = []
+    for user_id in iter_values(get_notification_recipients(notification), 'id'):
+        batch.append(NotificationDelivery(notification=notification, user_id=user_id))
+        if len(batch) >= DELIVERY_BATCH_SIZE:
+            NotificationDelivery.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        NotificationDelivery.objects.bulk_create(batch, ignore_conflicts=True)
+    return notification.deliveries.count()
+
+
+def get_delivery_counts(notification):
+    counts = dict(
+        notification.deliveries.values_list('status').annotate(total=Count('id')).order_by()
+    )
+    return counts.get('sent', 0), counts.get('failed', 0), counts.get('pending', 0)
+
+
+async def send_mass_notification(bot: Bot, notification, progress=None):
+    """Отправить рассылку или продолжить прерванную с неотправленных получателей
+
+    progress - необязательный обработчик хода отправки (см. job_service.JobProgress).
+    """
     try:
-        if notification.target_users == 'all':
-            users = User.objects.filter(is_subscribed=True)
-            target_description = "всем подписанным пользователям"
-            logger.info(f"📊 Рассылка для всех подписанных. Найдено пользователей: {users.count()}")
+        if await sync_to_async(notification.deliveries.exists)():
+            logger.info(f"🔁 Продолжение рассылки '{notification.title}' с места остановки")
         else:
-            users = notification.custom_users.all()
-            target_description = f"выбранным пользователям ({users.count()} чел.)"
-            logger.info(f"📊 Рассылка для выбранных пользователей. Найдено: {users.count()}")
-        
-        if not users.exists():
-            notification.status = 'failed'
-            notification.save()
-            logger.warning("❌ Нет пользователей для рассылки")
-            return 0, 0, "Нет пользователей для рассылки"
-        
-        user_list = [f"{user.telegram_id} ({user.first_name})" for user in users]
-        logger.info(f"👥 Пользователи для рассылки: {user_list}")
+            total = await db_pool.run(create_deliveries, notification)
+            logger.info(f"📊 Рассылка '{notification.title}': получателей {total}")
+            if not total:
+                notification.status = 'failed'
+                await sync_to_async(notification.save)()
+                logger.warning("❌ Нет пользователей для рассылки")
+                return 0, 0, "Нет пользователей для рассылки"
         
         notification.status = 'sending'
-        notification.save()
+        await sync_to_async(notification.save)()
+        
+        pending = notification.deliveries.filter(status='pending')
+        pending_count = await sync_to_async(pending.count)()
+        logger.info(f"👥 Ожидают отправки: {pending_count}")
         
-        message_text = f"📢 {notification.title}\n\n{notification.message}"
+        message_text = notification.message_text
         logger.info(f"📝 Текст рассылки: {message_text[:100]}...")
+        media = await get_notification_media(bot, notification)
         
-        async def send_messages():
-            bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
-            success_count = 0
-            failed_count = 0
-            failed_users = []
-            
-            for user in users:
-                logger.info(f"🔄 Отправка пользователю {user.telegram_id} ({user.first_name})")
-                if await send_message_to_user(bot, user.telegram_id, message_text):
-                    success_count += 1
-                    logger.info(f"✅ Успешно отправлено пользователю {user.telegram_id}")
-                else:
-                    failed_count += 1
-                    failed_users.append(f"{user.telegram_id} ({user.first_name})")
-                    logger.warning(f"❌ Не удалось отправить пользователю {user.telegram_id}")
-            
-            await bot.session.close()
-            
-            logger.info(f"📊 Итоги рассылки: Успешно - {success_count}, Ошибок - {failed_count}")
-            if failed_users:
-                logger.warning(f"❌ Пользователи с ошибками: {failed_users}")
-            
-            return success_count, failed_count
+        recorder = DeliveryRecorder(notification)
+        if progress is not None:
+            await progress.start(pending_count)
         
-        success_count, failed_count = asyncio.run(send_messages())
+        async def on_result(chat_id, error):
+            await recorder(chat_id, error)
+            if progress is not None:
+                await progress(chat_id, error)
         
-        if success_count > 0:
+        try:
+            result = await BroadcastEngine(bot).broadcast(
+                aiter_values(pending, 'user__telegram_id'), message_text, on_result=on_result, media=media,
+                dead_letter={'source': 'mass_notification', 'notification': notification}
+            )
+        finally:
+            await recorder.flush()
+            if progress is not None:
+                await progress.flush()
+        
+        logger.info(f"📊 Итоги рассылки: {result}")
+        if result.failed_chat_ids:
+            logger.warning(f"❌ Пользователи с ошибками (первые {len(result.failed_chat_ids)}): {result.failed_chat_ids}")
+        
+        success_count, failed_count, pending_count = await sync_to_async(get_delivery_counts)(notification)
+        notification.sent_to_count = success_count
+        notification.failed_count = failed_count
+        if pending_count:
+            result_message = f"Рассылка прервана. Успешно: {success_count}, Ошибок: {failed_count}, Осталось: {pending_count}"
+            logger.warning(f"⚠️ {result_message}")
+        elif success_count > 0:
             notification.status = 'sent'
-            notification.sent_to_count = success_count
-            notification.failed_count = failed_count
             notification.sent_at = timezone.now()
-            result_message = f"Рассылка отправлена {target_description}. Успешно: {success_count}, Ошибок: {failed_count}"
+            result_message = f"Рассылка отправлена. Успешно: {success_count}, Ошибок: {failed_count}"
             logger.info(f"🎉 Рассылка завершена успешно: {result_message}")
         else:
             notification.status = 'failed'
             result_message = f"Рассылка не отправлена. Все попытки завершились ошибкой"
             logger.error(f"💥 Рассылка полностью провалилась: {result_message}")
         
-        notification.save()
+        await sync_to_async(notification.save)()
         return success_count, failed_count, result_message
         
     except Exception as e:
         logger.error(f"💥 Критическая ошибка при массовой рассылке: {e}", exc_info=True)
         notification.status = 'failed'
-        notification.save()
+        await sync_to_async(notification.save)()
         return 0, 0, f"Ошибка при рассылке: {str(e)}"
 
-def send_custom_notification_sync(user_ids, title, message_text):
+
+async def resend_dead_letters(bot: Bot, letter_ids, progress=None):
+    """Повторно отправить недоставленные сообщения
+
+    Сообщения рассылок из админки возвращаются в их outbox и отправляются
+    продолжением рассылки (с вложением, если оно есть), остальные
+    отправляются заново как текст. Отправленные отмечаются resent, не
+    доставленные снова остаются в «Не доставлено» с новой ошибкой. Каждое
+    сообщение забирается перед отправкой (LetterResend), поэтому прерванная
+    и возвращённая в очередь задача продолжает с неотправленных, не повторяя
+    отправленные.
+    """
+    letters = await sync_to_async(list)(
+        DeadLetter.objects.filter(id__in=letter_ids, status='queued').select_related('notification')
+    )
+    if not letters:
+        return "Нет сообщений для повторной отправки"
+
+    notification_letters = [letter for letter in letters if letter.notification_id]
+    text_letters = [letter for letter in letters if not letter.notification_id]
+    success_count = failed_count = 0
+
+    if progress is not None:
+        await progress.start(len(text_letters))
+    groups = {}
+    for letter in text_letters:
+        groups.setdefault(letter.parse_mode, []).append(letter)
+    for parse_mode, group in groups.items():
+        resend = LetterResend(group)
+
+        async def on_result(chat_id, error):
+            await resend(chat_id, error)
+            if progress is not None:
+                await progress(chat_id, error)
+
+        try:
+            result = await BroadcastEngine(bot).deliver(
+                resend.messages(),
+                on_result=on_result,
+                parse_mode=parse_mode or None,
+            )
+        except asyncio.CancelledError:
+            await resend.release()
+            raise
+        finally:
+            await resend.flush()
+        success_count += result.success_count
+        failed_count += result.failed_count
+
+    claimed_ids = set(await db_pool.run(claim_letters, [letter.id for letter in notification_letters]))
+    notification_letters = [letter for letter in notification_letters if letter.id in claimed_ids]
+    started_at = timezone.now()
+    notification_ids = await db_pool.run(requeue_notification_letters, notification_letters)
+    notifications = {letter.notification_id: letter.notification for letter in notification_letters}
     try:
-        users = User.objects.filter(id__in=user_ids)
-        
-        if not users.exists():
-            return 0, 0, "Нет пользователей для рассылки"
-        
-        full_message = f"📢 {title}\n\n{message_text}"
-        
-        async def send_custom_messages():
-            bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
-            success_count = 0
-            failed_count = 0
-            
-            for user in users:
-                logger.info(f"🔄 Кастомная рассылка пользователю {user.telegram_id} ({user.first_name})")
-                if await send_message_to_user(bot, user.telegram_id, full_message):
-                    success_count += 1
-                else:
-                    failed_count += 1
-            
-            await bot.session.close()
-            return success_count, failed_count
-        
-        success_count, failed_count = asyncio.run(send_custom_messages())
-        
-        result_message = f"Сообщение отправлено выбранным пользователям. Успешно: {success_count}, Ошибок: {failed_count}"
-        logger.info(f"Кастомная рассылка: {result_message}")
-        return success_count, failed_count, result_message
-        
-    except Exception as e:
-        logger.error(f"Ошибка при кастомной рассылке: {e}")
-        return 0, 0, f"Ошибка при рассылке: {str(e)}"
\ No newline at end of file
+        for notification_id in notification_ids:
+            success, failed, message = await send_mass_notification(bot, notifications[notification_id])
+            logger.info(f"🔁 Повтор рассылки '{notifications[notification_id].title}': {message}")
+    finally:
+        await db_pool.run(settle_notification_letters, notification_letters, started_at)
+
+    message = f"Повторно отправлено: {success_count}, ошибок: {failed_count}"
+    if notification_ids:
+        message += f", рассылок продолжено: {len(notification_ids)}"
+    return message
+
+
+def send_mass_notification_sync(notification):
+    """Синхронная обёртка для запуска рассылки вне цикла событий (консоль, скрипты)"""
+    async def run():
+        try:
+            return await send_mass_notification(get_bot(), notification)
+        finally:
+            await close_bot()
+    
+    return asyncio.run(run())
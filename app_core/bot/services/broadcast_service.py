@@ -0,0 +1,309 @@
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from django.conf import settings
+
+from .dead_letters import DeadLetterRecorder
+from .delivery_health import DeliveryHealthRecorder
+from .send_dispatcher import BULK, get_send_dispatcher, send_priority
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых отправку имеет смысл повторить
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError)
+
+
+class RateLimiter:
+    """Token bucket: не больше rate сообщений в секунду с запасом burst"""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """Дождаться свободного токена"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Остановить выдачу токенов для всех отправителей (flood wait)"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated_at = max(self._updated_at, self._paused_until)
+
+
+async def aiterate(items):
+    """Единый async-итератор поверх обычных и асинхронных последовательностей"""
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class ResumeCursor:
+    """Позиция рассылки по возрастанию pk получателей для продолжения после остановки
+
+    Генератор сообщений вызывает read(pk, chat_id) перед тем как отдать
+    получателя, on_result рассылки - done(chat_id) после попытки доставки.
+    after - pk, до которого включительно все получатели обработаны; skip -
+    получатели дальше after, которые уже обработаны, пока более ранние ещё
+    отправлялись. Оба значения ограничены окном отправки, а не размером аудитории.
+    """
+
+    def __init__(self, after: int = 0, skip=()):
+        self.after = after
+        self.skip = {str(chat_id) for chat_id in skip}
+        # chat_id -> [pk, обработан] в порядке чтения
+        self._window = OrderedDict()
+
+    def read(self, pk, chat_id):
+        self._window[str(chat_id)] = [pk, False]
+
+    def done(self, chat_id):
+        entry = self._window.get(str(chat_id))
+        if entry is None:
+            return
+        entry[1] = True
+        while self._window:
+            chat_id, (pk, processed) = next(iter(self._window.items()))
+            if not processed:
+                break
+            self._window.popitem(last=False)
+            self.after = pk
+
+    def state(self):
+        """Параметры для продолжения: {'after': pk, 'skip': [chat_id, ...]}"""
+        skip = [chat_id for chat_id, (pk, processed) in self._window.items() if processed]
+        return {'after': self.after, 'skip': skip}
+
+
+class DeliveryFailure:
+    """Причина неудачной доставки
+
+    kind: blocked - пользователь заблокировал бота, unreachable - чат не найден
+    или аккаунт удалён, transient - временная ошибка (сеть, 5xx, flood wait),
+    не исчезнувшая после повторов, error - прочие ошибки.
+    """
+
+    UNREACHABLE_MARKERS = ("chat not found", "user is deactivated", "bot was kicked")
+
+    def __init__(self, message: str, kind: str = "error"):
+        self.message = message
+        self.kind = kind
+
+    @property
+    def is_unreachable(self):
+        return self.kind in ("blocked", "unreachable")
+
+    @property
+    def is_transient(self):
+        return self.kind == "transient"
+
+    def __str__(self):
+        return self.message
+
+
+class BroadcastResult:
+    FAILED_SAMPLE_SIZE = 100
+
+    def __init__(self):
+        self.success_count = 0
+        self.failed_count = 0
+        # Только первые получатели с ошибками, чтобы память не росла с размером аудитории
+        self.failed_chat_ids = []
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def elapsed(self):
+        finished_at = self.finished_at or time.monotonic()
+        return finished_at - self.started_at
+
+    @property
+    def messages_per_second(self):
+        total = self.success_count + self.failed_count
+        return total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f"Успешно: {self.success_count}, Ошибок: {self.failed_count}, "
+            f"за {self.elapsed:.1f} с ({self.messages_per_second:.1f} сообщ./с)"
+        )
+
+
+class BroadcastEngine:
+    """Конкурентная отправка сообщений под общим ограничением скорости"""
+
+    def __init__(self, bot: Bot, rate: float | None = None, concurrency: int | None = None,
+                 limiter: RateLimiter | None = None):
+        self.bot = bot
+        # Бот из telegram_client сам ограничивает скорость в SendDispatcher
+        if limiter is None and get_send_dispatcher(bot) is None:
+            limiter = RateLimiter(rate or settings.TELEGRAM_BROADCAST_RATE)
+        self.limiter = limiter
+        self.concurrency = concurrency or settings.TELEGRAM_BROADCAST_CONCURRENCY
+        self.max_retries = settings.TELEGRAM_BROADCAST_MAX_RETRIES
+        self.retry_base_delay = settings.TELEGRAM_RETRY_BASE_DELAY
+        self.retry_max_delay = settings.TELEGRAM_RETRY_MAX_DELAY
+
+    async def send(self, chat_id, text: str, **kwargs) -> bool:
+        """Отправить одно сообщение, переждав flood wait при необходимости"""
+        return await self._send(chat_id, text, **kwargs) is None
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Экспоненциальная задержка перед повтором с полным джиттером"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    async def _send(self, chat_id, text: str, media=None, **kwargs) -> DeliveryFailure | None:
+        """Отправить сообщение; вернуть причину неудачи или None при успехе
+
+        media - необязательное вложение (media_service.MediaAttachment), text
+        тогда отправляется подписью к нему. Временные ошибки (сеть, ответы 5xx)
+        повторяются с экспоненциальной задержкой, flood wait - после паузы
+        лимитера; постоянные ошибки не повторяются.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            try:
+                if media is not None:
+                    await media.send(self.bot, chat_id, text, **kwargs)
+                else:
+                    await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                return None
+            except TelegramRetryAfter as e:
+                logger.warning(f"⏳ Flood wait {e.retry_after} с (пользователь {chat_id}, попытка {attempt + 1})")
+                if self.limiter is not None:
+                    self.limiter.pause(e.retry_after)
+                last_error = f"Flood wait {e.retry_after} с"
+            except TRANSIENT_ERRORS as e:
+                last_error = str(e) or type(e).__name__
+                if attempt < self.max_retries:
+                    delay = self.backoff_delay(attempt)
+                    logger.warning(
+                        f"🔁 Временная ошибка для пользователя {chat_id}: {last_error}. "
+                        f"Повтор через {delay:.1f} с (попытка {attempt + 1})"
+                    )
+                    await asyncio.sleep(delay)
+            except TelegramForbiddenError as e:
+                logger.warning(f"❌ Пользователь {chat_id} заблокировал бота: {e}")
+                return DeliveryFailure(str(e), kind="blocked")
+            except TelegramBadRequest as e:
+                if any(marker in str(e).lower() for marker in DeliveryFailure.UNREACHABLE_MARKERS):
+                    logger.warning(f"❌ Чат с пользователем {chat_id} не найден (возможно, бот заблокирован)")
+                    return DeliveryFailure(str(e), kind="unreachable")
+                logger.error(f"❌ Ошибка запроса для пользователя {chat_id}: {e}")
+                return DeliveryFailure(str(e))
+            except Exception as e:
+                logger.error(f"❌ Неизвестная ошибка для пользователя {chat_id}: {e}")
+                return DeliveryFailure(str(e) or type(e).__name__)
+
+        logger.error(f"❌ Пользователь {chat_id}: превышено число повторов ({last_error})")
+        return DeliveryFailure(f"Превышено число повторов: {last_error}", kind="transient")
+
+    async def deliver(self, messages, on_result=None, dead_letter=None, **kwargs) -> BroadcastResult:
+        """Отправить пары (chat_id, text) с ограниченной конкурентностью
+
+        messages может быть обычным или асинхронным итератором: очередь
+        ограничена, поэтому получатели читаются по мере отправки.
+        on_result(chat_id, error) вызывается после каждой попытки доставки,
+        error равен None при успехе или DeliveryFailure. Недоступные получатели
+        отмечаются в реестре DeliveryHealth и исключаются из следующих рассылок.
+        Отправка идёт в классе bulk и уступает ответам пользователям.
+        Сообщения, не доставленные из-за временных ошибок после всех повторов,
+        сохраняются в DeadLetter; dead_letter - дополнительные поля этих записей
+        (source, notification), None - не сохранять (отправитель повторит сам).
+
+        Если отправку отменили (остановка бота), обработчики прерываются, а
+        продолжение - забота вызывающего: outbox рассылки из админки или
+        ResumeCursor напоминаний. Если обработчик упал (например, на записи
+        в базу из on_result), отправка останавливается и ошибка пробрасывается.
+        """
+        result = BroadcastResult()
+        health = DeliveryHealthRecorder()
+        dead_letters = None
+        if dead_letter is not None:
+            dead_letters = DeadLetterRecorder(parse_mode=kwargs.get('parse_mode'), **dead_letter)
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        messages = aiterate(messages)
+
+        async def produce():
+            async for item in messages:
+                await queue.put(item)
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def worker():
+            send_priority.set(BULK)
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                chat_id, text = item
+                error = await self._send(chat_id, text, **kwargs)
+                if error is None:
+                    result.success_count += 1
+                else:
+                    result.failed_count += 1
+                    if len(result.failed_chat_ids) < result.FAILED_SAMPLE_SIZE:
+                        result.failed_chat_ids.append(chat_id)
+                await health(chat_id, error)
+                if dead_letters is not None and error is not None and error.is_transient:
+                    await dead_letters(chat_id, text, error)
+                if on_result is not None:
+                    await on_result(chat_id, error)
+
+        try:
+            # Упавший обработчик отменяет остальных и производителя, иначе тот ждал бы места в очереди вечно
+            async with asyncio.TaskGroup() as group:
+                group.create_task(produce())
+                for _ in range(self.concurrency):
+                    group.create_task(worker())
+        except ExceptionGroup as errors:
+            raise errors.exceptions[0]
+        finally:
+            await health.flush()
+            if dead_letters is not None:
+                await dead_letters.flush()
+
+        result.finished_at = time.monotonic()
+        logger.info(f"📊 Итоги отправки: {result}")
+        return result
+
+    async def broadcast(self, chat_ids, text: str, on_result=None, dead_letter=None, **kwargs) -> BroadcastResult:
+        """Отправить один и тот же текст всем chat_ids"""
+        messages = ((chat_id, text) async for chat_id in aiterate(chat_ids))
+        return await self.deliver(messages, on_result=on_result, dead_letter=dead_letter, **kwargs)
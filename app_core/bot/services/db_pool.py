@@ -0,0 +1,105 @@
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class DBPool:
+    """Ограниченный пул потоков для транзакций и пакетных операций с базой
+
+    sync_to_async по умолчанию (thread_sensitive=True) выполняет весь ORM
+    процесса в одном потоке. Задачи пула идут в max_workers потоках
+    параллельно; у каждого потока своё соединение Django, устаревшие
+    соединения закрываются до и после каждой задачи (close_old_connections,
+    срок жизни - CONN_MAX_AGE). Время ожидания свободного потока
+    учитывается в статистике.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or settings.DB_POOL_SIZE
+        self._executor = None
+        self._lock = threading.Lock()
+        self._logged_at = time.monotonic()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='db-pool')
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """Выполнить синхронную функцию с ORM в потоке пула"""
+        queued_at = time.monotonic()
+        with self._lock:
+            self.queued += 1
+
+        def task():
+            wait = time.monotonic() - queued_at
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            close_old_connections()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                close_old_connections()
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        try:
+            return await sync_to_async(task, thread_sensitive=False, executor=self._get_executor())()
+        finally:
+            self._log_stats()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self.queued,
+                'running': self.running,
+                'completed': self.completed,
+                'avg_wait': self.total_wait / self.completed if self.completed else 0.0,
+                'max_wait': self.max_wait,
+            }
+
+    def _log_stats(self):
+        now = time.monotonic()
+        if now - self._logged_at < settings.DB_POOL_STATS_INTERVAL:
+            return
+        self._logged_at = now
+        stats = self.stats()
+        logger.info(
+            f"🗄️ Пул БД ({self.max_workers} потоков): в очереди {stats['queued']}, "
+            f"выполняется {stats['running']}, выполнено {stats['completed']}, "
+            f"ожидание ср. {stats['avg_wait']:.3f} с / макс. {stats['max_wait']:.3f} с"
+        )
+
+    def shutdown(self):
+        """Дождаться начатых задач и остановить потоки"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+db_pool = DBPool()
+
+
+def in_db_pool(func):
+    """Декоратор: как sync_to_async, но функция выполняется в пуле БД"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await db_pool.run(func, *args, **kwargs)
+    return wrapper
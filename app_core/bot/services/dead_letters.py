@@ -0,0 +1,163 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from app_core.models import DeadLetter, NotificationDelivery
+from .db_pool import db_pool
+
+logger = logging.getLogger(__name__)
+
+RESEND_BATCH_SIZE = 100
+
+
+class DeadLetterRecorder:
+    """Пакетно сохраняет сообщения, не доставленные после всех повторов"""
+
+    def __init__(self, batch_size: int = 500, parse_mode: str | None = None, **fields):
+        self.batch_size = batch_size
+        self.parse_mode = parse_mode or ""
+        self.fields = fields
+        self._letters = []
+
+    async def __call__(self, chat_id, text, error):
+        self._letters.append(DeadLetter(
+            chat_id=str(chat_id), text=text, parse_mode=self.parse_mode, error=str(error)[:1000], **self.fields
+        ))
+        if len(self._letters) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        letters, self._letters = self._letters, []
+        if letters:
+            await db_pool.run(DeadLetter.objects.bulk_create, letters)
+            logger.warning(f"📭 Сохранено недоставленных сообщений: {len(letters)}")
+
+
+class LetterResend:
+    """Повторная отправка группы недоставленных сообщений через BroadcastEngine.deliver
+
+    messages() забирает сообщения пачками (статус sending) прямо перед
+    отправкой, поэтому задача, возвращённая в очередь после остановки, не
+    отправит их второй раз. Экземпляр передаётся как on_result и отмечает
+    результат каждой попытки: доставленные - resent, остальные возвращаются
+    в «Не доставлено» с новой ошибкой; release() после отмены возвращает в
+    очередь то, что не успело уйти в отправку.
+    """
+
+    def __init__(self, letters, batch_size: int = RESEND_BATCH_SIZE):
+        self.letters = letters
+        self.batch_size = batch_size
+        # Забранные сообщения, ещё не отданные в отправку
+        self._claimed = []
+        # chat_id -> сообщения, отданные в отправку и ждущие результата
+        self._sending = {}
+        self._results = []
+
+    async def messages(self):
+        for start in range(0, len(self.letters), self.batch_size):
+            batch = self.letters[start:start + self.batch_size]
+            claimed_ids = set(await db_pool.run(claim_letters, [letter.id for letter in batch]))
+            self._claimed = [letter for letter in batch if letter.id in claimed_ids]
+            while self._claimed:
+                letter = self._claimed.pop(0)
+                self._sending.setdefault(letter.chat_id, []).append(letter)
+                yield letter.chat_id, letter.text
+
+    async def __call__(self, chat_id, error):
+        letters = self._sending[chat_id]
+        self._results.append((letters.pop(0).id, error))
+        if not letters:
+            del self._sending[chat_id]
+        if len(self._results) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        results, self._results = self._results, []
+        if results:
+            await db_pool.run(settle_letters, results)
+
+    async def release(self):
+        unsent = [letter.id for letter in self._claimed]
+        interrupted = [letter.id for letters in self._sending.values() for letter in letters]
+        self._claimed, self._sending = [], {}
+        await db_pool.run(release_letters, unsent, interrupted)
+
+
+def claim_letters(letter_ids):
+    """Атомарно забрать сообщения из очереди на повтор (статус sending); вернуть их id"""
+    with transaction.atomic():
+        claimed = list(
+            DeadLetter.objects.select_for_update()
+            .filter(id__in=letter_ids, status='queued')
+            .values_list('id', flat=True)
+        )
+        DeadLetter.objects.filter(id__in=claimed).update(status='sending')
+    return claimed
+
+
+def settle_letters(results):
+    """Отметить итог повторной отправки: [(id сообщения, ошибка или None), ...]"""
+    resent = [letter_id for letter_id, error in results if error is None]
+    with transaction.atomic():
+        DeadLetter.objects.filter(id__in=resent).update(status='resent', resent_at=timezone.now())
+        for letter_id, error in results:
+            if error is not None:
+                DeadLetter.objects.filter(id=letter_id).update(status='dead', error=str(error)[:1000])
+
+
+def release_letters(unsent_ids, interrupted_ids):
+    """Вернуть сообщения прерванной повторной отправки
+
+    Не отданные в отправку возвращаются в очередь на повтор. Отправка
+    остальных оборвалась на полпути и могла дойти до получателя, поэтому они
+    не повторяются автоматически, а возвращаются в «Не доставлено».
+    """
+    DeadLetter.objects.filter(id__in=unsent_ids, status='sending').update(status='queued')
+    DeadLetter.objects.filter(id__in=interrupted_ids, status='sending').update(
+        status='dead', error="Повторная отправка прервана остановкой бота, сообщение могло быть доставлено"
+    )
+    if unsent_ids or interrupted_ids:
+        logger.warning(
+            f"⏸️ Повторная отправка прервана: в очередь возвращено {len(unsent_ids)}, "
+            f"прервано на отправке {len(interrupted_ids)}"
+        )
+
+
+def requeue_notification_letters(letters):
+    """Вернуть строки доставки рассылок в очередь outbox; вернуть id рассылок"""
+    notification_ids = set()
+    for letter in letters:
+        NotificationDelivery.objects.filter(
+            notification_id=letter.notification_id, user__telegram_id=letter.chat_id, status='failed'
+        ).update(status='pending', updated_at=timezone.now())
+        notification_ids.add(letter.notification_id)
+    return notification_ids
+
+
+def settle_notification_letters(letters, since):
+    """Отметить сообщения рассылок по строкам доставки после продолжения рассылки
+
+    Доставленные - resent, ещё ожидающие (рассылку прервали) - обратно в
+    очередь на повтор, остальные - в «Не доставлено» с новой ошибкой. Запись,
+    которую продолжение рассылки создало начиная с since для того же
+    получателя, удаляется как дубликат.
+    """
+    now = timezone.now()
+    for letter in letters:
+        delivery = NotificationDelivery.objects.filter(
+            notification_id=letter.notification_id, user__telegram_id=letter.chat_id
+        ).values('status', 'last_error').first()
+        letters_qs = DeadLetter.objects.filter(id=letter.id, status='sending')
+        if delivery is None:
+            letters_qs.update(status='dead', error="Получатель больше не входит в рассылку")
+        elif delivery['status'] == 'sent':
+            letters_qs.update(status='resent', resent_at=now)
+        elif delivery['status'] == 'pending':
+            letters_qs.update(status='queued')
+        else:
+            with transaction.atomic():
+                DeadLetter.objects.filter(
+                    notification_id=letter.notification_id, chat_id=letter.chat_id, created_at__gte=since
+                ).exclude(id=letter.id).delete()
+                letters_qs.update(status='dead', error=delivery['last_error'][:1000])
@@ -0,0 +1,117 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from app_core.models import DeliveryHealth, User
+from .db_pool import db_pool
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryHealthRecorder:
+    """Пакетно ведёт реестр недоступных получателей
+
+    Пользователь, заблокировавший бота, сразу помечается недоступным; при
+    «chat not found» и подобных ошибках - после DELIVERY_FAILURE_THRESHOLD
+    неудач подряд. Успешная доставка сбрасывает счётчик. Заблокированные
+    пользователи сбрасываются из кэша пользователей (в других процессах - по
+    updated_at), чтобы первое же их сообщение боту сняло отметку.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self._delivered = []
+        self._failures = []
+
+    async def __call__(self, chat_id, error):
+        if error is None:
+            self._delivered.append(str(chat_id))
+        elif error.is_unreachable:
+            self._failures.append((str(chat_id), error))
+        else:
+            return
+        if len(self._delivered) + len(self._failures) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        delivered, self._delivered = self._delivered, []
+        failures, self._failures = self._failures, []
+        if not (delivered or failures):
+            return
+        blocked = await db_pool.run(self._save, delivered, failures)
+        if blocked:
+            from .user_cache import user_cache
+            for telegram_id in blocked:
+                user_cache.invalidate(telegram_id)
+
+    def _save(self, delivered, failures):
+        """Сохранить пачку; вернуть Telegram id заблокированных в ней пользователей"""
+        with transaction.atomic():
+            if delivered:
+                DeliveryHealth.objects.filter(
+                    user__telegram_id__in=delivered, consecutive_failures__gt=0
+                ).update(consecutive_failures=0)
+            if not failures:
+                return []
+
+            user_ids = dict(
+                User.objects.filter(telegram_id__in=[chat_id for chat_id, _ in failures])
+                .values_list('telegram_id', 'id')
+            )
+            DeliveryHealth.objects.bulk_create(
+                [DeliveryHealth(user_id=user_id) for user_id in user_ids.values()],
+                ignore_conflicts=True,
+            )
+            now = timezone.now()
+            for chat_id, error in failures:
+                if chat_id not in user_ids:
+                    continue
+                health = DeliveryHealth.objects.filter(user_id=user_ids[chat_id])
+                health.update(
+                    consecutive_failures=F('consecutive_failures') + 1,
+                    last_error=str(error)[:1000],
+                    last_error_at=now,
+                )
+                if error.kind == "blocked":
+                    health.update(is_blocked=True)
+                else:
+                    health.filter(
+                        consecutive_failures__gte=settings.DELIVERY_FAILURE_THRESHOLD
+                    ).update(is_blocked=True)
+            blocked = User.objects.filter(id__in=user_ids.values(), delivery_health__is_blocked=True)
+            blocked_ids = list(blocked.values_list('telegram_id', flat=True))
+            blocked.update(updated_at=now)
+        logger.info(f"🩺 Реестр доступности: недоступных в пачке {len(failures)}")
+        return blocked_ids
+
+
+def _reset_health(user):
+    """Сбросить счётчики в памяти; вернуть запись, если её нужно сохранить"""
+    health = getattr(user, 'delivery_health', None)
+    if health is None or not (health.is_blocked or health.consecutive_failures):
+        return None
+    health.is_blocked = False
+    health.consecutive_failures = 0
+    logger.info(f"🩺 Пользователь {user.telegram_id} снова доступен для рассылок")
+    return health
+
+
+def clear_delivery_health(user):
+    """Снять отметку недоступности: пользователь снова написал боту"""
+    health = _reset_health(user)
+    if health is None:
+        return False
+    health.save(update_fields=['is_blocked', 'consecutive_failures'])
+    return True
+
+
+async def aclear_delivery_health(user):
+    """Асинхронный вариант clear_delivery_health"""
+    health = _reset_health(user)
+    if health is None:
+        return False
+    await health.asave(update_fields=['is_blocked', 'consecutive_failures'])
+    return True
@@ -0,0 +1,26 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def drain_tasks(tasks, timeout: float, name: str) -> int:
+    """Дождаться задач не дольше timeout секунд, оставшиеся отменить
+
+    tasks может пополняться во время ожидания (набор задач диспетчера).
+    Возвращает число прерванных задач.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    pending = {task for task in tasks if not task.done()}
+    if pending:
+        logger.info(f"⏳ {name}: ждём завершения ({len(pending)}), не дольше {timeout:g} с")
+    while pending and loop.time() < deadline:
+        await asyncio.wait(pending, timeout=deadline - loop.time())
+        pending = {task for task in tasks if not task.done()}
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f"⏱️ {name}: прервано по истечении {timeout:g} с: {len(pending)}")
+        await asyncio.gather(*pending, return_exceptions=True)
+    return len(pending)
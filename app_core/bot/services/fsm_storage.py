@@ -0,0 +1,176 @@
+import asyncio
+import functools
+import logging
+import operator
+import time
+from datetime import timedelta
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum, TextField
+from django.db.models.functions import Cast, Length
+from django.utils import timezone
+
+from app_core.models import FSMState
+from .db_pool import db_pool
+
+logger = logging.getLogger(__name__)
+
+# Как часто удалять из базы устаревшие состояния и писать их статистику в лог, секунд
+PURGE_INTERVAL = 600
+
+# Группы состояний пошаговых сценариев (анкеты, просмотр, вопросы, заявки).
+# Брошенный сценарий истекает через FSM_SESSION_TTL, остальные состояния -
+# через FSM_STATE_TTL
+SESSION_STATE_GROUPS = ('NetworkingStates', 'SpeakerApplicationStates', 'QuestionState', 'AnswerStates')
+
+
+class _Record:
+    __slots__ = ('state', 'data', 'version', 'saved_version')
+
+    def __init__(self, state=None, data=None):
+        self.state = state
+        self.data = data or {}
+        self.version = 0
+        self.saved_version = 0
+
+    @property
+    def dirty(self):
+        return self.version != self.saved_version
+
+
+class DjangoStorage(BaseStorage):
+    """FSM-хранилище aiogram в таблице FSMState
+
+    Состояние переживает перезапуск и общее для всех процессов бота.
+    Изменения одного апдейта копятся в памяти и записываются одной пачкой
+    в конце обработки (FSMFlushMiddleware), поэтому несколько вызовов
+    set_state/update_data в обработчике стоят одного UPSERT. После записи
+    запись убирается из памяти, и следующий апдейт читает актуальное
+    состояние из базы - в том числе записанное другим процессом.
+    Состояния, не менявшиеся дольше ttl секунд (сценарии из
+    SESSION_STATE_GROUPS - дольше session_ttl), считаются пустыми и
+    периодически удаляются.
+    """
+
+    def __init__(self, ttl: int | None = None, session_ttl: int | None = None):
+        self.ttl = ttl if ttl is not None else settings.FSM_STATE_TTL
+        self.session_ttl = session_ttl if session_ttl is not None else settings.FSM_SESSION_TTL
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+        self._records: dict[str, _Record] = {}
+        self._flush_lock = asyncio.Lock()
+        self._purged_at = 0.0
+
+    def _expired(self):
+        """Условие на устаревшие строки: простой сценария дольше session_ttl или любого состояния дольше ttl"""
+        now = timezone.now()
+        return Q(updated_at__lt=now - timedelta(seconds=self.ttl)) | (
+            _session_states() & Q(updated_at__lt=now - timedelta(seconds=self.session_ttl))
+        )
+
+    async def _load(self, key: StorageKey) -> _Record:
+        storage_key = self.key_builder.build(key)
+        record = self._records.get(storage_key)
+        if record is None:
+            row = await FSMState.objects.filter(key=storage_key).exclude(
+                self._expired()
+            ).values_list('state', 'data').afirst()
+            record = self._records.setdefault(
+                storage_key, _Record(row[0] or None, row[1]) if row else _Record()
+            )
+        return record
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._load(key)
+        record.state = state.state if isinstance(state, State) else state
+        record.version += 1
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = await self._load(key)
+        record.data = dict(data)
+        record.version += 1
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._load(key)).data.copy()
+
+    async def flush(self):
+        """Записать накопленные изменения и освободить память"""
+        async with self._flush_lock:
+            pending = {
+                storage_key: (record.version, record.state, record.data.copy())
+                for storage_key, record in self._records.items() if record.dirty
+            }
+            if pending:
+                await db_pool.run(self._save, pending)
+            for storage_key, (version, state, data) in pending.items():
+                self._records[storage_key].saved_version = version
+            # Убираем записи без несохранённых изменений, в том числе прочитанные
+            for storage_key in [key for key, record in self._records.items() if not record.dirty]:
+                del self._records[storage_key]
+
+            if time.monotonic() - self._purged_at >= PURGE_INTERVAL:
+                self._purged_at = time.monotonic()
+                await db_pool.run(self._purge)
+                self._log_stats(await self.stats())
+
+    def _save(self, pending):
+        empty = [storage_key for storage_key, (version, state, data) in pending.items() if state is None and not data]
+        rows = [
+            FSMState(key=storage_key, state=state or '', data=data)
+            for storage_key, (version, state, data) in pending.items() if storage_key not in empty
+        ]
+        with transaction.atomic():
+            if empty:
+                FSMState.objects.filter(key__in=empty).delete()
+            if rows:
+                FSMState.objects.bulk_create(
+                    rows, update_conflicts=True, unique_fields=['key'], update_fields=['state', 'data', 'updated_at']
+                )
+
+    def _purge(self):
+        deleted, _ = FSMState.objects.filter(self._expired()).delete()
+        if deleted:
+            logger.info(f"🧹 Удалено устаревших состояний диалогов: {deleted}")
+
+    async def stats(self):
+        """Живые состояния в базе: всего, из них незавершённых сценариев, и объём данных в байтах"""
+        totals = await FSMState.objects.exclude(self._expired()).aaggregate(
+            states=Count('id'),
+            sessions=Count('id', filter=_session_states()),
+            bytes=Sum(Length('state') + Length(Cast('data', TextField()))),
+        )
+        return {
+            'states': totals['states'],
+            'sessions': totals['sessions'],
+            'bytes': totals['bytes'] or 0,
+            'cached': len(self._records),
+        }
+
+    def _log_stats(self, stats):
+        logger.info(
+            f"🗂️ Состояния диалогов: {stats['states']}, из них сценариев {stats['sessions']}, "
+            f"данные {stats['bytes'] / 1024:.1f} КБ, в памяти {stats['cached']}"
+        )
+
+    async def close(self) -> None:
+        await self.flush()
+
+
+def _session_states():
+    return functools.reduce(
+        operator.or_, (Q(state__startswith=f'{group}:') for group in SESSION_STATE_GROUPS)
+    )
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Хранилище FSM по настройке FSM_STORAGE: 'db' (по умолчанию) или 'memory'"""
+    if settings.FSM_STORAGE == 'memory':
+        return MemoryStorage()
+    return DjangoStorage()
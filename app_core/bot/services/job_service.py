@@ -0,0 +1,253 @@
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+import socket
+import time
+from datetime import timedelta
+
+from aiogram import Bot
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app_core.models import BackgroundJob, MassNotification
+from .admin_notification_service import send_mass_notification, resend_dead_letters
+from .db_pool import db_pool
+from .drain import drain_tasks
+from .notification_service import resume_reminders
+from .recipients import exclude_unreachable
+from .telegram_client import get_bot, close_bot
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress:
+    """Периодически сохраняет счётчики отправки в запись фоновой задачи"""
+
+    def __init__(self, job, interval: float | None = None):
+        self.job = job
+        self.interval = interval or settings.JOB_PROGRESS_INTERVAL
+        self._flushed_at = time.monotonic()
+
+    async def start(self, total: int):
+        self.job.total_count = self.job.sent_count + self.job.failed_count + total
+        await self.flush()
+
+    async def __call__(self, chat_id, error):
+        if error is None:
+            self.job.sent_count += 1
+        else:
+            self.job.failed_count += 1
+        if time.monotonic() - self._flushed_at >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        self._flushed_at = time.monotonic()
+        await sync_to_async(self.job.save)(
+            update_fields=['total_count', 'sent_count', 'failed_count', 'updated_at']
+        )
+
+
+def enqueue_job(kind: str, **payload):
+    job = BackgroundJob.objects.create(kind=kind, payload=payload)
+    logger.info(f"📥 Задача {job} поставлена в очередь")
+    return job
+
+
+def enqueue_mass_notification(notification):
+    """Поставить рассылку в очередь фоновых задач"""
+    notification.status = 'queued'
+    notification.save(update_fields=['status'])
+    return enqueue_job('mass_notification', notification_id=notification.id)
+
+
+def get_active_job(kind: str, **payload):
+    """Задача kind с такими параметрами, которая ждёт в очереди или выполняется"""
+    lookups = {f'payload__{key}': value for key, value in payload.items()}
+    return BackgroundJob.objects.filter(kind=kind, status__in=['queued', 'running'], **lookups).first()
+
+
+def start_mass_notification(notification):
+    """Поставить в очередь новую рассылку или продолжение прерванной либо проваленной
+
+    Возвращает (задача, None) или (None, причина отказа). Рассылку, которую
+    уже отправляет задача в очереди, повторно не ставит: две задачи разослали
+    бы одни и те же строки outbox. У проваленной рассылки (failed) строки
+    с ошибками, кроме недоступных получателей, возвращаются в очередь outbox.
+    """
+    with transaction.atomic():
+        MassNotification.objects.select_for_update().filter(id=notification.id).exists()
+        if get_active_job('mass_notification', notification_id=notification.id) is not None:
+            return None, "уже отправляется задачей из очереди"
+        deliveries = notification.deliveries.all()
+        if notification.status == 'failed' and deliveries.exists():
+            exclude_unreachable(deliveries.filter(status='failed'), prefix='user__').update(
+                status='pending', updated_at=timezone.now()
+            )
+            if not deliveries.filter(status='pending').exists():
+                return None, "нет получателей для повторной отправки: все недоступны"
+        return enqueue_mass_notification(notification), None
+
+
+def enqueue_dead_letter_resend(letters):
+    """Поставить повторную отправку недоставленных сообщений в очередь"""
+    letter_ids = list(letters.filter(status='dead').values_list('id', flat=True))
+    letters.filter(id__in=letter_ids).update(status='queued')
+    return enqueue_job('dead_letter_resend', letter_ids=letter_ids)
+
+
+def claim_next_job(worker: str):
+    """Атомарно забрать следующую задачу из очереди
+
+    Задачи в статусе running без обновлений дольше JOB_STALE_AFTER секунд
+    считаются брошенными упавшим обработчиком и забираются повторно.
+    """
+    now = timezone.now()
+    claimable = Q(status='queued') | Q(
+        status='running', updated_at__lt=now - timedelta(seconds=settings.JOB_STALE_AFTER)
+    )
+    candidates = BackgroundJob.objects.filter(claimable).order_by('created_at').values_list('id', flat=True)[:10]
+    for job_id in candidates:
+        claimed = BackgroundJob.objects.filter(claimable, id=job_id).update(
+            status='running', worker=worker, started_at=now, updated_at=now
+        )
+        if claimed:
+            return BackgroundJob.objects.get(id=job_id)
+    return None
+
+
+async def run_mass_notification_job(bot: Bot, job):
+    notification = await sync_to_async(MassNotification.objects.get)(id=job.payload['notification_id'])
+    success, failed, message = await send_mass_notification(bot, notification, progress=JobProgress(job))
+    return message
+
+
+async def run_dead_letter_resend_job(bot: Bot, job):
+    return await resend_dead_letters(bot, job.payload['letter_ids'], progress=JobProgress(job))
+
+
+async def run_reminder_resume_job(bot: Bot, job):
+    return await resume_reminders(bot, job, progress=JobProgress(job))
+
+
+JOB_HANDLERS = {
+    'mass_notification': run_mass_notification_job,
+    'dead_letter_resend': run_dead_letter_resend_job,
+    'reminder_resume': run_reminder_resume_job,
+}
+
+
+async def keep_job_alive(job):
+    """Обновлять отметку времени задачи, чтобы её не забрал другой обработчик"""
+    while True:
+        await asyncio.sleep(settings.JOB_STALE_AFTER / 3)
+        await sync_to_async(
+            BackgroundJob.objects.filter(id=job.id).update
+        )(updated_at=timezone.now())
+
+
+async def run_job(bot: Bot, job):
+    handler = JOB_HANDLERS.get(job.kind)
+    heartbeat = asyncio.create_task(keep_job_alive(job))
+    try:
+        if handler is None:
+            raise ValueError(f"Неизвестный тип задачи: {job.kind}")
+        job.result = await handler(bot, job) or ""
+        job.status = 'done'
+        logger.info(f"✅ Задача {job} выполнена: {job.result}")
+    except asyncio.CancelledError:
+        # Рассылки продолжаются с места остановки, поэтому задача просто возвращается в очередь
+        job.status = 'queued'
+        job.worker = ''
+        await sync_to_async(job.save)(update_fields=['status', 'worker', 'updated_at'])
+        logger.warning(f"⏸️ Задача {job} прервана остановкой обработчика и возвращена в очередь")
+        raise
+    except Exception as e:
+        logger.error(f"💥 Ошибка выполнения задачи {job}: {e}", exc_info=True)
+        job.result = f"Ошибка: {e}"
+        job.status = 'failed'
+    finally:
+        heartbeat.cancel()
+    job.finished_at = timezone.now()
+    await sync_to_async(job.save)()
+
+
+class JobWorker:
+    """Выполнение фоновых задач из очереди по одной на переданном Bot
+
+    В боте его запускает ведущий процесс вместе с планировщиком
+    (bot_main.start_scheduler), поэтому рассылки из админки идут через тот
+    же SendDispatcher, что и ответы пользователям: под общим лимитом
+    TELEGRAM_BROADCAST_RATE и уступая ответам очередь.
+    """
+
+    def __init__(self, bot: Bot, name: str | None = None):
+        self.bot = bot
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.task = None
+        self._job_task = None
+        self._stopping = asyncio.Event()
+
+    async def start(self, once: bool = False):
+        self._stopping.clear()
+        self.task = asyncio.create_task(self._run(once))
+        logger.info(f"🚀 Обработчик фоновых задач {self.name} запущен")
+
+    async def _run(self, once: bool):
+        while not self._stopping.is_set():
+            job = await sync_to_async(claim_next_job)(self.name)
+            if job is not None:
+                logger.info(f"▶️ Задача {job} взята в работу")
+                self._job_task = asyncio.create_task(run_job(self.bot, job))
+                await asyncio.wait([self._job_task])
+                if not self._job_task.cancelled() and self._job_task.exception() is not None:
+                    logger.error(f"💥 Ошибка обработчика задачи {job}: {self._job_task.exception()}")
+                continue
+            if once:
+                break
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._stopping.wait(), settings.JOB_POLL_INTERVAL)
+
+    async def stop(self, timeout: float | None = None):
+        """Не брать новые задачи; текущей дать timeout секунд (BOT_SHUTDOWN_TIMEOUT), затем вернуть её в очередь"""
+        self._stopping.set()
+        if self._job_task is not None and not self._job_task.done():
+            logger.info("🚦 Остановка обработчика: ждём завершения текущей задачи")
+            await drain_tasks(
+                [self._job_task], timeout if timeout is not None else settings.BOT_SHUTDOWN_TIMEOUT, "Фоновые задачи"
+            )
+        if self.task is not None:
+            await self.task
+            self.task = None
+        logger.info(f"🛑 Обработчик фоновых задач {self.name} остановлен")
+
+
+async def run_worker(once: bool = False):
+    """Отдельный обработчик фоновых задач (runjobs) - когда бот не запущен
+
+    SIGINT и SIGTERM останавливают обработчик мягко: новые задачи не
+    берутся, текущая получает BOT_SHUTDOWN_TIMEOUT секунд на завершение,
+    после чего прерывается и возвращается в очередь.
+    """
+    worker = JobWorker(get_bot())
+    loop = asyncio.get_running_loop()
+    stop_requested = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signum, stop_requested.set)
+    waiter = asyncio.create_task(stop_requested.wait())
+    try:
+        await worker.start(once=once)
+        await asyncio.wait([worker.task, waiter], return_when=asyncio.FIRST_COMPLETED)
+        await worker.stop()
+    finally:
+        waiter.cancel()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):
+                loop.remove_signal_handler(signum)
+        await close_bot()
+        db_pool.shutdown()
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app_core.models import LeaderLease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """Выбор одного ведущего процесса через аренду в базе данных
+
+    Ведущий продлевает аренду каждые ttl/3 секунды. Если он перестаёт это
+    делать, остальные процессы забирают роль после истечения аренды.
+    """
+
+    def __init__(self, name: str, holder: str | None = None, ttl: float | None = None):
+        self.name = name
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self.ttl = ttl or settings.LEADER_LEASE_TTL
+        self.is_leader = False
+
+    def try_acquire(self) -> bool:
+        """Захватить или продлить аренду одним условным UPDATE"""
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=self.ttl)
+        available = Q(holder=self.holder) | Q(expires_at__lt=now)
+        if LeaderLease.objects.filter(available, name=self.name).update(holder=self.holder, expires_at=expires_at):
+            return True
+        try:
+            with transaction.atomic():
+                LeaderLease.objects.create(name=self.name, holder=self.holder, expires_at=expires_at)
+            return True
+        except IntegrityError:
+            return False
+
+    @staticmethod
+    def is_held(name: str) -> bool:
+        """Есть ли сейчас ведущий с ролью name"""
+        return LeaderLease.objects.filter(name=name, expires_at__gt=timezone.now()).exists()
+
+    def release(self):
+        """Отдать аренду, чтобы другой процесс стал ведущим без ожидания"""
+        LeaderLease.objects.filter(name=self.name, holder=self.holder).update(expires_at=timezone.now())
+
+    async def run(self, on_elected, on_demoted):
+        """Участвовать в выборах, пока задача не отменена
+
+        on_elected и on_demoted - корутины, запускающие и останавливающие
+        работу ведущего.
+        """
+        try:
+            while True:
+                try:
+                    acquired = await sync_to_async(self.try_acquire)()
+                except Exception as e:
+                    logger.error(f"❌ Ошибка продления аренды {self.name}: {e}")
+                    acquired = False
+
+                if acquired and not self.is_leader:
+                    self.is_leader = True
+                    logger.info(f"👑 {self.holder} стал ведущим для {self.name}")
+                    await on_elected()
+                elif not acquired and self.is_leader:
+                    self.is_leader = False
+                    logger.warning(f"⚠️ {self.holder} потерял аренду {self.name}, переход в резерв")
+                    await on_demoted()
+
+                await asyncio.sleep(self.ttl / 3)
+        finally:
+            if self.is_leader:
+                self.is_leader = False
+                await on_demoted()
+                await sync_to_async(self.release)()
+                logger.info(f"🔓 {self.holder} освободил аренду {self.name}")
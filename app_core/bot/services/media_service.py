@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import logging
+
+from aiogram import Bot
+from aiogram.types import BufferedInputFile
+from asgiref.sync import sync_to_async
+
+from app_core.models import TelegramFile
+
+logger = logging.getLogger(__name__)
+
+
+def extract_file_id(message, media_type: str) -> str | None:
+    """file_id загруженного файла из ответа Telegram"""
+    if media_type == 'photo':
+        return message.photo[-1].file_id if message.photo else None
+    media = getattr(message, media_type, None)
+    return media.file_id if media else None
+
+
+class MediaAttachment:
+    """Вложение рассылки, которое загружается в Telegram один раз
+
+    Первый получатель получает файл загрузкой, остальные - по file_id из
+    ответа Telegram. Пока идёт загрузка, остальные отправители ждут её,
+    поэтому время загрузки не зависит от размера аудитории. Если первая
+    отправка не удалась (например, бот заблокирован), загрузку повторит
+    следующий получатель.
+    """
+
+    def __init__(self, media_type: str, file_id: str | None = None, content: bytes | None = None,
+                 filename: str = "file", on_uploaded=None):
+        self.media_type = media_type
+        self.file_id = file_id
+        self.content = content
+        self.filename = filename
+        self.on_uploaded = on_uploaded
+        self._upload_lock = asyncio.Lock()
+
+    async def send(self, bot: Bot, chat_id, caption: str, **kwargs):
+        if self.file_id is None:
+            async with self._upload_lock:
+                if self.file_id is None:
+                    return await self._upload(bot, chat_id, caption, **kwargs)
+        return await self._send(bot, chat_id, self.file_id, caption, **kwargs)
+
+    async def _upload(self, bot: Bot, chat_id, caption: str, **kwargs):
+        message = await self._send(
+            bot, chat_id, BufferedInputFile(self.content, filename=self.filename), caption, **kwargs
+        )
+        self.file_id = extract_file_id(message, self.media_type)
+        if self.file_id is not None:
+            logger.info(f"📎 Файл {self.filename} загружен в Telegram, дальше отправляется по file_id")
+            self.content = None
+            if self.on_uploaded is not None:
+                await self.on_uploaded(self.file_id)
+        return message
+
+    async def _send(self, bot: Bot, chat_id, media, caption: str, **kwargs):
+        sender = getattr(bot, f"send_{self.media_type}")
+        return await sender(chat_id, media, caption=caption, **kwargs)
+
+
+def read_attachment(field_file):
+    field_file.open('rb')
+    try:
+        return field_file.read()
+    finally:
+        field_file.close()
+
+
+def get_cached_file_id(bot_id: int, sha256: str, media_type: str) -> str | None:
+    return TelegramFile.objects.filter(
+        bot_id=bot_id, sha256=sha256, media_type=media_type
+    ).values_list('file_id', flat=True).first()
+
+
+def save_file_id(bot_id: int, sha256: str, media_type: str, file_id: str):
+    TelegramFile.objects.update_or_create(
+        bot_id=bot_id, sha256=sha256, media_type=media_type, defaults={'file_id': file_id}
+    )
+
+
+async def get_notification_media(bot: Bot, notification) -> MediaAttachment | None:
+    """Вложение рассылки с file_id из кэша, если этот файл уже загружался"""
+    if not notification.attachment:
+        return None
+
+    content = await sync_to_async(read_attachment)(notification.attachment)
+    sha256 = hashlib.sha256(content).hexdigest()
+    media_type = notification.attachment_type
+    file_id = await sync_to_async(get_cached_file_id)(bot.id, sha256, media_type)
+    if file_id is not None:
+        logger.info(f"📎 Вложение рассылки '{notification.title}' уже загружено, используется file_id")
+        return MediaAttachment(media_type, file_id=file_id)
+
+    async def on_uploaded(file_id):
+        await sync_to_async(save_file_id)(bot.id, sha256, media_type, file_id)
+
+    return MediaAttachment(
+        media_type,
+        content=content,
+        filename=notification.attachment.name.rsplit('/', 1)[-1],
+        on_uploaded=on_uploaded,
+    )
@@ -0,0 +1,130 @@
+import bisect
+import html
+import logging
+from datetime import timedelta
+
+from aiogram import Bot
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Min, Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from app_core.models import NetworkingProfile
+from .broadcast_service import BroadcastEngine
+from .db_pool import db_pool
+from .recipients import aiter_values, exclude_unreachable
+
+logger = logging.getLogger(__name__)
+
+DIGEST_BATCH_SIZE = 500
+
+
+def get_digest_recipients(now):
+    """Владельцы видимых анкет, у которых прошёл период тишины"""
+    cooldown = timedelta(seconds=settings.NETWORKING_DIGEST_COOLDOWN)
+    return exclude_unreachable(
+        NetworkingProfile.objects.filter(is_visible=True).filter(
+            Q(new_profiles_notified_at__isnull=True) | Q(new_profiles_notified_at__lte=now - cooldown)
+        ),
+        prefix='user__',
+    )
+
+
+def get_new_profiles(since, until):
+    """Время создания видимых анкет в (since, until] (по возрастанию) и имя последней
+
+    until - время, которым отмечаются получатели: более поздние анкеты войдут
+    в следующую сводку, а не в две подряд.
+    """
+    new_profiles = NetworkingProfile.objects.filter(is_visible=True, created_at__gt=since, created_at__lte=until)
+    created_times = list(new_profiles.order_by('created_at').values_list('created_at', flat=True))
+    latest_name = new_profiles.order_by('-created_at').values_list('name', flat=True).first()
+    return created_times, latest_name
+
+
+def build_digest_text(new_count, latest_name):
+    latest_name = html.escape(latest_name)
+    if new_count == 1:
+        return (
+            f"🎉 Появился новый участник для знакомств!\n\n"
+            f"👤 <b>{latest_name}</b>\n\n"
+            f"Хотите посмотреть анкету и начать общение?"
+        )
+    return (
+        f"🎉 К знакомствам присоединились новые участники: <b>{new_count}</b>!\n\n"
+        f"Среди них <b>{latest_name}</b>. Хотите посмотреть анкеты и начать общение?"
+    )
+
+
+def mark_notified(profile_ids, now):
+    NetworkingProfile.objects.filter(id__in=profile_ids).update(new_profiles_notified_at=now)
+
+
+async def send_new_profiles_digest(bot: Bot):
+    """Разослать владельцам анкет сводку о новых участниках
+
+    Вместо сообщения всем участникам при каждой новой анкете каждый получатель
+    раз в NETWORKING_DIGEST_COOLDOWN секунд получает одно сообщение о всех
+    анкетах, появившихся после его прошлой сводки (или его собственной анкеты).
+    Рассылка идёт через BroadcastEngine под общим лимитом скорости.
+    Получатель отмечается только после успешной доставки, поэтому
+    неотправленную (ошибка, остановка бота) сводку он получит при следующем
+    запуске - без сохранения в DeadLetter, чтобы не получить её дважды.
+    """
+    now = timezone.now()
+    recipients = get_digest_recipients(now).annotate(
+        notified_since=Coalesce(Greatest('new_profiles_notified_at', 'created_at'), 'created_at')
+    )
+    oldest = (await sync_to_async(recipients.aggregate)(oldest=Min('notified_since')))['oldest']
+    if oldest is None:
+        return 0
+
+    created_times, latest_name = await sync_to_async(get_new_profiles)(oldest, now)
+    if not created_times:
+        return 0
+
+    # telegram_id -> id анкеты для отправляемых сейчас сводок
+    sending = {}
+    notified_ids = []
+
+    async def messages():
+        async for profile_id, telegram_id, since in aiter_values(
+            recipients, ('id', 'user__telegram_id', 'notified_since')
+        ):
+            # Собственная анкета получателя создана не позже since и не учитывается
+            new_count = len(created_times) - bisect.bisect_right(created_times, since)
+            if not new_count:
+                continue
+            sending[telegram_id] = profile_id
+            yield telegram_id, build_digest_text(new_count, latest_name)
+
+    async def on_result(chat_id, error):
+        profile_id = sending.pop(chat_id)
+        if error is not None:
+            return
+        notified_ids.append(profile_id)
+        if len(notified_ids) >= DIGEST_BATCH_SIZE:
+            await db_pool.run(mark_notified, notified_ids[:], now)
+            notified_ids.clear()
+
+    try:
+        result = await BroadcastEngine(bot).deliver(
+            messages(),
+            on_result=on_result,
+            reply_markup=ReplyKeyboardMarkup(
+                keyboard=[
+                    [KeyboardButton(text="👀 Найти собеседников")],
+                    [KeyboardButton(text="Позже")]
+                ],
+                resize_keyboard=True
+            ),
+            parse_mode="HTML"
+        )
+    finally:
+        if notified_ids:
+            await db_pool.run(mark_notified, notified_ids, now)
+
+    logger.info(f"🤝 Сводка о новых анкетах: {result}")
+    return result.success_count
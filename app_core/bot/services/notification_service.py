@@ -1,150 +1,274 @@
+import asyncio
+
 from asgiref.sync import sync_to_async
+from django.db.models import DateTimeField, ExpressionWrapper, F
 from django.utils import timezone
-from datetime import timedelta, datetime
-from app_core.models import User, Event
+from app_core.models import BackgroundJob, Event
 from aiogram import Bot
+from .broadcast_service import BroadcastEngine, ResumeCursor
+from .recipients import get_subscribed_users, aiter_values
 import logging
-import pytz
 
 logger = logging.getLogger(__name__)
 
+REMINDER_FIELDS = {
+    'week': ('week_reminder_offset', 'notification_sent_week'),
+    'day': ('day_reminder_offset', 'notification_sent_day'),
+}
+
+def with_reminder_due_at(queryset, kind):
+    """Добавить к мероприятиям точное время напоминания: начало минус отступ"""
+    offset_field, sent_field = REMINDER_FIELDS[kind]
+    return queryset.annotate(
+        due_at=ExpressionWrapper(F('start_date') - F(offset_field), output_field=DateTimeField())
+    )
+
+def get_due_events(kind, now=None):
+    """Мероприятия, по которым подошло время напоминания kind и оно ещё не отправлено"""
+    now = now or timezone.now()
+    offset_field, sent_field = REMINDER_FIELDS[kind]
+    return list(
+        with_reminder_due_at(Event.objects.filter(**{sent_field: False}), kind)
+        .filter(start_date__gt=now, due_at__lte=now)
+        .order_by('start_date')
+    )
+
+def get_reminder_due_times(event):
+    """Время ещё не отправленных напоминаний мероприятия: {kind: due_at}"""
+    due_times = {}
+    if event.start_date <= timezone.now():
+        return due_times
+    for kind, (offset_field, sent_field) in REMINDER_FIELDS.items():
+        if not getattr(event, sent_field):
+            due_times[kind] = event.start_date - getattr(event, offset_field)
+    return due_times
+
 @sync_to_async
 def get_events_for_week_notification():
-    """Получить мероприятия, которые начнутся через 7 дней"""
-    now = timezone.now()
-    target_date = now + timedelta(days=7)
-    
-    events = Event.objects.filter(
-        start_date__date=target_date.date(),
-        notification_sent_week=False
-    )
-    return list(events)
+    """Получить мероприятия, для которых наступило время напоминания за неделю"""
+    return get_due_events('week')
 
 @sync_to_async
 def get_events_for_day_notification():
-    """Получить мероприятия, которые начнутся через 1 день"""
-    now = timezone.now()
-    target_date = now + timedelta(days=1)
+    """Получить мероприятия, для которых наступило время напоминания за день"""
+    return get_due_events('day')
+
+@sync_to_async
+def claim_reminder(kind, event):
+    """Атомарно отметить напоминание отправленным до начала рассылки
+
+    Условный UPDATE срабатывает только в одном процессе, поэтому при
+    нескольких экземплярах бота каждое напоминание уходит один раз.
+    Возвращает True, если напоминание забрал этот процесс.
+    """
+    offset_field, sent_field = REMINDER_FIELDS[kind]
+    claimed = Event.objects.filter(id=event.id, **{sent_field: False}).update(
+        **{sent_field: True, 'updated_at': timezone.now()}
+    )
+    setattr(event, sent_field, True)
+    return claimed == 1
+
+REMINDER_KINDS = ('week', 'day')
+
+REMINDER_TEMPLATES = {
+    'week': {
+        'header': "🔔 Напоминание о мероприятии!\n\n",
+        'when': "📅 {lead}: {date}\n🕐 В {time}\n",
+        'footer': "Не пропустите интересные доклады и общение с коллегами! 🚀",
+    },
+    'day': {
+        'header': "🔔 {lead} митап!\n\n",
+        'when': "📅 {date}\n🕐 Начало в {time}\n",
+        'digest_when': "📅 {lead}: {date}\n🕐 Начало в {time}\n",
+        'footer': "Успейте подготовить вопросы спикерам! 💬",
+    },
+}
+
+def plural(number, one, few, many):
+    """Форма слова для числа: 1 день, 2 дня, 5 дней"""
+    if number % 10 == 1 and number % 100 != 11:
+        return one
+    if 2 <= number % 10 <= 4 and not 12 <= number % 100 <= 14:
+        return few
+    return many
+
+def format_lead_time(offset):
+    """Сколько осталось до мероприятия по отступу напоминания: «Завтра», «Через неделю», «Через 3 дня»"""
+    days, hours = offset.days, offset.seconds // 3600
+    if days == 1 and not hours:
+        return "Завтра"
+    if days and not hours:
+        if days % 7 == 0:
+            weeks = days // 7
+            return "Через неделю" if weeks == 1 else f"Через {weeks} {plural(weeks, 'неделю', 'недели', 'недель')}"
+        return f"Через {days} {plural(days, 'день', 'дня', 'дней')}"
+    hours += days * 24
+    if hours:
+        return "Через час" if hours == 1 else f"Через {hours} {plural(hours, 'час', 'часа', 'часов')}"
+    minutes = max(1, offset.seconds // 60)
+    return f"Через {minutes} {plural(minutes, 'минуту', 'минуты', 'минут')}"
+
+def reminder_lead_time(kind, event):
+    offset_field, sent_field = REMINDER_FIELDS[kind]
+    return format_lead_time(getattr(event, offset_field))
+
+def format_reminder_block(kind, event, in_digest=False):
+    template = REMINDER_TEMPLATES[kind]
+    description = f"{event.description[:150]}{'...' if len(event.description) > 150 else ''}"
+    when = template.get('digest_when' if in_digest else 'when', template['when']).format(
+        lead=reminder_lead_time(kind, event),
+        date=event.start_date.strftime('%d.%m.%Y'),
+        time=event.start_date.strftime('%H:%M'),
+    )
+    return f"🎯 <b>{event.title}</b>\n{when}📝 {description}\n\n"
+
+def build_reminder_digest(reminders):
+    """Одно сообщение со всеми напоминаниями для получателя"""
+    if len(reminders) == 1:
+        kind, event = reminders[0]
+        template = REMINDER_TEMPLATES[kind]
+        header = template['header'].format(lead=reminder_lead_time(kind, event))
+        return header + format_reminder_block(kind, event) + template['footer']
     
-    events = Event.objects.filter(
-        start_date__date=target_date.date(),
-        notification_sent_day=False
+    blocks = "".join(format_reminder_block(kind, event, in_digest=True) for kind, event in reminders)
+    return (
+        f"🔔 Напоминание о мероприятиях ({len(reminders)})!\n\n"
+        f"{blocks}"
+        f"{REMINDER_TEMPLATES['week']['footer']}"
     )
-    return list(events)
 
-@sync_to_async
-def mark_week_notification_sent(event):
-    event.notification_sent_week = True
-    event.save()
+async def get_due_reminders(kinds=REMINDER_KINDS):
+    """Все напоминания, которые пора отправить, в порядке начала мероприятий"""
+    reminders = []
+    if 'day' in kinds:
+        reminders += [('day', event) for event in await get_events_for_day_notification()]
+    if 'week' in kinds:
+        reminders += [('week', event) for event in await get_events_for_week_notification()]
+    return sorted(reminders, key=lambda reminder: reminder[1].start_date)
 
-@sync_to_async
-def mark_day_notification_sent(event):
-    event.notification_sent_day = True
-    event.save()
+async def claim_reminders(reminders):
+    """Забрать напоминания для отправки; вернуть только те, что достались этому процессу
 
-@sync_to_async
-def get_subscribed_users():
-    return list(User.objects.filter(is_subscribed=True))
+    Если у мероприятия одновременно подошли оба напоминания (например, бот
+    был выключен), отправляется только напоминание за день, а напоминание
+    за неделю отмечается как устаревшее.
+    """
+    day_event_ids = {event.id for kind, event in reminders if kind == 'day'}
+    claimed = []
+    for kind, event in reminders:
+        if await claim_reminder(kind, event) and not (kind == 'week' and event.id in day_event_ids):
+            claimed.append((kind, event))
+    return claimed
+
+def save_reminder_resume(reminders, position, job=None):
+    """Сохранить позицию прерванной рассылки напоминаний в задачу reminder_resume
+
+    Если рассылка уже шла из такой задачи, обновляется её позиция.
+    """
+    from .job_service import enqueue_job
+
+    payload = {'reminders': [[kind, event.id] for kind, event in reminders], **position}
+    if job is None:
+        return enqueue_job('reminder_resume', **payload)
+    BackgroundJob.objects.filter(id=job.id).update(payload=payload)
+    job.payload = payload
+    return job
+
+async def broadcast_reminders(bot: Bot, reminders, cursor=None, job=None, progress=None):
+    """Разослать дайджест напоминаний подписчикам по возрастанию pk
+
+    Если рассылку прервала остановка бота, позиция (ResumeCursor) сохраняется
+    в задачу reminder_resume, и после перезапуска обработчик фоновых задач
+    продолжает рассылку с неё, не повторяя отправленное.
+    """
+    cursor = cursor or ResumeCursor()
+    text = build_reminder_digest(reminders)
+
+    async def messages():
+        async for pk, telegram_id in aiter_values(
+            get_subscribed_users(), ('pk', 'telegram_id'), after=cursor.after
+        ):
+            cursor.read(pk, telegram_id)
+            if telegram_id in cursor.skip:
+                cursor.done(telegram_id)
+                continue
+            yield telegram_id, text
+
+    async def on_result(chat_id, error):
+        cursor.done(chat_id)
+        if progress is not None:
+            await progress(chat_id, error)
 
-async def send_week_notification(bot: Bot, event: Event):
-    """Отправка напоминания за неделю"""
     try:
-        subscribed_users = await get_subscribed_users()
-        
-        if not subscribed_users:
-            logger.info(f"Нет подписанных пользователей для мероприятия '{event.title}'")
-            return 0
-        
-        message_text = (
-            "🔔 Напоминание о мероприятии!\n\n"
-            f"🎯 <b>{event.title}</b>\n"
-            f"📅 Через неделю: {event.start_date.strftime('%d.%m.%Y')}\n"
-            f"🕐 В {event.start_date.strftime('%H:%M')}\n"
-            f"📝 {event.description[:150]}{'...' if len(event.description) > 150 else ''}\n\n"
-            "Не пропустите интересные доклады и общение с коллегами! 🚀"
+        return await BroadcastEngine(bot).deliver(
+            messages(), on_result=on_result, dead_letter={'source': 'reminder'}, parse_mode="HTML"
         )
-        
-        success_count = 0
-        for user in subscribed_users:
-            try:
-                await bot.send_message(
-                    chat_id=user.telegram_id,
-                    text=message_text,
-                    parse_mode="HTML"
-                )
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Не удалось отправить уведомление пользователю {user.telegram_id}: {e}")
-        
-        await mark_week_notification_sent(event)
-        
-        logger.info(f"Напоминание за неделю о '{event.title}' отправлено {success_count} пользователям")
-        return success_count
-        
-    except Exception as e:
-        logger.error(f"Ошибка при отправке напоминания за неделю: {e}")
-        return 0
+    except asyncio.CancelledError:
+        position = cursor.state()
+        job = await sync_to_async(save_reminder_resume)(reminders, position, job)
+        logger.warning(f"💾 Рассылка напоминаний прервана после pk {position['after']}, продолжит задача {job}")
+        raise
+
+async def resume_reminders(bot: Bot, job, progress=None):
+    """Продолжить прерванную рассылку напоминаний из задачи reminder_resume"""
+    payload = job.payload
+    events = await sync_to_async(Event.objects.in_bulk)([event_id for kind, event_id in payload['reminders']])
+    reminders = [
+        (kind, events[event_id]) for kind, event_id in payload['reminders']
+        if event_id in events and events[event_id].start_date > timezone.now()
+    ]
+    if not reminders:
+        return "Мероприятия уже начались или удалены"
+    if progress is not None:
+        await progress.start(await sync_to_async(get_subscribed_users().filter(pk__gt=payload['after']).count)())
+    cursor = ResumeCursor(payload['after'], payload['skip'])
+    result = await broadcast_reminders(bot, reminders, cursor, job=job, progress=progress)
+    return f"Напоминания ({len(reminders)}) отправлены {result.success_count} пользователям"
 
-async def send_day_notification(bot: Bot, event: Event):
-    """Отправка напоминания за день"""
+async def send_due_reminders(bot: Bot, kinds=REMINDER_KINDS):
+    """Отправить все назревшие напоминания одним сообщением на получателя
+
+    Все напоминания адресованы подписчикам, поэтому планировщик один раз
+    выбирает мероприятия и один раз проходит по аудитории, а каждый
+    получатель получает общий дайджест вместо сообщения на каждое мероприятие.
+    Напоминания забираются до начала отправки: если процесс упадёт посреди
+    рассылки, повторной отправки не будет, а при остановке бота рассылка
+    продолжится с места остановки (broadcast_reminders).
+    """
     try:
-        subscribed_users = await get_subscribed_users()
-        
-        if not subscribed_users:
-            logger.info(f"Нет подписанных пользователей для мероприятия '{event.title}'")
+        reminders = await get_due_reminders(kinds)
+        if not reminders:
             return 0
         
-        message_text = (
-            "🔔 Завтра митап!\n\n"
-            f"🎯 <b>{event.title}</b>\n"
-            f"📅 {event.start_date.strftime('%d.%m.%Y')}\n"
-            f"🕐 Начало в {event.start_date.strftime('%H:%M')}\n"
-            f"📝 {event.description[:150]}{'...' if len(event.description) > 150 else ''}\n\n"
-            "Успейте подготовить вопросы спикерам! 💬"
-        )
+        subscribed_users = get_subscribed_users()
+        titles = ", ".join(f"'{event.title}'" for kind, event in reminders)
         
-        success_count = 0
-        for user in subscribed_users:
-            try:
-                await bot.send_message(
-                    chat_id=user.telegram_id,
-                    text=message_text,
-                    parse_mode="HTML"
-                )
-                success_count += 1
-            except Exception as e:
-                logger.error(f"Не удалось отправить уведомление пользователю {user.telegram_id}: {e}")
+        if not await sync_to_async(subscribed_users.exists)():
+            logger.info(f"Нет подписанных пользователей для мероприятий {titles}")
+            return 0
         
-        await mark_day_notification_sent(event)
+        reminders = await claim_reminders(reminders)
+        if not reminders:
+            logger.info(f"Напоминания о {titles} уже отправляет другой процесс")
+            return 0
+        titles = ", ".join(f"'{event.title}'" for kind, event in reminders)
+        
+        result = await broadcast_reminders(bot, reminders)
         
-        logger.info(f"Напоминание за день о '{event.title}' отправлено {success_count} пользователям")
-        return success_count
+        logger.info(f"Напоминания ({len(reminders)}) о {titles} отправлены {result.success_count} пользователям")
+        return result.success_count
         
     except Exception as e:
-        logger.error(f"Ошибка при отправке напоминания за день: {e}")
+        logger.error(f"Ошибка при отправке напоминаний: {e}")
         return 0
 
 async def check_and_send_week_notifications(bot: Bot):
     """Проверить и отправить напоминания за неделю"""
-    events = await get_events_for_week_notification()
-    
-    total_sent = 0
-    for event in events:
-        sent_count = await send_week_notification(bot, event)
-        total_sent += sent_count
-    
-    return total_sent
+    return await send_due_reminders(bot, kinds=('week',))
 
 async def check_and_send_day_notifications(bot: Bot):
     """Проверить и отправить напоминания за день"""
-    events = await get_events_for_day_notification()
-    
-    total_sent = 0
-    for event in events:
-        sent_count = await send_day_notification(bot, event)
-        total_sent += sent_count
-    
-    return total_sent
+    return await send_due_reminders(bot, kinds=('day',))
 
 async def send_test_notification(bot: Bot, user_id: int):
     """Тестовая отправка уведомления"""
@@ -0,0 +1,48 @@
+from django.conf import settings
+from app_core.models import User
+from .db_pool import db_pool
+
+
+def exclude_unreachable(queryset, prefix: str = ''):
+    """Убрать пользователей, отмеченных в реестре как недоступные
+
+    prefix - путь до пользователя для querysets других моделей, например 'user__'.
+    """
+    return queryset.exclude(**{f'{prefix}delivery_health__is_blocked': True})
+
+
+def get_subscribed_users():
+    """Подписанные и доступные для доставки пользователи (ленивый queryset)"""
+    return exclude_unreachable(User.objects.filter(is_subscribed=True))
+
+
+def iter_values(queryset, field: str, chunk_size: int | None = None):
+    """Отдавать значения поля по одному, читая базу пачками через iterator()"""
+    chunk_size = chunk_size or settings.RECIPIENT_CHUNK_SIZE
+    return queryset.values_list(field, flat=True).iterator(chunk_size=chunk_size)
+
+
+async def aiter_values(queryset, field, chunk_size: int | None = None, after: int = 0):
+    """Асинхронно отдавать значения поля пачками по возрастанию pk
+
+    Пачки выбираются в пуле БД по условию pk > последнего прочитанного,
+    поэтому в памяти одновременно находится не больше chunk_size значений.
+    Если field - кортеж имён полей, отдаются кортежи значений; after -
+    pk, после которого начать (продолжение прерванной рассылки).
+    """
+    chunk_size = chunk_size or settings.RECIPIENT_CHUNK_SIZE
+    fields = (field,) if isinstance(field, str) else tuple(field)
+    last_pk = after
+    while True:
+        chunk = await db_pool.run(
+            list, queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', *fields)[:chunk_size]
+        )
+        if not chunk:
+            return
+        for pk, *values in chunk:
+            yield values[0] if isinstance(field, str) else tuple(values)
+        last_pk = chunk[-1][0]
+
+
+def aiter_telegram_ids(queryset, chunk_size: int | None = None):
+    return aiter_values(queryset, 'telegram_id', chunk_size)
@@ -0,0 +1,274 @@
+"""Доступ к данным для обработчиков бота на асинхронном API Django ORM
+
+Обработчики не строят querysets сами и не оборачивают каждый запрос в
+sync_to_async: все выборки собраны здесь и используют aget, acreate,
+acount, aexists и async for. Транзакции выполняются в пуле БД (db_pool).
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F, Prefetch, Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from app_core.models import (
+    Donation,
+    Event,
+    NetworkingInteraction,
+    NetworkingProfile,
+    Question,
+    SpeakerApplication,
+    Talk,
+    User,
+)
+from .db_pool import in_db_pool
+
+logger = logging.getLogger(__name__)
+
+# Порядок просмотра анкет: id * seed по модулю простого BROWSE_MODULUS.
+# При seed от 1 до BROWSE_MODULUS - 1 значения для разных id различны,
+# так что seed задаёт перестановку анкет, которую не нужно хранить
+BROWSE_MODULUS = 2147483647
+
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
+
+
+# Пользователи
+
+async def get_or_create_user(from_user):
+    """Пользователь по отправителю апдейта; новый создаётся гостем
+
+    Возвращает пару (user, created). Реестр доступности подгружается
+    сразу, чтобы снять отметку без отдельного запроса.
+    """
+    try:
+        user = await User.objects.select_related('delivery_health').aget(telegram_id=str(from_user.id))
+        return user, False
+    except User.DoesNotExist:
+        user = await User.objects.acreate(
+            telegram_id=str(from_user.id),
+            username=from_user.username or "",
+            first_name=from_user.first_name or "",
+            last_name=from_user.last_name or "",
+            role="guest"
+        )
+        return user, True
+
+
+# Мероприятия
+
+async def get_upcoming_events(limit: int = 3):
+    return await alist(Event.objects.filter(start_date__gte=timezone.now()).order_by('start_date')[:limit])
+
+
+async def get_events_on(date):
+    return await alist(Event.objects.filter(start_date__date=date))
+
+
+async def get_relevant_event():
+    """Мероприятие для доната: текущее, иначе последнее прошедшее, иначе ближайшее"""
+    now = timezone.now()
+    active = await Event.objects.filter(start_date__lte=now, end_date__gte=now).order_by('start_date').afirst()
+    if active:
+        return active
+    last_past = await Event.objects.filter(end_date__lt=now).order_by('-end_date').afirst()
+    if last_past:
+        return last_past
+    return await Event.objects.filter(start_date__gt=now).order_by('start_date').afirst()
+
+
+async def create_donation(event, user, amount):
+    return await Donation.objects.acreate(event=event, from_user=user, amount=amount)
+
+
+# Доклады и вопросы
+
+async def get_active_talk(event=None):
+    talks = Talk.objects.filter(is_active=True).select_related('speaker')
+    if event is not None:
+        talks = talks.filter(event=event)
+    return await talks.afirst()
+
+
+async def get_talk(talk_id):
+    return await Talk.objects.aget(id=talk_id)
+
+
+async def get_speaker_talks(speaker_telegram_id, event=None):
+    """Доклады спикера; без event - все доклады с вопросами, от новых к старым"""
+    talks = Talk.objects.filter(speaker__telegram_id=str(speaker_telegram_id))
+    if event is not None:
+        return await alist(talks.filter(event=event).order_by('start_time'))
+    return await alist(
+        talks.order_by('-start_time').prefetch_related(
+            Prefetch(
+                'questions',
+                queryset=Question.objects.select_related('from_user').order_by('-created_at'),
+                to_attr='question_list'
+            )
+        )
+    )
+
+
+async def get_speaker_active_talk(speaker_telegram_id, talk_id=None):
+    talks = Talk.objects.filter(speaker__telegram_id=str(speaker_telegram_id))
+    if talk_id is not None:
+        return await talks.filter(id=talk_id).afirst()
+    return await talks.filter(is_active=True).afirst()
+
+
+async def activate_talk(talk):
+    """Сделать доклад единственным активным на своём мероприятии"""
+    await Talk.objects.filter(event_id=talk.event_id, is_active=True).exclude(id=talk.id).aupdate(is_active=False)
+    talk.is_active = True
+    await talk.asave(update_fields=['is_active'])
+
+
+async def count_talk_questions(talk):
+    """Пара (всего вопросов, неотвеченных) по докладу"""
+    questions = Question.objects.filter(talk=talk)
+    return await questions.acount(), await questions.filter(is_answered=False).acount()
+
+
+async def count_answered_questions(speaker_telegram_id):
+    return await Question.objects.filter(
+        talk__speaker__telegram_id=str(speaker_telegram_id), is_answered=True
+    ).acount()
+
+
+async def get_unanswered_questions(speaker_telegram_id, limit: int = 10):
+    return await alist(
+        Question.objects.select_related('talk', 'from_user')
+        .filter(talk__speaker__telegram_id=str(speaker_telegram_id), is_answered=False)
+        .order_by('created_at')[:limit]
+    )
+
+
+async def get_question(question_id):
+    return await Question.objects.select_related('from_user', 'talk').aget(id=question_id)
+
+
+async def create_question(talk, user, text):
+    return await Question.objects.acreate(talk=talk, from_user=user, text=text, is_answered=False)
+
+
+# Заявки спикеров
+
+async def create_speaker_application(user, **fields):
+    return await SpeakerApplication.objects.acreate(user=user, **fields)
+
+
+async def get_speaker_applications(user):
+    return await alist(SpeakerApplication.objects.filter(user=user).order_by('-created_at'))
+
+
+# Знакомства
+
+async def get_profile(user, visible_only: bool = False):
+    profiles = NetworkingProfile.objects.filter(user=user)
+    if visible_only:
+        profiles = profiles.filter(is_visible=True)
+    return await profiles.afirst()
+
+
+async def get_profile_with_user(profile_id):
+    return await NetworkingProfile.objects.select_related('user').aget(id=profile_id)
+
+
+async def create_profile(user, **fields):
+    return await NetworkingProfile.objects.acreate(user=user, **fields)
+
+
+async def delete_profile(profile, user):
+    """Удалить анкету вместе с её просмотрами и просмотрами её владельца"""
+    await NetworkingInteraction.objects.filter(Q(profile=profile) | Q(viewer=user)).adelete()
+    await profile.adelete()
+
+
+def _unseen_profiles(user):
+    """Видимые чужие анкеты, которые пользователь ещё не просматривал"""
+    viewed = NetworkingInteraction.objects.filter(viewer=user).values('profile_id')
+    return NetworkingProfile.objects.filter(is_visible=True).exclude(user=user).exclude(id__in=viewed)
+
+
+async def count_other_profiles(user):
+    return await NetworkingProfile.objects.filter(is_visible=True).exclude(user=user).acount()
+
+
+async def count_unseen_profiles(user):
+    return await _unseen_profiles(user).acount()
+
+
+async def next_profile_to_browse(user, seed: int):
+    """Следующая непросмотренная анкета в порядке, заданном seed"""
+    return await (
+        _unseen_profiles(user)
+        .select_related('user')
+        .alias(browse_order=Mod(F('id') * seed, BROWSE_MODULUS))
+        .order_by('browse_order')
+        .afirst()
+    )
+
+
+async def record_view(user, profile):
+    await NetworkingInteraction.objects.aget_or_create(
+        viewer=user, profile=profile, defaults={'status': 'viewed'}
+    )
+
+
+async def reset_views(user):
+    await NetworkingInteraction.objects.filter(viewer=user).adelete()
+
+
+@in_db_pool
+def register_like(user, profile):
+    """Отметить интерес к анкете; при встречном интересе перевести оба лайка в мэтч
+
+    Выполняется одной транзакцией в пуле БД. Строки обоих пользователей
+    блокируются в порядке id, поэтому два встречных лайка, пришедших
+    одновременно, не разминутся и мэтч будет зафиксирован. Возвращает True
+    при взаимном интересе.
+    """
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(id__in=[user.id, profile.user_id]).order_by('id'))
+        NetworkingInteraction.objects.update_or_create(
+            viewer=user, profile=profile, defaults={'status': 'liked'}
+        )
+        counterpart = NetworkingInteraction.objects.filter(
+            viewer=profile.user_id, profile__user=user, status='liked'
+        )
+        if not counterpart.update(status='matched'):
+            return False
+        NetworkingInteraction.objects.filter(viewer=user, profile=profile).update(status='matched')
+        return True
+
+
+async def get_profile_stats(user, profile):
+    """Счётчики для «Моей анкеты»: (лайков получено, просмотрено анкет, мэтчей)"""
+    return (
+        await NetworkingInteraction.objects.filter(profile=profile, status='liked').acount(),
+        await NetworkingInteraction.objects.filter(viewer=user).acount(),
+        await NetworkingInteraction.objects.filter(viewer=user, status='matched').acount(),
+    )
+
+
+async def count_likes_received(profile):
+    return await NetworkingInteraction.objects.filter(profile=profile, status='liked').acount()
+
+
+async def get_likes_received(profile):
+    return await alist(
+        NetworkingInteraction.objects.filter(profile=profile, status='liked')
+        .select_related('viewer', 'viewer__networking_profile')
+        .order_by('-created_at')
+    )
+
+
+async def get_matches(user):
+    return await alist(
+        NetworkingInteraction.objects.filter(viewer=user, status='matched')
+        .select_related('profile')
+        .order_by('-created_at')
+    )
@@ -1,89 +1,207 @@
 import asyncio
+import heapq
 import logging
+from datetime import timedelta
 from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-from .notification_service import check_and_send_week_notifications, check_and_send_day_notifications
+from apscheduler.triggers.interval import IntervalTrigger
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from app_core.models import Event
+from app_core.signals import add_event_listener, remove_event_listener
+from .notification_service import (
+    get_reminder_due_times,
+    send_due_reminders
+)
+from .networking_digest import send_new_profiles_digest
+from .drain import drain_tasks
 
 logger = logging.getLogger(__name__)
 
 class NotificationScheduler:
-    def __init__(self, bot: Bot):
+    """Планировщик напоминаний по точному времени
+
+    Время каждого напоминания (начало мероприятия минус отступ) хранится в
+    куче; планировщик спит до ближайшего срока, а не опрашивает базу по
+    расписанию. Изменения мероприятий приходят через сигналы Event, а правки
+    из других процессов (админка) подхватываются периодической сверкой по
+    updated_at. Источник истины - флаги отправки в базе. Отправки идут в
+    отдельных задачах (_in_flight), поэтому остановка планировщика их не
+    обрывает, а даёт им завершиться (см. stop).
+    """
+
+    def __init__(self, bot: Bot, resync_interval: float | None = None):
         self.bot = bot
         self.scheduler = AsyncIOScheduler()
+        self.resync_interval = resync_interval or settings.REMINDER_RESYNC_INTERVAL
+        self._heap = []
+        # (event_id, kind) -> due_at; записи кучи, не совпадающие с индексом, устарели
+        self._due = {}
+        self._wakeup = asyncio.Event()
+        self._loop = None
+        self._task = None
+        self._synced_at = None
+        self._sending = set()
     
     async def start(self):
-        """Запуск планировщика с точным временем"""
+        """Загрузить ожидающие напоминания и запустить цикл планировщика"""
         try:
-            # Напоминания за неделю - каждый день в 10:00
-            self.scheduler.add_job(
-                self.send_week_notifications,
-                trigger=CronTrigger(hour=10, minute=0),
-                id='week_notifications',
-                replace_existing=True
-            )
+            self._loop = asyncio.get_running_loop()
+            self._synced_at = timezone.now()
+            self._heap, self._due = [], {}
+            self.scheduler = AsyncIOScheduler()
+            for event in await sync_to_async(list)(self._pending_events()):
+                self._schedule(event.id, get_reminder_due_times(event))
+            add_event_listener(self.on_event_changed)
+            self._task = asyncio.create_task(self._run())
             
-            # Напоминания за день - каждый день в 18:00
             self.scheduler.add_job(
-                self.send_day_notifications,
-                trigger=CronTrigger(hour=18, minute=0),
-                id='day_notifications', 
+                self.resync,
+                trigger=IntervalTrigger(seconds=self.resync_interval),
+                id='reminders_resync',
                 replace_existing=True
             )
-            
-            # Быстрая проверка при запуске (для отладки)
             self.scheduler.add_job(
-                self.quick_check,
-                trigger='date',
-                id='quick_check'
+                self.send_networking_digest,
+                trigger=IntervalTrigger(seconds=settings.NETWORKING_DIGEST_INTERVAL),
+                id='networking_digest',
+                replace_existing=True
             )
-            
             self.scheduler.start()
             logger.info("✅ Планировщик уведомлений запущен")
-            logger.info("📅 Напоминания за неделю: ежедневно в 10:00")
-            logger.info("📅 Напоминания за день: ежедневно в 18:00")
+            logger.info(f"📅 Ожидает напоминаний: {len(self._due)}, ближайшее: {self.next_due_at or '-'}")
             
         except Exception as e:
             logger.error(f"❌ Ошибка запуска планировщика: {e}")
     
-    async def send_week_notifications(self):
-        """Отправка напоминаний за неделю"""
+    @staticmethod
+    def _pending_events():
+        return Event.objects.filter(start_date__gt=timezone.now()).filter(
+            Q(notification_sent_week=False) | Q(notification_sent_day=False)
+        )
+    
+    @property
+    def next_due_at(self):
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+    
+    def _schedule(self, event_id, due_times):
+        """Заменить напоминания мероприятия новыми сроками"""
+        self._unschedule(event_id)
+        for kind, due_at in due_times.items():
+            self._due[(event_id, kind)] = due_at
+            heapq.heappush(self._heap, (due_at, event_id, kind))
+        self._wakeup.set()
+    
+    def _unschedule(self, event_id):
+        for key in [key for key in self._due if key[0] == event_id]:
+            del self._due[key]
+    
+    def on_event_changed(self, event, deleted=False):
+        """Обработчик сигналов Event; может вызываться из любого потока"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        if deleted:
+            self._loop.call_soon_threadsafe(self._unschedule, event.id)
+        else:
+            self._loop.call_soon_threadsafe(self._schedule, event.id, get_reminder_due_times(event))
+    
+    def _drop_stale(self):
+        while self._heap:
+            due_at, event_id, kind = self._heap[0]
+            if self._due.get((event_id, kind)) == due_at:
+                return
+            heapq.heappop(self._heap)
+    
+    def _pop_due(self, now):
+        """Снять с кучи наступившие напоминания; вернуть True, если они были"""
+        fired = False
+        while self._heap and self._heap[0][0] <= now:
+            due_at, event_id, kind = heapq.heappop(self._heap)
+            if self._due.get((event_id, kind)) == due_at:
+                del self._due[(event_id, kind)]
+                fired = True
+        return fired
+    
+    async def _run(self):
+        while True:
+            if self._pop_due(timezone.now()):
+                await self.send_reminders()
+                continue
+            
+            next_due_at = self.next_due_at
+            timeout = None
+            if next_due_at is not None:
+                timeout = max(0.0, (next_due_at - timezone.now()).total_seconds())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def send_reminders(self):
+        """Отправить все напоминания, срок которых наступил"""
         try:
-            logger.info("🔔 Проверка напоминаний за неделю...")
-            sent_count = await check_and_send_week_notifications(self.bot)
+            logger.info("🔔 Наступило время напоминаний...")
+            sent_count = await self._in_flight(send_due_reminders(self.bot))
             if sent_count > 0:
-                logger.info(f"✅ Отправлено напоминаний за неделю: {sent_count}")
-            else:
-                logger.info("ℹ️ Нет мероприятий для напоминания за неделю")
+                logger.info(f"✅ Отправлено напоминаний: {sent_count}")
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки напоминаний за неделю: {e}")
+            logger.error(f"❌ Ошибка отправки напоминаний: {e}")
     
-    async def send_day_notifications(self):
-        """Отправка напоминаний за день"""
+    async def send_networking_digest(self):
+        """Сводка о новых анкетах знакомств"""
         try:
-            logger.info("🔔 Проверка напоминаний за день...")
-            sent_count = await check_and_send_day_notifications(self.bot)
-            if sent_count > 0:
-                logger.info(f"✅ Отправлено напоминаний за день: {sent_count}")
-            else:
-                logger.info("ℹ️ Нет мероприятий для напоминания за день")
+            await self._in_flight(send_new_profiles_digest(self.bot))
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки напоминаний за день: {e}")
+            logger.error(f"❌ Ошибка отправки сводки о новых анкетах: {e}")
     
-    async def quick_check(self):
-        """Быстрая проверка при запуске (для отладки)"""
+    async def resync(self):
+        """Подхватить мероприятия, изменённые в других процессах
+
+        Заодно отправляет напоминания, которые не удалось отправить в срок.
+        """
         try:
-            logger.info("🔍 Быстрая проверка уведомлений при запуске...")
-            week_count = await check_and_send_week_notifications(self.bot)
-            day_count = await check_and_send_day_notifications(self.bot)
-            
-            if week_count > 0 or day_count > 0:
-                logger.info(f"🎯 При запуске отправлено: {week_count} за неделю, {day_count} за день")
+            since = self._synced_at - timedelta(seconds=1)
+            self._synced_at = timezone.now()
+            changed = await sync_to_async(list)(Event.objects.filter(updated_at__gte=since))
+            for event in changed:
+                self._schedule(event.id, get_reminder_due_times(event))
+            if changed:
+                logger.info(f"🔄 Обновлены напоминания для мероприятий: {len(changed)}")
+            await self._in_flight(send_due_reminders(self.bot))
         except Exception as e:
-            logger.error(f"❌ Ошибка быстрой проверки: {e}")
+            logger.error(f"❌ Ошибка сверки напоминаний: {e}")
+    
+    async def _in_flight(self, coro):
+        """Выполнить отправку в отдельной задаче, которую не прервёт отмена вызывающего"""
+        task = asyncio.create_task(coro)
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+        return await asyncio.shield(task)
     
-    async def stop(self):
-        """Остановить планировщик"""
+    async def stop(self, timeout: float | None = None):
+        """Остановить планировщик, дав начатым отправкам завершиться
+
+        Новые напоминания и сводки больше не запускаются. Отправки, не
+        закончившиеся за timeout секунд (BOT_SHUTDOWN_TIMEOUT), прерываются:
+        неотправленные сообщения сохраняются и уйдут после перезапуска.
+        """
+        remove_event_listener(self.on_event_changed)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.scheduler.running:
+            self.scheduler.pause()
+        await drain_tasks(
+            self._sending, timeout if timeout is not None else settings.BOT_SHUTDOWN_TIMEOUT, "Отправки планировщика"
+        )
         if self.scheduler.running:
             self.scheduler.shutdown(wait=False)
-        logger.info("🛑 Планировщик уведомлений остановлен")
\ No newline at end of file
+        logger.info("🛑 Планировщик уведомлений остановлен")
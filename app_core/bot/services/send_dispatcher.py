@@ -0,0 +1,282 @@
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    EditMessageCaption,
+    EditMessageLiveLocation,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    SendChatAction,
+)
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+PRIORITIES = (INTERACTIVE, BULK)
+
+# Класс отправки текущей задачи; ответы обработчиков по умолчанию интерактивные
+send_priority = contextvars.ContextVar('send_priority', default=INTERACTIVE)
+
+# Запросы, которые не создают новых сообщений в чате и не ждут его очереди
+UNPACED_METHODS = (
+    EditMessageText,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageLiveLocation,
+    SendChatAction,
+)
+
+
+class PriorityRateLimiter:
+    """Token bucket с приоритетами: интерактивные запросы получают токены первыми
+
+    Массовые отправки дополнительно ограничены долей bulk_share общего
+    лимита, поэтому даже во время рассылки остаётся запас для ответов
+    пользователям, а при всплеске ответов рассылка уступает им токены.
+    """
+
+    def __init__(self, rate: float, burst: int | None = None, bulk_share: float | None = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.bulk_rate = rate * (bulk_share or settings.TELEGRAM_BULK_SHARE)
+        self.bulk_burst = max(1, int(self.burst * (bulk_share or settings.TELEGRAM_BULK_SHARE)))
+        self._tokens = float(self.burst)
+        self._bulk_tokens = float(self.bulk_burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = {priority: deque() for priority in PRIORITIES}
+        self._arrived = asyncio.Event()
+        self._granter = None
+
+    def queue_depth(self, priority: str) -> int:
+        return sum(1 for waiter in self._waiters[priority] if not waiter.done())
+
+    async def acquire(self, priority: str = INTERACTIVE):
+        """Дождаться токена в очереди своего класса"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        self._arrived.set()
+        if self._granter is None or self._granter.done():
+            self._granter = asyncio.create_task(self._grant())
+        await waiter
+
+    def pause(self, seconds: float):
+        """Остановить выдачу токенов для всех отправителей (flood wait)"""
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = self._bulk_tokens = 0.0
+        self._updated_at = max(self._updated_at, self._paused_until)
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._bulk_tokens = min(self.bulk_burst, self._bulk_tokens + elapsed * self.bulk_rate)
+        self._updated_at = max(self._updated_at, now)
+
+    def _next_waiter(self, priority: str):
+        waiters = self._waiters[priority]
+        while waiters and waiters[0].done():
+            waiters.popleft()
+        return waiters[0] if waiters else None
+
+    async def _grant(self):
+        """Раздавать токены ожидающим, пока очереди не опустеют"""
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            self._refill(now)
+            interactive = self._next_waiter(INTERACTIVE)
+            bulk = self._next_waiter(BULK)
+            if interactive is None and bulk is None:
+                return
+
+            if interactive is not None and self._tokens >= 1:
+                self._tokens -= 1
+                self._waiters[INTERACTIVE].popleft().set_result(None)
+                continue
+            if interactive is None and self._tokens >= 1 and self._bulk_tokens >= 1:
+                self._tokens -= 1
+                self._bulk_tokens -= 1
+                self._waiters[BULK].popleft().set_result(None)
+                continue
+
+            delay = (1 - self._tokens) / self.rate
+            if interactive is None:
+                delay = max(delay, (1 - self._bulk_tokens) / self.bulk_rate)
+            # Новый интерактивный запрос прерывает ожидание токена для рассылки
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), max(delay, 0.0))
+            except asyncio.TimeoutError:
+                pass
+
+
+class PriorityStats:
+    """Глубина очереди и время ожидания запросов одного класса"""
+
+    __slots__ = ('queued', 'sent', 'total_wait', 'max_wait')
+
+    def __init__(self):
+        self.queued = 0
+        self.sent = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        self.sent += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def as_dict(self):
+        return {
+            'queued': self.queued,
+            'sent': self.sent,
+            'avg_wait': self.total_wait / self.sent if self.sent else 0.0,
+            'max_wait': self.max_wait,
+        }
+
+
+class ChatLane:
+    """Очередь отправки в один чат: FIFO-замок и token bucket сообщений в чат"""
+
+    __slots__ = ('lock', 'tokens', 'updated_at', 'users')
+
+    def __init__(self, burst: int):
+        self.lock = asyncio.Lock()
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.users = 0
+
+
+class SendDispatcher(BaseRequestMiddleware):
+    """Исходящие запросы к Telegram: очередь на каждый чат и общий лимит
+
+    Регистрируется на сессии бота, поэтому через него проходят ответы
+    обработчиков, напоминания и рассылки. Запросы в один чат выполняются
+    строго по очереди: до chat_burst сообщений подряд, дальше не чаще
+    chat_rate в секунду, - после чего занимают токен общего лимита в очереди
+    своего класса (send_priority): ответы пользователям обслуживаются раньше
+    массовых отправок. Правки сообщений и статус «печатает»
+    (UNPACED_METHODS) очередь чата не ждут. Очереди простаивающих чатов
+    удаляются.
+    """
+
+    def __init__(self, rate: float | None = None, chat_rate: float | None = None, chat_burst: int | None = None):
+        self.limiter = PriorityRateLimiter(rate or settings.TELEGRAM_BROADCAST_RATE)
+        self.chat_rate = chat_rate or settings.TELEGRAM_CHAT_RATE
+        self.chat_burst = chat_burst or settings.TELEGRAM_CHAT_BURST
+        self._lanes: dict[int | str, ChatLane] = {}
+        self._stats = {priority: PriorityStats() for priority in PRIORITIES}
+        self._logged_at = time.monotonic()
+
+    @property
+    def lanes_count(self):
+        return len(self._lanes)
+
+    def stats(self):
+        """Глубина очереди и время ожидания (в секундах) по классам отправки"""
+        return {priority: stats.as_dict() for priority, stats in self._stats.items()}
+
+    async def __call__(self, make_request, bot: Bot, method):
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        priority = send_priority.get()
+        stats = self._stats[priority]
+        queued_at = time.monotonic()
+        stats.queued += 1
+        if isinstance(method, UNPACED_METHODS):
+            try:
+                await self.limiter.acquire(priority)
+            finally:
+                stats.queued -= 1
+            stats.record(time.monotonic() - queued_at)
+            return await self._request(make_request, bot, method)
+
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = ChatLane(self.chat_burst)
+        lane.users += 1
+        try:
+            async with lane.lock:
+                while (delay := self._take_chat_token(lane)) > 0:
+                    await asyncio.sleep(delay)
+                await self.limiter.acquire(priority)
+                stats.queued -= 1
+                stats.record(time.monotonic() - queued_at)
+                queued_at = None
+                return await self._request(make_request, bot, method)
+        finally:
+            if queued_at is not None:
+                stats.queued -= 1
+            lane.users -= 1
+            if lane.users == 0:
+                self._reclaim_later(chat_id, lane)
+
+    async def _request(self, make_request, bot: Bot, method):
+        self._log_stats()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter as e:
+            self.limiter.pause(e.retry_after)
+            raise
+
+    def _refill_chat(self, lane: ChatLane, now: float):
+        lane.tokens = min(self.chat_burst, lane.tokens + (now - lane.updated_at) * self.chat_rate)
+        lane.updated_at = now
+
+    def _take_chat_token(self, lane: ChatLane) -> float:
+        """Занять токен чата; вернуть 0 или сколько секунд ждать следующего"""
+        self._refill_chat(lane, time.monotonic())
+        if lane.tokens >= 1:
+            lane.tokens -= 1
+            return 0.0
+        return (1 - lane.tokens) / self.chat_rate
+
+    def _log_stats(self):
+        now = time.monotonic()
+        if now - self._logged_at < settings.TELEGRAM_SEND_STATS_INTERVAL:
+            return
+        self._logged_at = now
+        summary = ", ".join(
+            f"{priority}: в очереди {stats['queued']}, отправлено {stats['sent']}, "
+            f"ожидание ср. {stats['avg_wait']:.2f} с / макс. {stats['max_wait']:.2f} с"
+            for priority, stats in self.stats().items()
+        )
+        logger.info(f"📮 Очереди отправки ({self.lanes_count} чатов) - {summary}")
+
+    def _reclaim_later(self, chat_id, lane: ChatLane):
+        """Удалить очередь чата, когда её bucket наполнится и она останется пустой"""
+        self._refill_chat(lane, time.monotonic())
+        delay = (self.chat_burst - lane.tokens) / self.chat_rate
+        if delay <= 0:
+            self._reclaim(chat_id, lane)
+        else:
+            asyncio.get_running_loop().call_later(delay, self._reclaim, chat_id, lane)
+
+    def _reclaim(self, chat_id, lane: ChatLane):
+        if lane.users == 0 and self._lanes.get(chat_id) is lane:
+            del self._lanes[chat_id]
+
+
+def get_send_dispatcher(bot: Bot) -> SendDispatcher | None:
+    """SendDispatcher, зарегистрированный на сессии бота, если он есть"""
+    session = getattr(bot, 'session', None)
+    for middleware in getattr(session, 'middleware', ()):
+        if isinstance(middleware, SendDispatcher):
+            return middleware
+    return None
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import ssl
+
+import aiogram
+import certifi
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiohttp import ClientSession, TCPConnector
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from django.conf import settings
+
+from .send_dispatcher import SendDispatcher
+
+logger = logging.getLogger(__name__)
+
+_bot: Bot | None = None
+
+
+class PooledSession(AiohttpSession):
+    """Сессия aiogram со своим пулом соединений: не больше limit, простаивающие живут keepalive_timeout секунд
+
+    Соединитель создаётся здесь же, а не через настройки AiohttpSession,
+    поэтому параметры пула не зависят от внутреннего устройства aiogram.
+    """
+
+    def __init__(self, limit: int, keepalive_timeout: float, **kwargs):
+        super().__init__(**kwargs)
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self._client: ClientSession | None = None
+
+    async def create_session(self) -> ClientSession:
+        if self._client is None or self._client.closed:
+            self._client = ClientSession(
+                connector=TCPConnector(
+                    ssl=ssl.create_default_context(cafile=certifi.where()),
+                    limit=self.limit,
+                    keepalive_timeout=self.keepalive_timeout,
+                    ttl_dns_cache=3600,
+                ),
+                headers={"User-Agent": f"aiogram/{aiogram.__version__}"},
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None and not self._client.closed:
+            await self._client.close()
+            # Дать SSL-соединениям закрыться (как в AiohttpSession.close)
+            await asyncio.sleep(0.25)
+
+
+def create_bot(token: str | None = None, api_server: str | None = None) -> Bot:
+    """Новый Bot с ограниченным пулом keep-alive соединений и очередями отправки
+
+    api_server - адрес собственного сервера Bot API вместо api.telegram.org.
+    """
+    api_server = api_server or settings.TELEGRAM_API_SERVER
+    session = PooledSession(
+        api=TelegramAPIServer.from_base(api_server) if api_server else PRODUCTION,
+        limit=settings.TELEGRAM_CONNECTION_LIMIT,
+        keepalive_timeout=settings.TELEGRAM_KEEPALIVE_TIMEOUT,
+    )
+    session.middleware(SendDispatcher())
+    return Bot(token=token or settings.TELEGRAM_BOT_TOKEN, session=session)
+
+
+def get_bot(token: str | None = None) -> Bot:
+    """Общий Bot процесса
+
+    Диспетчер, планировщик и фоновые задачи процесса бота используют одну
+    HTTP-сессию и один SendDispatcher, поэтому соединения с Telegram
+    переиспользуются, их число не превышает TELEGRAM_CONNECTION_LIMIT, а
+    лимит TELEGRAM_BROADCAST_RATE общий для всех отправок процесса.
+    """
+    global _bot
+    if _bot is None:
+        _bot = create_bot(token)
+        logger.info(f"🔌 Создан общий клиент Telegram (до {settings.TELEGRAM_CONNECTION_LIMIT} соединений)")
+    return _bot
+
+
+async def close_bot():
+    """Закрыть общую сессию (при остановке процесса или цикла событий)"""
+    global _bot
+    if _bot is not None:
+        await _bot.session.close()
+        _bot = None
@@ -0,0 +1,89 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from app_core.models import User
+from .delivery_health import aclear_delivery_health
+from .repository import get_or_create_user
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """Ограниченный LRU-кэш пользователей по Telegram id с временем жизни записей
+
+    Записи сбрасываются сигналом при сохранении или удалении User в этом
+    процессе, а пользователи, изменённые в других процессах (админка), -
+    сверкой по updated_at не реже раза в sync_interval секунд.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, sync_interval: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sync_interval = sync_interval or settings.USER_CACHE_SYNC_INTERVAL
+        self._users = OrderedDict()
+        self._synced_at = time.monotonic()
+        self._synced_since = timezone.now()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._users)
+
+    def get(self, telegram_id):
+        key = str(telegram_id)
+        entry = self._users.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            self._users.pop(key, None)
+            self.misses += 1
+            return None
+        self._users.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, user):
+        key = str(user.telegram_id)
+        self._users[key] = (user, time.monotonic() + self.ttl)
+        self._users.move_to_end(key)
+        while len(self._users) > self.maxsize:
+            self._users.popitem(last=False)
+
+    def invalidate(self, telegram_id):
+        self._users.pop(str(telegram_id), None)
+
+    def clear(self):
+        self._users.clear()
+
+    async def sync(self):
+        """Сбросить записи пользователей, изменённых после прошлой сверки"""
+        if time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = time.monotonic()
+        since, self._synced_since = self._synced_since, timezone.now()
+        if not self._users:
+            return
+        changed = User.objects.filter(updated_at__gte=since - timedelta(seconds=1)).values_list('telegram_id', flat=True)
+        async for telegram_id in changed:
+            self.invalidate(telegram_id)
+
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+
+
+async def resolve_user(from_user):
+    """Пользователь для отправителя апдейта: из кэша или из базы"""
+    await user_cache.sync()
+    user = user_cache.get(from_user.id)
+    if user is None:
+        user, created = await get_or_create_user(from_user)
+        if created:
+            logger.info(f"👤 Новый пользователь: {user}")
+        else:
+            # Промах кэша: пользователь давно не писал боту
+            await aclear_delivery_health(user)
+        user_cache.put(user)
+    return user
@@ -0,0 +1,205 @@
+"""Обработка апдейтов в нескольких процессах с сохранением порядка для каждого пользователя
+
+Главный процесс получает апдейты из Telegram и раскладывает их по очередям
+процессов-обработчиков по from_user.id: все апдейты одного пользователя
+попадают в один процесс и обрабатываются по порядку, разные пользователи -
+параллельно, в том числе внутри процесса (ConcurrentDispatcher). Состояния
+диалогов общие через хранилище FSM в базе (FSM_STORAGE=db), планировщик
+уведомлений выбирает ведущего среди обработчиков, а общий лимит отправки
+делится между ними поровну.
+"""
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramServerError
+from aiogram.types import Update
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Сколько апдейтов может ждать в очереди одного обработчика
+WORKER_QUEUE_SIZE = 1000
+# Как часто обработчик проверяет очередь, пока в ней пусто, секунд
+WORKER_POLL_TIMEOUT = 1.0
+# Long polling getUpdates, секунд
+POLLING_TIMEOUT = 30
+
+
+def shard_key(payload: dict) -> int:
+    """Telegram id отправителя апдейта; для апдейтов без отправителя - id чата"""
+    for name, event in payload.items():
+        if name == 'update_id' or not isinstance(event, dict):
+            continue
+        sender = event.get('from') or event.get('user') or event.get('chat') or event.get('message', {}).get('chat')
+        return sender.get('id', 0) if sender else 0
+    return 0
+
+
+def _worker_main(index: int, updates, ready, options: dict):
+    """Точка входа процесса-обработчика"""
+    # Останавливает обработчиков главный процесс: дописывает в очереди None
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pythonmeetup_service.settings')
+    import django
+    django.setup()
+
+    from django.db import connections
+    for name, value in options.get('settings', {}).items():
+        setattr(settings, name, value)
+    if options.get('database_name'):
+        # Настройки общие для соединений всех потоков, в том числе пула БД
+        connections.settings['default']['NAME'] = options['database_name']
+    logging.basicConfig(level=options.get('log_level', logging.INFO))
+    logging.getLogger('app_core').setLevel(options.get('log_level', logging.INFO))
+
+    asyncio.run(_serve_shard(index, updates, ready, options))
+
+
+async def _serve_shard(index: int, updates, ready, options: dict):
+    from .bot_main import setup_bot, shutdown_bot, start_scheduler
+
+    bot, dp = await setup_bot(options['token'])
+    scheduler_task = start_scheduler(bot) if options.get('scheduler', True) else None
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+    ready.set()
+    logger.info(f"🧩 Обработчик апдейтов {index} запущен (pid {os.getpid()})")
+    try:
+        while True:
+            try:
+                payload = await loop.run_in_executor(None, updates.get, True, WORKER_POLL_TIMEOUT)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    logger.warning(f"⚠️ Главный процесс завершился, обработчик апдейтов {index} останавливается")
+                    break
+                continue
+            if payload is None:
+                break
+            # Не забираем из очереди больше, чем успеваем обработать
+            await dp.wait_below(dp.concurrency * 2)
+            dp.feed_in_background(bot, Update.model_validate(payload, context={'bot': bot}))
+    finally:
+        await shutdown_bot(dp, scheduler_task)
+        logger.info(f"🛑 Обработчик апдейтов {index} остановлен")
+
+
+class ShardedDispatcher:
+    """Процессы-обработчики и раскладка апдейтов по ним
+
+    workers процессов запускаются через spawn. Каждый получает долю
+    TELEGRAM_BROADCAST_RATE, чтобы вместе они не превысили лимит бота.
+    worker_settings дополняют настройки обработчиков, database_name
+    подменяет имя базы (для замеров во временной базе).
+    """
+
+    def __init__(self, token: str, workers: int, worker_settings: dict | None = None,
+                 database_name: str | None = None, scheduler: bool = True, log_level: int = logging.INFO):
+        self.workers = workers
+        self.options = {
+            'token': token,
+            'settings': {
+                'TELEGRAM_BROADCAST_RATE': settings.TELEGRAM_BROADCAST_RATE / workers,
+                **(worker_settings or {}),
+            },
+            'database_name': database_name,
+            'scheduler': scheduler,
+            'log_level': log_level,
+        }
+        self._context = multiprocessing.get_context('spawn')
+        self._queues = []
+        self._processes = []
+
+    def start(self):
+        """Запустить обработчиков и дождаться их готовности"""
+        ready_events = []
+        for index in range(self.workers):
+            updates = self._context.Queue(WORKER_QUEUE_SIZE)
+            ready = self._context.Event()
+            process = self._context.Process(
+                target=_worker_main, args=(index, updates, ready, self.options), name=f'bot-worker-{index}'
+            )
+            process.start()
+            self._queues.append(updates)
+            self._processes.append(process)
+            ready_events.append(ready)
+        for ready, process in zip(ready_events, self._processes):
+            while not ready.wait(1):
+                if not process.is_alive():
+                    raise RuntimeError(f"Обработчик апдейтов {process.name} завершился при запуске")
+        logger.info(f"🧩 Запущено обработчиков апдейтов: {self.workers}")
+
+    async def put(self, payload: dict):
+        """Передать апдейт обработчику его пользователя; ждёт, если очередь обработчика полна"""
+        updates = self._queues[shard_key(payload) % self.workers]
+        try:
+            updates.put_nowait(payload)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, updates.put, payload)
+
+    async def poll(self, bot: Bot, allowed_updates: list[str] | None = None):
+        """Получать апдейты long polling и раскладывать их по обработчикам"""
+        await bot.delete_webhook()
+        offset = None
+        failures = 0
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset, timeout=POLLING_TIMEOUT, allowed_updates=allowed_updates,
+                    request_timeout=POLLING_TIMEOUT + 10,
+                )
+            except (TelegramNetworkError, TelegramServerError) as e:
+                failures += 1
+                delay = min(settings.TELEGRAM_RETRY_MAX_DELAY, settings.TELEGRAM_RETRY_BASE_DELAY * 2 ** failures)
+                logger.warning(f"⚠️ Ошибка получения апдейтов: {e}; повтор через {delay:.0f} с")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            for update in updates:
+                await self.put(update.model_dump(mode='json', exclude_none=True, by_alias=True))
+                offset = update.update_id + 1
+
+    async def stop(self):
+        """Дать обработчикам разобрать очереди и дождаться их завершения
+
+        Апдейты в очередях уже получены из Telegram, поэтому обработчики
+        разбирают их до конца, а затем завершают начатое (shutdown_bot).
+        """
+        loop = asyncio.get_running_loop()
+        for updates in self._queues:
+            await loop.run_in_executor(None, updates.put, None)
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join)
+        self._queues, self._processes = [], []
+
+
+async def run_sharded(token: str, workers: int):
+    """Long polling в главном процессе, обработка в workers процессах"""
+    from .bot_main import setup_bot
+    from .services.telegram_client import close_bot
+
+    bot, dp = await setup_bot(token)
+    sharded = ShardedDispatcher(token, workers)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, sharded.start)
+    polling = asyncio.create_task(sharded.poll(bot, dp.resolve_used_update_types()))
+    # SIGTERM (остановка сервиса) останавливает приём апдейтов так же, как Ctrl+C
+    with contextlib.suppress(NotImplementedError):
+        loop.add_signal_handler(signal.SIGTERM, polling.cancel)
+    try:
+        logger.info(f"Бот запущен: {workers} обработчиков апдейтов")
+        await polling
+    except asyncio.CancelledError:
+        logger.info("🚦 Остановка бота: новые апдейты не принимаются, обработчики завершают начатое")
+    finally:
+        with contextlib.suppress(NotImplementedError):
+            loop.remove_signal_handler(signal.SIGTERM)
+        await sharded.stop()
+        await close_bot()
+        logger.info("Бот остановлен")
@@ -0,0 +1,113 @@
+"""Режим webhook: Telegram присылает апдейты POST-запросами на ASGI-приложение проекта
+
+Адрес приёма - TELEGRAM_WEBHOOK_PATH рядом с админкой (app_core.views.telegram_webhook).
+Бот, диспетчер и планировщик живут в процессе ASGI-сервера: запускаются при
+его старте (ASGI lifespan), а если сервер lifespan не поддерживает - при
+первом апдейте. Webhook регистрируется в Telegram командой runbot --webhook.
+"""
+import asyncio
+import logging
+
+from aiogram.types import Update
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_enabled() -> bool:
+    return bool(settings.TELEGRAM_WEBHOOK_SECRET)
+
+
+def get_webhook_url() -> str:
+    return f"{settings.TELEGRAM_WEBHOOK_BASE_URL.rstrip('/')}/{settings.TELEGRAM_WEBHOOK_PATH.lstrip('/')}"
+
+
+class WebhookRuntime:
+    """Бот и диспетчер процесса ASGI-сервера
+
+    Апдейт обрабатывается в фоновой задаче, поэтому Telegram получает ответ
+    сразу, не дожидаясь обработчиков. После начала остановки апдейты не
+    принимаются (stopping), и Telegram повторит их доставку новому процессу.
+    """
+
+    def __init__(self):
+        self.bot = None
+        self.dp = None
+        self.stopping = False
+        self._scheduler_task = None
+        self._lock = None
+
+    async def start(self):
+        if self.dp is not None or self.stopping:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.dp is not None or self.stopping:
+                return
+            from .bot_main import setup_bot, start_scheduler
+
+            bot, dp = await setup_bot(settings.TELEGRAM_BOT_TOKEN)
+            self._scheduler_task = start_scheduler(bot)
+            self.bot, self.dp = bot, dp
+            logger.info("🌐 Бот запущен в режиме webhook")
+
+    def feed(self, payload: dict):
+        """Разобрать апдейт и поставить его обработку в фон; ValueError, если апдейт некорректен"""
+        update = Update.model_validate(payload, context={'bot': self.bot})
+        self.dp.feed_in_background(self.bot, update)
+
+    async def stop(self):
+        """Перестать принимать апдейты, дать начатой работе завершиться и освободить ресурсы бота"""
+        self.stopping = True
+        if self._lock is None:
+            return
+        from .bot_main import shutdown_bot
+
+        # Запуск, если он ещё идёт, завершится раньше остановки
+        async with self._lock:
+            if self.dp is None:
+                return
+            await shutdown_bot(self.dp, self._scheduler_task)
+            self.bot = self.dp = self._scheduler_task = None
+        logger.info("🛑 Бот в режиме webhook остановлен")
+
+
+runtime = WebhookRuntime()
+
+
+async def lifespan(scope, receive, send):
+    """Обработчик ASGI lifespan: запуск и остановка бота вместе с сервером"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                if webhook_enabled():
+                    await runtime.start()
+            except Exception as e:
+                logger.error(f"❌ Не удалось запустить бота в режиме webhook: {e}", exc_info=True)
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await runtime.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def set_webhook(token: str) -> str:
+    """Зарегистрировать webhook в Telegram; вернуть его адрес"""
+    from .bot_main import setup_bot
+    from .services.telegram_client import close_bot
+
+    bot, dp = await setup_bot(token)
+    url = get_webhook_url()
+    try:
+        await bot.set_webhook(
+            url,
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    finally:
+        await close_bot()
+    return url
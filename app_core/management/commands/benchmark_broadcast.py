@@ -0,0 +1,50 @@
+import logging
+from django.core.management.base import BaseCommand
+from django.db import connection
+from app_core.benchmarks.broadcast import run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет скорость рассылок и напоминаний на локальной замене Telegram Bot API. "
+        "Работает во временной тестовой базе данных и без доступа к сети"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000],
+                            help="Размеры аудиторий (по умолчанию 1000 10000)")
+        parser.add_argument("--scenario", choices=["mass", "reminders", "all"], default="all",
+                            help="mass - рассылка из админки, reminders - напоминания о мероприятии")
+        parser.add_argument("--rate", type=float, default=1000.0,
+                            help="Общий лимит сообщений в секунду (по умолчанию 1000, у Telegram около 30)")
+        parser.add_argument("--concurrency", type=int, default=50, help="Одновременных отправок")
+        parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа Bot API, с")
+        parser.add_argument("--jitter", type=float, default=0.02, help="Случайная добавка к задержке, с")
+        parser.add_argument("--retry-after-ratio", type=float, default=0.0005,
+                            help="Доля запросов с ответом 429 retry_after")
+        parser.add_argument("--retry-after", type=int, default=1, help="Значение retry_after в ответе 429, с")
+        parser.add_argument("--blocked-ratio", type=float, default=0.02,
+                            help="Доля пользователей, заблокировавших бота (ответ 403)")
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.WARNING)
+        logging.getLogger("app_core").setLevel(logging.ERROR)
+
+        scenarios = ["mass", "reminders"] if options["scenario"] == "all" else [options["scenario"]]
+        api_options = {
+            "latency": options["latency"],
+            "jitter": options["jitter"],
+            "retry_after_ratio": options["retry_after_ratio"],
+            "retry_after": options["retry_after"],
+            "blocked_ratio": options["blocked_ratio"],
+        }
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            run_benchmark(
+                scenarios, options["users"], api_options,
+                rate=options["rate"], concurrency=options["concurrency"],
+                report=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,49 @@
+import logging
+import os
+import tempfile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from app_core.benchmarks.updates import run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет, как растёт число обработанных апдейтов в секунду с числом процессов-обработчиков "
+        "и одновременных обработчиков в процессе. "
+        "Работает во временной тестовой базе данных и на локальной замене Telegram Bot API"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                            help="Числа процессов-обработчиков (по умолчанию 1 2 4)")
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 100],
+                            help="Одновременных обработчиков в процессе (по умолчанию 1 100)")
+        parser.add_argument("--users", type=int, default=200, help="Участников, одновременно жмущих кнопки")
+        parser.add_argument("--per-user", type=int, default=3, help="Апдейтов от каждого участника")
+        parser.add_argument("--rate", type=float, default=10000.0,
+                            help="Общий лимит сообщений в секунду (по умолчанию 10000, у Telegram около 30)")
+        parser.add_argument("--chat-rate", type=float, default=100.0,
+                            help="Лимит сообщений в секунду на чат (по умолчанию 100, у Telegram около 1)")
+        parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа Bot API, с")
+        parser.add_argument("--jitter", type=float, default=0.02, help="Случайная добавка к задержке, с")
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.WARNING)
+        logging.getLogger("app_core").setLevel(logging.ERROR)
+
+        api_options = {"latency": options["latency"], "jitter": options["jitter"]}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Процессы-обработчики не видят SQLite в памяти, поэтому тестовая база - файл
+            if connection.vendor == "sqlite":
+                connection.settings_dict["TEST"]["NAME"] = os.path.join(tmp_dir, "benchmark.sqlite3")
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                run_benchmark(
+                    options["workers"], options["concurrency"], options["users"], options["per_user"], api_options,
+                    database_name=connection.settings_dict["NAME"],
+                    rate=options["rate"], chat_rate=options["chat_rate"],
+                    report=self.stdout.write,
+                )
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
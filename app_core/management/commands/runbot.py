@@ -1,4 +1,7 @@
+import asyncio
 import os
+import re
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from app_core.bot.bot_main import run as run_bot
 
@@ -6,9 +9,47 @@ from app_core.bot.bot_main import run as run_bot
 class Command(BaseCommand):
     help = "Запускает Telegram-бота (aiogram). Токен берётся из переменной окружения TELEGRAM_BOT_TOKEN"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--webhook",
+            action="store_true",
+            help="Зарегистрировать webhook по TELEGRAM_WEBHOOK_BASE_URL и завершиться; "
+                 "апдейты принимает ASGI-приложение проекта",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.BOT_WORKERS,
+            help="Число процессов-обработчиков апдейтов (по умолчанию BOT_WORKERS). "
+                 "Апдейты одного пользователя всегда обрабатывает один процесс",
+        )
+
     def handle(self, *args, **options):
         token = os.getenv("TELEGRAM_BOT_TOKEN")
         if not token:
             raise CommandError("TELEGRAM_BOT_TOKEN не задан в .env или окружении")
 
+        if options["webhook"]:
+            self.set_webhook(token)
+            return
+
+        if options["workers"] > 1:
+            if settings.FSM_STORAGE == "memory":
+                raise CommandError("Для нескольких процессов-обработчиков нужно FSM_STORAGE=db")
+            from app_core.bot.sharding import run_sharded
+            asyncio.run(run_sharded(token, options["workers"]))
+            return
+
         run_bot(token)
+
+    def set_webhook(self, token):
+        from app_core.bot.webhook import set_webhook
+
+        if not settings.TELEGRAM_WEBHOOK_BASE_URL:
+            raise CommandError("TELEGRAM_WEBHOOK_BASE_URL не задан в .env или окружении")
+        # Telegram принимает секрет из 1-256 символов A-Z, a-z, 0-9, _ и -
+        if not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", settings.TELEGRAM_WEBHOOK_SECRET):
+            raise CommandError("TELEGRAM_WEBHOOK_SECRET должен состоять из 1-256 символов A-Z, a-z, 0-9, _ и -")
+
+        url = asyncio.run(set_webhook(token))
+        self.stdout.write(self.style.SUCCESS(f"Webhook установлен: {url}"))
@@ -0,0 +1,27 @@
+import asyncio
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from app_core.bot.bot_main import LEADER_ROLE
+from app_core.bot.services.job_service import run_worker
+from app_core.bot.services.leader_election import LeaderElection
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает обработчик фоновых задач (рассылки из админ-панели), когда бот не запущен. "
+        "Запущенный бот выполняет их сам"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить все задачи из очереди и завершиться",
+        )
+
+    def handle(self, *args, **options):
+        # Второй отправитель со своим лимитом вместе с ботом превысил бы общий лимит Telegram
+        if LeaderElection.is_held(LEADER_ROLE):
+            raise CommandError("Бот запущен и сам выполняет фоновые задачи; runjobs нужен, только когда бот остановлен")
+        logging.basicConfig(level=logging.INFO)
+        asyncio.run(run_worker(once=options["once"]))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0010_delete_networkingmatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('sent', 'Доставлено'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток отправки')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='app_core.massnotification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_deliveries', to='app_core.user')),
+            ],
+            options={
+                'verbose_name': 'Доставка рассылки',
+                'verbose_name_plural': 'Доставки рассылок',
+                'indexes': [models.Index(fields=['notification', 'status'], name='app_core_no_notific_3ad1fb_idx')],
+                'unique_together': {('notification', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0011_notificationdelivery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='massnotification',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Черновик'), ('queued', 'В очереди'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='draft', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('mass_notification', 'Массовая рассылка')], max_length=50, verbose_name='Тип задачи')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Параметры')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершено'), ('failed', 'Ошибка')], default='queued', max_length=20, verbose_name='Статус')),
+                ('total_count', models.PositiveIntegerField(default=0, verbose_name='Всего сообщений')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Отправлено')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Ошибок')),
+                ('result', models.TextField(blank=True, verbose_name='Результат')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Обработчик')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начато')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='app_core_ba_status_772695_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0012_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryHealth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_blocked', models.BooleanField(db_index=True, default=False, verbose_name='Недоступен для рассылок')),
+                ('consecutive_failures', models.PositiveIntegerField(default=0, verbose_name='Ошибок доставки подряд')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('last_error_at', models.DateTimeField(blank=True, null=True, verbose_name='Время последней ошибки')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_health', to='app_core.user')),
+            ],
+            options={
+                'verbose_name': 'Доступность пользователя',
+                'verbose_name_plural': 'Доступность пользователей',
+            },
+        ),
+    ]
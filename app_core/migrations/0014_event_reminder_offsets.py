@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:26
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0013_deliveryhealth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='day_reminder_offset',
+            field=models.DurationField(default=datetime.timedelta(days=1), help_text='За сколько до начала отправить напоминание «за день», например 1 00:00:00', verbose_name='Второе напоминание за'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='week_reminder_offset',
+            field=models.DurationField(default=datetime.timedelta(days=7), help_text='За сколько до начала отправить напоминание «за неделю», например 7 00:00:00', verbose_name='Первое напоминание за'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0014_event_reminder_offsets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Роль')),
+                ('holder', models.CharField(blank=True, max_length=100, verbose_name='Владелец')),
+                ('expires_at', models.DateTimeField(verbose_name='Действует до')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Аренда лидерства',
+                'verbose_name_plural': 'Аренды лидерства',
+            },
+        ),
+    ]
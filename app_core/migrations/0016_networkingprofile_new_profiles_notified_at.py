@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0015_leaderlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkingprofile',
+            name='new_profiles_notified_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя сводка о новых анкетах'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0016_networkingprofile_new_profiles_notified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='massnotification',
+            name='attachment',
+            field=models.FileField(blank=True, help_text='Постер, слайды или другой файл. Загружается в Telegram один раз на все рассылки', upload_to='notifications/', verbose_name='Вложение'),
+        ),
+        migrations.AddField(
+            model_name='massnotification',
+            name='attachment_type',
+            field=models.CharField(choices=[('photo', 'Фото'), ('document', 'Документ')], default='photo', max_length=20, verbose_name='Тип вложения'),
+        ),
+        migrations.CreateModel(
+            name='TelegramFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bot_id', models.BigIntegerField(verbose_name='ID бота')),
+                ('sha256', models.CharField(max_length=64, verbose_name='Хэш содержимого')),
+                ('media_type', models.CharField(max_length=20, verbose_name='Тип')),
+                ('file_id', models.CharField(max_length=255, verbose_name='file_id в Telegram')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Загружен')),
+            ],
+            options={
+                'verbose_name': 'Файл в Telegram',
+                'verbose_name_plural': 'Файлы в Telegram',
+                'unique_together': {('bot_id', 'sha256', 'media_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0017_notification_attachments'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('mass_notification', 'Массовая рассылка'), ('dead_letter_resend', 'Повторная отправка недоставленных')], max_length=50, verbose_name='Тип задачи'),
+        ),
+        migrations.CreateModel(
+            name='DeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.CharField(max_length=100, verbose_name='Чат')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('parse_mode', models.CharField(blank=True, max_length=20, verbose_name='Разметка')),
+                ('source', models.CharField(choices=[('broadcast', 'Рассылка'), ('mass_notification', 'Рассылка из админки'), ('reminder', 'Напоминание о мероприятии'), ('networking_digest', 'Сводка о новых анкетах')], default='broadcast', max_length=30, verbose_name='Источник')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('status', models.CharField(choices=[('dead', 'Не доставлено'), ('queued', 'В очереди на повтор'), ('resent', 'Отправлено повторно')], default='dead', max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('resent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено повторно')),
+                ('notification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dead_letters', to='app_core.massnotification', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Недоставленное сообщение',
+                'verbose_name_plural': 'Недоставленные сообщения',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='app_core_de_status_93ed37_idx')],
+            },
+        ),
+    ]
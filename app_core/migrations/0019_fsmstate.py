@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:52
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0018_deadletter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FSMState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True, verbose_name='Ключ')),
+                ('state', models.CharField(blank=True, max_length=255, verbose_name='Состояние')),
+                ('data', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Данные')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Состояние диалога',
+                'verbose_name_plural': 'Состояния диалогов',
+            },
+        ),
+    ]
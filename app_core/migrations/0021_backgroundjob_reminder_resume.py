@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0020_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('mass_notification', 'Массовая рассылка'), ('dead_letter_resend', 'Повторная отправка недоставленных'), ('reminder_resume', 'Продолжение рассылки напоминаний')], max_length=50, verbose_name='Тип задачи'),
+        ),
+    ]
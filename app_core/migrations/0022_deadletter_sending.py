@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_core', '0021_backgroundjob_reminder_resume'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='deadletter',
+            name='status',
+            field=models.CharField(choices=[('dead', 'Не доставлено'), ('queued', 'В очереди на повтор'), ('sending', 'Отправляется повторно'), ('resent', 'Отправлено повторно')], default='dead', max_length=20, verbose_name='Статус'),
+        ),
+    ]
@@ -1,3 +1,8 @@
+import os
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -20,6 +25,8 @@ class User(models.Model):
     is_networking_active = models.BooleanField(default=False)
     is_subscribed = models.BooleanField(default=False, verbose_name="Подписка на уведомления")
     created_at = models.DateTimeField(auto_now_add=True)
+    # По нему бот сбрасывает из кэша пользователей, изменённых в других процессах (админка)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "Пользователь"
@@ -29,6 +36,22 @@ class User(models.Model):
         return f"{self.first_name} ({self.telegram_id})"
 
 
+class DeliveryHealth(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="delivery_health")
+    is_blocked = models.BooleanField(default=False, db_index=True, verbose_name="Недоступен для рассылок")
+    consecutive_failures = models.PositiveIntegerField(default=0, verbose_name="Ошибок доставки подряд")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    last_error_at = models.DateTimeField(null=True, blank=True, verbose_name="Время последней ошибки")
+
+    class Meta:
+        verbose_name = "Доступность пользователя"
+        verbose_name_plural = "Доступность пользователей"
+
+    def __str__(self):
+        state = "недоступен" if self.is_blocked else "доступен"
+        return f"{self.user} — {state}"
+
+
 class Event(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -39,6 +62,16 @@ class Event(models.Model):
     notification_sent = models.BooleanField(default=False, verbose_name="Уведомление отправлено")
     notification_sent_week = models.BooleanField(default=False, verbose_name="Напоминание за неделю отправлено")
     notification_sent_day = models.BooleanField(default=False, verbose_name="Напоминание за день отправлено")
+    week_reminder_offset = models.DurationField(
+        default=timedelta(days=7),
+        verbose_name="Первое напоминание за",
+        help_text="За сколько до начала отправить напоминание «за неделю», например 7 00:00:00"
+    )
+    day_reminder_offset = models.DurationField(
+        default=timedelta(days=1),
+        verbose_name="Второе напоминание за",
+        help_text="За сколько до начала отправить напоминание «за день», например 1 00:00:00"
+    )
 
     class Meta:
         verbose_name = "Мероприятие"
@@ -156,6 +189,7 @@ class SpeakerApplication(models.Model):
 class MassNotification(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Черновик'),
+        ('queued', 'В очереди'),
         ('sending', 'Отправляется'),
         ('sent', 'Отправлено'),
         ('failed', 'Ошибка'),
@@ -178,6 +212,25 @@ class MassNotification(models.Model):
         verbose_name="Выбранные пользователи",
         help_text="Выберите конкретных пользователей для рассылки"
     )
+    MEDIA_TYPE_CHOICES = [
+        ('photo', 'Фото'),
+        ('document', 'Документ'),
+    ]
+    # Подпись к фото или документу в Telegram ограничена 1024 символами
+    CAPTION_MAX_LENGTH = 1024
+    # Фото Telegram принимает только в этих форматах и не больше 10 МБ
+    PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+    PHOTO_MAX_SIZE = 10 * 1024 * 1024
+
+    attachment = models.FileField(
+        upload_to='notifications/',
+        blank=True,
+        verbose_name="Вложение",
+        help_text="Постер, слайды или другой файл. Загружается в Telegram один раз на все рассылки"
+    )
+    attachment_type = models.CharField(
+        max_length=20, choices=MEDIA_TYPE_CHOICES, default='photo', verbose_name="Тип вложения"
+    )
     sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Время отправки")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
     
@@ -188,6 +241,56 @@ class MassNotification(models.Model):
     
     def __str__(self):
         return f"{self.title} ({self.get_status_display()})"
+
+    @property
+    def message_text(self):
+        return f"📢 {self.title}\n\n{self.message}"
+
+    def clean(self):
+        errors = {}
+        if self.attachment and len(self.message_text) > self.CAPTION_MAX_LENGTH:
+            errors['message'] = (
+                f"С вложением текст рассылки не может быть длиннее "
+                f"{self.CAPTION_MAX_LENGTH} символов вместе с заголовком"
+            )
+        if self.attachment and self.attachment_type == 'photo':
+            extension = os.path.splitext(self.attachment.name)[1].lower()
+            if extension not in self.PHOTO_EXTENSIONS:
+                errors['attachment_type'] = (
+                    f"Как фото можно отправить только {', '.join(self.PHOTO_EXTENSIONS)}; "
+                    f"файл {extension or 'без расширения'} отправьте как документ"
+                )
+            elif self.attachment.size > self.PHOTO_MAX_SIZE:
+                errors['attachment'] = "Фото больше 10 МБ Telegram не примет, отправьте его как документ"
+        if errors:
+            raise ValidationError(errors)
+
+
+class NotificationDelivery(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sent', 'Доставлено'),
+        ('failed', 'Ошибка'),
+    ]
+
+    notification = models.ForeignKey(
+        MassNotification, on_delete=models.CASCADE, related_name="deliveries"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notification_deliveries")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток отправки")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Доставка рассылки"
+        verbose_name_plural = "Доставки рассылок"
+        unique_together = ['notification', 'user']
+        indexes = [models.Index(fields=['notification', 'status'])]
+
+    def __str__(self):
+        return f"{self.notification.title} → {self.user.telegram_id} ({self.get_status_display()})"
+
     
 class NetworkingProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="networking_profile")
@@ -198,6 +301,9 @@ class NetworkingProfile(models.Model):
     interests = models.TextField(verbose_name="Интересы и темы для общения")
     contact_consent = models.BooleanField(default=False, verbose_name="Согласие на обмен контактами")
     is_visible = models.BooleanField(default=True, verbose_name="Видимость в поиске")
+    new_profiles_notified_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Последняя сводка о новых анкетах"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -224,4 +330,143 @@ class NetworkingInteraction(models.Model):
     class Meta:
         verbose_name = "Взаимодействие знакомств"
         verbose_name_plural = "Взаимодействия знакомств"
-        unique_together = ['viewer', 'profile']
\ No newline at end of file
+        unique_together = ['viewer', 'profile']
+
+
+class BackgroundJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Завершено'),
+        ('failed', 'Ошибка'),
+    ]
+    KIND_CHOICES = [
+        ('mass_notification', 'Массовая рассылка'),
+        ('dead_letter_resend', 'Повторная отправка недоставленных'),
+        ('reminder_resume', 'Продолжение рассылки напоминаний'),
+    ]
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES, verbose_name="Тип задачи")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', verbose_name="Статус")
+    total_count = models.PositiveIntegerField(default=0, verbose_name="Всего сообщений")
+    sent_count = models.PositiveIntegerField(default=0, verbose_name="Отправлено")
+    failed_count = models.PositiveIntegerField(default=0, verbose_name="Ошибок")
+    result = models.TextField(blank=True, verbose_name="Результат")
+    worker = models.CharField(max_length=100, blank=True, verbose_name="Обработчик")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начато")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершено")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_active(self):
+        return self.status in ('queued', 'running')
+
+    @property
+    def queued_count(self):
+        return max(self.total_count - self.sent_count - self.failed_count, 0)
+
+    @property
+    def eta_seconds(self):
+        processed = self.sent_count + self.failed_count
+        if self.status != 'running' or not self.started_at or not processed:
+            return None
+        elapsed = (self.updated_at - self.started_at).total_seconds()
+        return elapsed / processed * self.queued_count
+
+
+class LeaderLease(models.Model):
+    name = models.CharField(max_length=100, unique=True, verbose_name="Роль")
+    holder = models.CharField(max_length=100, blank=True, verbose_name="Владелец")
+    expires_at = models.DateTimeField(verbose_name="Действует до")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Аренда лидерства"
+        verbose_name_plural = "Аренды лидерства"
+
+    def __str__(self):
+        return f"{self.name}: {self.holder or '—'}"
+
+
+class TelegramFile(models.Model):
+    """Кэш file_id файлов, уже загруженных в Telegram
+
+    file_id выдаётся отдельно каждому боту, поэтому ключ включает id бота.
+    """
+    bot_id = models.BigIntegerField(verbose_name="ID бота")
+    sha256 = models.CharField(max_length=64, verbose_name="Хэш содержимого")
+    media_type = models.CharField(max_length=20, verbose_name="Тип")
+    file_id = models.CharField(max_length=255, verbose_name="file_id в Telegram")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Загружен")
+
+    class Meta:
+        verbose_name = "Файл в Telegram"
+        verbose_name_plural = "Файлы в Telegram"
+        unique_together = ['bot_id', 'sha256', 'media_type']
+
+    def __str__(self):
+        return f"{self.media_type} {self.sha256[:12]}"
+
+
+class DeadLetter(models.Model):
+    """Сообщение, не доставленное из-за временных ошибок после всех повторов"""
+    SOURCE_CHOICES = [
+        ('broadcast', 'Рассылка'),
+        ('mass_notification', 'Рассылка из админки'),
+        ('reminder', 'Напоминание о мероприятии'),
+        ('networking_digest', 'Сводка о новых анкетах'),
+    ]
+    STATUS_CHOICES = [
+        ('dead', 'Не доставлено'),
+        ('queued', 'В очереди на повтор'),
+        ('sending', 'Отправляется повторно'),
+        ('resent', 'Отправлено повторно'),
+    ]
+
+    chat_id = models.CharField(max_length=100, verbose_name="Чат")
+    text = models.TextField(verbose_name="Текст")
+    parse_mode = models.CharField(max_length=20, blank=True, verbose_name="Разметка")
+    source = models.CharField(max_length=30, choices=SOURCE_CHOICES, default='broadcast', verbose_name="Источник")
+    notification = models.ForeignKey(
+        MassNotification, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="dead_letters", verbose_name="Рассылка"
+    )
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='dead', verbose_name="Статус")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    resent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено повторно")
+
+    class Meta:
+        verbose_name = "Недоставленное сообщение"
+        verbose_name_plural = "Недоставленные сообщения"
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.get_source_display()} → {self.chat_id}"
+
+
+class FSMState(models.Model):
+    """Состояние диалога бота (FSM aiogram) для одного чата и пользователя"""
+    key = models.CharField(max_length=255, unique=True, verbose_name="Ключ")
+    state = models.CharField(max_length=255, blank=True, verbose_name="Состояние")
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name="Данные")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Обновлено")
+
+    class Meta:
+        verbose_name = "Состояние диалога"
+        verbose_name_plural = "Состояния диалогов"
+
+    def __str__(self):
+        return f"{self.key}: {self.state or '—'}"
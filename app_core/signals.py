@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Event, User
+
+# Подписчики на изменения мероприятий в этом процессе (планировщик напоминаний)
+_event_listeners = []
+
+
+def add_event_listener(listener):
+    if listener not in _event_listeners:
+        _event_listeners.append(listener)
+
+
+def remove_event_listener(listener):
+    if listener in _event_listeners:
+        _event_listeners.remove(listener)
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, **kwargs):
+    for listener in list(_event_listeners):
+        listener(instance)
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    for listener in list(_event_listeners):
+        listener(instance, deleted=True)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    from .bot.services.user_cache import user_cache
+    user_cache.invalidate(instance.telegram_id)
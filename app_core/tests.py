@@ -1,3 +1,523 @@
-from django.test import TestCase
+import asyncio
+import time
+from datetime import timedelta
+from unittest import IsolatedAsyncioTestCase
 
-# Create your tests here.
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.methods import EditMessageText, GetMe, SendMessage
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from app_core.bot.services.broadcast_service import RateLimiter, ResumeCursor
+from app_core.bot.services.db_pool import db_pool
+from app_core.bot.services.fsm_storage import DjangoStorage
+from app_core.bot.services.job_service import claim_next_job, start_mass_notification
+from app_core.bot.services.leader_election import LeaderElection
+from app_core.bot.services import repository
+from app_core.bot.services.notification_service import claim_reminder, claim_reminders
+from app_core.bot.services.send_dispatcher import BULK, INTERACTIVE, PriorityRateLimiter, SendDispatcher
+from app_core.models import (
+    BackgroundJob, DeliveryHealth, Event, FSMState, LeaderLease, MassNotification, NetworkingProfile,
+    NotificationDelivery, User,
+)
+
+# Допуск сверху для проверок, завязанных на реальное время. Ожидания
+# asyncio не заканчиваются раньше срока, поэтому нижние границы точные,
+# а «без ожидания» сравнивается с паузой не меньше секунды
+TIMING_SLACK = 0.1
+
+
+async def timed(coroutine):
+    """Выполнить корутину и вернуть, сколько секунд она заняла"""
+    started_at = time.monotonic()
+    await coroutine
+    return time.monotonic() - started_at
+
+
+class RateLimiterTests(IsolatedAsyncioTestCase):
+    async def test_burst_is_granted_without_waiting(self):
+        limiter = RateLimiter(rate=1, burst=3)
+        elapsed = await timed(asyncio.gather(*(limiter.acquire() for _ in range(3))))
+        self.assertLess(elapsed, 0.5)
+
+    async def test_tokens_after_burst_are_paced_by_rate(self):
+        limiter = RateLimiter(rate=20, burst=2)
+        elapsed = await timed(asyncio.gather(*(limiter.acquire() for _ in range(5))))
+        # Два токена из запаса, ещё три - по одному в 1/20 секунды
+        self.assertGreaterEqual(elapsed, 3 / 20)
+        self.assertLess(elapsed, 3 / 20 + TIMING_SLACK)
+
+    def test_burst_defaults_to_rate(self):
+        self.assertEqual(RateLimiter(rate=25).burst, 25)
+        self.assertEqual(RateLimiter(rate=0.5).burst, 1)
+
+    async def test_pause_blocks_and_drains_tokens(self):
+        limiter = RateLimiter(rate=100, burst=10)
+        limiter.pause(0.1)
+        elapsed = await timed(limiter.acquire())
+        self.assertGreaterEqual(elapsed, 0.1)
+        # Запас после паузы не восстанавливается мгновенно
+        elapsed = await timed(asyncio.gather(*(limiter.acquire() for _ in range(3))))
+        self.assertGreaterEqual(elapsed, 2 / 100)
+
+
+def make_user(telegram_id, **fields):
+    return User.objects.create(telegram_id=str(telegram_id), first_name=f"User {telegram_id}", **fields)
+
+
+class StartMassNotificationTests(TestCase):
+    def setUp(self):
+        self.notification = MassNotification.objects.create(title="Митап", message="Скоро начало")
+
+    def test_enqueues_notification(self):
+        job, reason = start_mass_notification(self.notification)
+        self.assertIsNone(reason)
+        self.assertEqual(job.kind, 'mass_notification')
+        self.assertEqual(job.payload, {'notification_id': self.notification.id})
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, 'queued')
+
+    def test_refuses_notification_with_active_job(self):
+        first, _ = start_mass_notification(self.notification)
+        for status in ('queued', 'running'):
+            BackgroundJob.objects.filter(id=first.id).update(status=status)
+            job, reason = start_mass_notification(self.notification)
+            self.assertIsNone(job)
+            self.assertIsNotNone(reason)
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+    def test_enqueues_again_after_job_finished(self):
+        first, _ = start_mass_notification(self.notification)
+        BackgroundJob.objects.filter(id=first.id).update(status='done')
+        job, reason = start_mass_notification(self.notification)
+        self.assertIsNone(reason)
+        self.assertNotEqual(job.id, first.id)
+
+    def test_requeues_failed_deliveries_of_reachable_users(self):
+        reachable, blocked, delivered = make_user(1), make_user(2), make_user(3)
+        DeliveryHealth.objects.create(user=blocked, is_blocked=True)
+        for user, status in ((reachable, 'failed'), (blocked, 'failed'), (delivered, 'sent')):
+            NotificationDelivery.objects.create(notification=self.notification, user=user, status=status)
+        self.notification.status = 'failed'
+        self.notification.save()
+
+        job, reason = start_mass_notification(self.notification)
+
+        self.assertIsNotNone(job)
+        statuses = dict(self.notification.deliveries.values_list('user__telegram_id', 'status'))
+        self.assertEqual(statuses, {'1': 'pending', '2': 'failed', '3': 'sent'})
+
+    def test_refuses_failed_notification_without_reachable_recipients(self):
+        blocked = make_user(1)
+        DeliveryHealth.objects.create(user=blocked, is_blocked=True)
+        NotificationDelivery.objects.create(notification=self.notification, user=blocked, status='failed')
+        self.notification.status = 'failed'
+        self.notification.save()
+
+        job, reason = start_mass_notification(self.notification)
+
+        self.assertIsNone(job)
+        self.assertIsNotNone(reason)
+        self.assertFalse(BackgroundJob.objects.exists())
+
+
+class ClaimNextJobTests(TestCase):
+    def make_job(self, status='queued', idle=0):
+        job = BackgroundJob.objects.create(kind='mass_notification', status=status, worker='old')
+        BackgroundJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(seconds=idle))
+        return job
+
+    def test_claims_oldest_queued_job(self):
+        first, second = self.make_job(), self.make_job()
+        claimed = claim_next_job('worker-1')
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual(claimed.status, 'running')
+        self.assertEqual(claimed.worker, 'worker-1')
+        self.assertIsNotNone(claimed.started_at)
+        self.assertEqual(claim_next_job('worker-2').id, second.id)
+        self.assertIsNone(claim_next_job('worker-3'))
+
+    def test_skips_running_job_with_fresh_heartbeat(self):
+        self.make_job(status='running', idle=settings.JOB_STALE_AFTER // 2)
+        self.assertIsNone(claim_next_job('worker-1'))
+
+    def test_reclaims_stale_running_job(self):
+        stale = self.make_job(status='running', idle=settings.JOB_STALE_AFTER + 60)
+        claimed = claim_next_job('worker-1')
+        self.assertEqual(claimed.id, stale.id)
+        self.assertEqual(claimed.worker, 'worker-1')
+        self.assertIsNone(claim_next_job('worker-2'))
+
+    def test_ignores_finished_jobs(self):
+        self.make_job(status='done', idle=settings.JOB_STALE_AFTER + 60)
+        self.make_job(status='failed', idle=settings.JOB_STALE_AFTER + 60)
+        self.assertIsNone(claim_next_job('worker-1'))
+
+
+class ClaimReminderTests(TestCase):
+    def setUp(self):
+        start = timezone.now() + timedelta(hours=12)
+        self.event = Event.objects.create(
+            title="Python Meetup", description="Доклады", start_date=start, end_date=start + timedelta(hours=3)
+        )
+
+    async def fresh_event(self):
+        return await Event.objects.aget(id=self.event.id)
+
+    async def test_reminder_is_claimed_once(self):
+        self.assertTrue(await claim_reminder('day', self.event))
+        self.assertTrue(self.event.notification_sent_day)
+        # Другой процесс с той же строкой, прочитанной до claim, напоминание не получает
+        self.assertFalse(await claim_reminder('day', await self.fresh_event()))
+        self.assertFalse(await claim_reminder('day', Event(id=self.event.id)))
+
+    async def test_kinds_are_claimed_independently(self):
+        self.assertTrue(await claim_reminder('week', self.event))
+        self.assertTrue(await claim_reminder('day', self.event))
+
+    async def test_day_reminder_supersedes_week_reminder(self):
+        claimed = await claim_reminders([('day', self.event), ('week', self.event)])
+        self.assertEqual(claimed, [('day', self.event)])
+        # Устаревшее напоминание за неделю тоже отмечено, чтобы не уйти позже
+        event = await self.fresh_event()
+        self.assertTrue(event.notification_sent_week)
+        self.assertTrue(event.notification_sent_day)
+
+    async def test_week_reminder_of_another_event_is_kept(self):
+        other = await Event.objects.acreate(
+            title="Django Day", description="Воркшоп",
+            start_date=self.event.start_date + timedelta(days=6), end_date=self.event.end_date + timedelta(days=6),
+        )
+        claimed = await claim_reminders([('day', self.event), ('week', other)])
+        self.assertEqual(claimed, [('day', self.event), ('week', other)])
+
+    async def test_reminders_claimed_elsewhere_are_skipped(self):
+        await claim_reminder('day', await self.fresh_event())
+        self.assertEqual(await claim_reminders([('day', self.event), ('week', self.event)]), [])
+
+
+class LeaderElectionTests(TestCase):
+    def setUp(self):
+        self.first = LeaderElection('scheduler', holder='host-1', ttl=30)
+        self.second = LeaderElection('scheduler', holder='host-2', ttl=30)
+
+    def test_first_candidate_creates_lease(self):
+        self.assertFalse(LeaderElection.is_held('scheduler'))
+        self.assertTrue(self.first.try_acquire())
+        lease = LeaderLease.objects.get(name='scheduler')
+        self.assertEqual(lease.holder, 'host-1')
+        self.assertTrue(LeaderElection.is_held('scheduler'))
+
+    def test_holder_renews_lease(self):
+        self.first.try_acquire()
+        LeaderLease.objects.update(expires_at=timezone.now() + timedelta(seconds=1))
+        self.assertTrue(self.first.try_acquire())
+        lease = LeaderLease.objects.get(name='scheduler')
+        self.assertGreater(lease.expires_at, timezone.now() + timedelta(seconds=20))
+
+    def test_live_lease_is_not_taken_over(self):
+        self.first.try_acquire()
+        self.assertFalse(self.second.try_acquire())
+        self.assertEqual(LeaderLease.objects.get(name='scheduler').holder, 'host-1')
+
+    def test_expired_lease_is_taken_over(self):
+        self.first.try_acquire()
+        LeaderLease.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(LeaderElection.is_held('scheduler'))
+        self.assertTrue(self.second.try_acquire())
+        self.assertEqual(LeaderLease.objects.get(name='scheduler').holder, 'host-2')
+        # Бывший ведущий после перехвата аренды её не продлевает
+        self.assertFalse(self.first.try_acquire())
+
+    def test_released_lease_is_available_at_once(self):
+        self.first.try_acquire()
+        self.first.release()
+        self.assertTrue(self.second.try_acquire())
+
+    def test_roles_are_leased_separately(self):
+        self.first.try_acquire()
+        self.assertTrue(LeaderElection('jobs', holder='host-2', ttl=30).try_acquire())
+
+
+class SendDispatcherTests(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.requests = []
+        self.in_flight = set()
+
+    async def make_request(self, bot, method):
+        chat_id = getattr(method, 'chat_id', None)
+        # Запросы в один чат не должны выполняться одновременно
+        self.assertNotIn(chat_id, self.in_flight)
+        self.in_flight.add(chat_id)
+        try:
+            await asyncio.sleep(0.001 * (len(self.requests) % 3))
+            self.requests.append((chat_id, getattr(method, 'text', None), time.monotonic()))
+        finally:
+            self.in_flight.discard(chat_id)
+        return True
+
+    def send(self, dispatcher, method):
+        return dispatcher(self.make_request, None, method)
+
+    async def test_chat_messages_keep_order(self):
+        dispatcher = SendDispatcher(rate=1000, chat_rate=1000, chat_burst=10)
+        await asyncio.gather(*(
+            self.send(dispatcher, SendMessage(chat_id=chat_id, text=str(number)))
+            for number in range(5) for chat_id in (1, 2)
+        ))
+        for chat_id in (1, 2):
+            texts = [text for chat, text, sent_at in self.requests if chat == chat_id]
+            self.assertEqual(texts, ['0', '1', '2', '3', '4'])
+
+    async def test_chat_is_paced_after_burst(self):
+        dispatcher = SendDispatcher(rate=1000, chat_rate=20, chat_burst=2)
+        elapsed = await timed(asyncio.gather(*(
+            self.send(dispatcher, SendMessage(chat_id=1, text=str(number))) for number in range(4)
+        )))
+        # Два сообщения из запаса чата, ещё два - по одному в 1/20 секунды
+        self.assertGreaterEqual(elapsed, 2 / 20)
+
+    async def test_paced_chat_does_not_delay_other_chats(self):
+        dispatcher = SendDispatcher(rate=1000, chat_rate=1, chat_burst=1)
+        await self.send(dispatcher, SendMessage(chat_id=1, text='first'))
+        waiting = asyncio.create_task(self.send(dispatcher, SendMessage(chat_id=1, text='second')))
+        elapsed = await timed(self.send(dispatcher, SendMessage(chat_id=2, text='other')))
+        self.assertLess(elapsed, 0.5)
+        self.assertFalse(waiting.done())
+        waiting.cancel()
+
+    async def test_edits_skip_chat_pacing(self):
+        dispatcher = SendDispatcher(rate=1000, chat_rate=1, chat_burst=1)
+        await self.send(dispatcher, SendMessage(chat_id=1, text='first'))
+        elapsed = await timed(self.send(dispatcher, EditMessageText(chat_id=1, message_id=1, text='edited')))
+        self.assertLess(elapsed, 0.5)
+
+    async def test_requests_without_chat_bypass_lanes(self):
+        dispatcher = SendDispatcher(rate=1000, chat_rate=1, chat_burst=1)
+        self.assertTrue(await self.send(dispatcher, GetMe()))
+        self.assertEqual(dispatcher.lanes_count, 0)
+
+    async def test_idle_lane_is_reclaimed_when_bucket_refills(self):
+        dispatcher = SendDispatcher(rate=1000, chat_rate=20, chat_burst=1)
+        await self.send(dispatcher, SendMessage(chat_id=1, text='first'))
+        self.assertEqual(dispatcher.lanes_count, 1)
+        await asyncio.sleep(1 / 20 + TIMING_SLACK)
+        self.assertEqual(dispatcher.lanes_count, 0)
+
+    async def test_lane_reused_before_reclaim_is_kept(self):
+        dispatcher = SendDispatcher(rate=1000, chat_rate=20, chat_burst=1)
+        await self.send(dispatcher, SendMessage(chat_id=1, text='first'))
+        lane = dispatcher._lanes[1]
+        # Второе сообщение ждёт токен чата, пока срабатывает отложенная очистка
+        await self.send(dispatcher, SendMessage(chat_id=1, text='second'))
+        self.assertIs(dispatcher._lanes[1], lane)
+        await asyncio.sleep(1 / 20 + TIMING_SLACK)
+        self.assertEqual(dispatcher.lanes_count, 0)
+
+
+class PriorityRateLimiterTests(IsolatedAsyncioTestCase):
+    def test_bulk_share_sets_bulk_bucket(self):
+        limiter = PriorityRateLimiter(rate=30, burst=10, bulk_share=0.5)
+        self.assertEqual(limiter.bulk_rate, 15)
+        self.assertEqual(limiter.bulk_burst, 5)
+        self.assertEqual(PriorityRateLimiter(rate=30, burst=1, bulk_share=0.5).bulk_burst, 1)
+
+    async def test_bulk_is_limited_to_its_share(self):
+        limiter = PriorityRateLimiter(rate=100, burst=2, bulk_share=0.1)
+        # Запас рассылки - 1 токен, дальше 10 в секунду вместо общих 100
+        elapsed = await timed(asyncio.gather(*(limiter.acquire(BULK) for _ in range(4))))
+        self.assertGreaterEqual(elapsed, 3 / 10)
+
+    async def test_interactive_uses_full_rate(self):
+        limiter = PriorityRateLimiter(rate=100, burst=2, bulk_share=0.1)
+        elapsed = await timed(asyncio.gather(*(limiter.acquire(INTERACTIVE) for _ in range(4))))
+        self.assertGreaterEqual(elapsed, 2 / 100)
+        self.assertLess(elapsed, 2 / 100 + TIMING_SLACK)
+
+    async def test_interactive_overtakes_queued_bulk(self):
+        limiter = PriorityRateLimiter(rate=20, burst=1, bulk_share=0.5)
+        granted = []
+
+        async def acquire(priority, name):
+            await limiter.acquire(priority)
+            granted.append(name)
+
+        await limiter.acquire(BULK)
+        bulk = [asyncio.create_task(acquire(BULK, f'bulk-{number}')) for number in range(3)]
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.queue_depth(BULK), 3)
+        await acquire(INTERACTIVE, 'interactive')
+        await asyncio.gather(*bulk)
+        self.assertEqual(granted, ['interactive', 'bulk-0', 'bulk-1', 'bulk-2'])
+
+    async def test_pause_blocks_every_priority(self):
+        limiter = PriorityRateLimiter(rate=100, burst=10, bulk_share=0.5)
+        limiter.pause(0.1)
+        elapsed = await timed(asyncio.gather(limiter.acquire(INTERACTIVE), limiter.acquire(BULK)))
+        self.assertGreaterEqual(elapsed, 0.1)
+
+
+class DjangoStorageTests(TransactionTestCase):
+    """Запись идёт в потоках пула БД, поэтому тесты без общей транзакции"""
+
+    key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+    def setUp(self):
+        self.storage = DjangoStorage(ttl=3600, session_ttl=60)
+
+    async def age_states(self, seconds):
+        await FSMState.objects.aupdate(updated_at=timezone.now() - timedelta(seconds=seconds))
+
+    async def test_changes_are_written_once_on_flush(self):
+        await self.storage.set_state(self.key, 'NetworkingStates:browsing')
+        await self.storage.update_data(self.key, {'seed': 7})
+        await self.storage.update_data(self.key, {'position': 2})
+        self.assertFalse(await FSMState.objects.aexists())
+
+        await self.storage.flush()
+
+        row = await FSMState.objects.aget()
+        self.assertEqual(row.state, 'NetworkingStates:browsing')
+        self.assertEqual(row.data, {'seed': 7, 'position': 2})
+        self.assertEqual(self.storage._records, {})
+
+    async def test_flushed_state_is_read_by_another_storage(self):
+        await self.storage.set_state(self.key, 'QuestionState:waiting_for_question')
+        await self.storage.flush()
+        other = DjangoStorage(ttl=3600, session_ttl=60)
+        self.assertEqual(await other.get_state(self.key), 'QuestionState:waiting_for_question')
+
+    async def test_reads_are_not_written(self):
+        self.assertIsNone(await self.storage.get_state(self.key))
+        self.assertEqual(await self.storage.get_data(self.key), {})
+        await self.storage.flush()
+        self.assertFalse(await FSMState.objects.aexists())
+        self.assertEqual(self.storage._records, {})
+
+    async def test_change_during_flush_stays_pending(self):
+        await self.storage.set_state(self.key, 'NetworkingStates:browsing')
+        flush = asyncio.create_task(self.storage.flush())
+        await asyncio.sleep(0)
+        # Изменение после снимка для записи не теряется и остаётся в памяти
+        await self.storage.set_state(self.key, 'NetworkingStates:viewing_profile')
+        await flush
+        self.assertEqual(await self.storage.get_state(self.key), 'NetworkingStates:viewing_profile')
+
+        await self.storage.flush()
+        self.assertEqual((await FSMState.objects.aget()).state, 'NetworkingStates:viewing_profile')
+        self.assertEqual(self.storage._records, {})
+
+    async def test_cleared_state_deletes_row(self):
+        await self.storage.set_state(self.key, 'AnswerStates:waiting_for_answer')
+        await self.storage.update_data(self.key, {'question_id': 1})
+        await self.storage.flush()
+        await self.storage.set_state(self.key, None)
+        await self.storage.set_data(self.key, {})
+        await self.storage.flush()
+        self.assertFalse(await FSMState.objects.aexists())
+
+    async def test_idle_session_expires_before_other_states(self):
+        session_key = StorageKey(bot_id=1, chat_id=20, user_id=20)
+        await self.storage.set_state(self.key, 'MainMenu:idle')
+        await self.storage.set_state(session_key, 'NetworkingStates:browsing')
+        await self.storage.flush()
+        await self.age_states(120)
+
+        self.assertEqual(await self.storage.get_state(self.key), 'MainMenu:idle')
+        self.assertIsNone(await self.storage.get_state(session_key))
+
+        await db_pool.run(self.storage._purge)
+        self.assertEqual([row.key async for row in FSMState.objects.all()], [self.storage.key_builder.build(self.key)])
+
+        await self.age_states(7200)
+        await db_pool.run(self.storage._purge)
+        self.assertFalse(await FSMState.objects.aexists())
+
+
+class NextProfileToBrowseTests(TestCase):
+    def setUp(self):
+        self.viewer = make_user(1)
+        NetworkingProfile.objects.create(user=self.viewer, name="Я", interests="Python")
+        self.profiles = [
+            NetworkingProfile.objects.create(user=make_user(100 + number), name=f"Участник {number}", interests="Django")
+            for number in range(6)
+        ]
+        NetworkingProfile.objects.create(user=make_user(200), name="Скрытый", interests="Go", is_visible=False)
+
+    async def browse(self, seed):
+        """Пройти все анкеты, как обработчик просмотра, и вернуть их id по порядку"""
+        order = []
+        while (profile := await repository.next_profile_to_browse(self.viewer, seed)) is not None:
+            order.append(profile.id)
+            await repository.record_view(self.viewer, profile)
+        await repository.reset_views(self.viewer)
+        return order
+
+    def expected_order(self, seed):
+        return sorted((profile.id for profile in self.profiles), key=lambda pk: pk * seed % repository.BROWSE_MODULUS)
+
+    async def test_each_visible_profile_is_shown_once(self):
+        order = await self.browse(seed=12345)
+        self.assertCountEqual(order, [profile.id for profile in self.profiles])
+
+    async def test_seed_defines_permutation(self):
+        for seed in (1, 12345, repository.BROWSE_MODULUS - 1):
+            self.assertEqual(await self.browse(seed), self.expected_order(seed))
+        # Последний seed переворачивает порядок: id * (M - 1) = M - id по модулю M
+        self.assertEqual(self.expected_order(repository.BROWSE_MODULUS - 1), self.expected_order(1)[::-1])
+
+    async def test_order_survives_views_elsewhere(self):
+        seed = 987654321
+        expected = self.expected_order(seed)
+        # Анкета, просмотренная в другом сценарии, выпадает, остальные сохраняют порядок
+        await repository.record_view(self.viewer, self.profiles[0])
+        order = []
+        while (profile := await repository.next_profile_to_browse(self.viewer, seed)) is not None:
+            order.append(profile.id)
+            await repository.record_view(self.viewer, profile)
+        self.assertEqual(order, [pk for pk in expected if pk != self.profiles[0].id])
+
+
+class ResumeCursorTests(SimpleTestCase):
+    def read_all(self, cursor, recipients):
+        for pk, chat_id in recipients:
+            cursor.read(pk, chat_id)
+
+    def test_in_order_results_advance_after(self):
+        cursor = ResumeCursor()
+        self.read_all(cursor, [(1, 'a'), (2, 'b')])
+        cursor.done('a')
+        self.assertEqual(cursor.state(), {'after': 1, 'skip': []})
+        cursor.done('b')
+        self.assertEqual(cursor.state(), {'after': 2, 'skip': []})
+
+    def test_results_ahead_of_pending_are_skipped_on_resume(self):
+        cursor = ResumeCursor()
+        self.read_all(cursor, [(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd')])
+        cursor.done('a')
+        cursor.done('c')
+        cursor.done('d')
+        # b ещё отправляется: продолжать после 1, но c и d не повторять
+        self.assertEqual(cursor.state(), {'after': 1, 'skip': ['c', 'd']})
+        cursor.done('b')
+        self.assertEqual(cursor.state(), {'after': 4, 'skip': []})
+
+    def test_resumed_cursor_keeps_position(self):
+        # Позиция из payload задачи reminder_resume
+        state = {'after': 1, 'skip': ['c', 4]}
+        resumed = ResumeCursor(**state)
+        self.assertEqual(resumed.after, 1)
+        self.assertEqual(resumed.skip, {'c', '4'})
+        # Пропущенные получатели отмечаются обработанными при чтении, как в broadcast_reminders
+        self.read_all(resumed, [(2, 'b'), (3, 'c'), (4, 4)])
+        resumed.done('c')
+        resumed.done(4)
+        self.assertEqual(resumed.state(), {'after': 1, 'skip': ['c', '4']})
+        resumed.done('b')
+        self.assertEqual(resumed.state(), {'after': 4, 'skip': []})
+
+    def test_unknown_chat_is_ignored(self):
+        cursor = ResumeCursor(after=5)
+        cursor.done('x')
+        self.assertEqual(cursor.state(), {'after': 5, 'skip': []})
@@ -1,3 +1,34 @@
-from django.shortcuts import render
+import hmac
+import json
 
-# Create your views here.
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from app_core.bot.webhook import runtime, webhook_enabled
+
+
+@csrf_exempt
+@require_POST
+async def telegram_webhook(request):
+    """Приём апдейта Telegram в режиме webhook
+
+    Запрос без правильного заголовка X-Telegram-Bot-Api-Secret-Token
+    отклоняется. Апдейт обрабатывается в фоне, ответ возвращается сразу.
+    Во время остановки бота возвращается 503, и Telegram повторит апдейт позже.
+    """
+    if not webhook_enabled():
+        raise Http404
+    secret_token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(secret_token.encode(), settings.TELEGRAM_WEBHOOK_SECRET.encode()):
+        return HttpResponseForbidden()
+
+    await runtime.start()
+    if runtime.stopping:
+        return HttpResponse(status=503)
+    try:
+        runtime.feed(json.loads(request.body))
+    except ValueError:
+        return HttpResponseBadRequest()
+    return HttpResponse()
@@ -2,6 +2,8 @@
 ASGI config for pythonmeetup_service project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Lifespan events start and stop the Telegram bot in webhook mode, everything
+else is served by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pythonmeetup_service.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        from app_core.bot.webhook import lifespan
+        await lifespan(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
@@ -30,6 +30,74 @@ TELEGRAM_BOT_TOKEN = env.str('TELEGRAM_BOT_TOKEN')
 
 TELEGRAM_PAYMENTS_PROVIDER_TOKEN=env.str('TELEGRAM_PAYMENTS_PROVIDER_TOKEN')
 
+# Custom Bot API server (local telegram-bot-api or a stand-in); empty means api.telegram.org
+TELEGRAM_API_SERVER = env.str('TELEGRAM_API_SERVER', default='')
+
+# Shared Telegram HTTP client: one pooled keep-alive session per process
+TELEGRAM_CONNECTION_LIMIT = env.int('TELEGRAM_CONNECTION_LIMIT', default=50)
+TELEGRAM_KEEPALIVE_TIMEOUT = env.float('TELEGRAM_KEEPALIVE_TIMEOUT', default=60.0)
+
+# Webhook mode: Telegram POSTs updates to TELEGRAM_WEBHOOK_BASE_URL + TELEGRAM_WEBHOOK_PATH on the
+# project's ASGI app; requests without the secret token header are rejected. Empty secret disables it
+TELEGRAM_WEBHOOK_BASE_URL = env.str('TELEGRAM_WEBHOOK_BASE_URL', default='')
+TELEGRAM_WEBHOOK_PATH = env.str('TELEGRAM_WEBHOOK_PATH', default='telegram/webhook/')
+TELEGRAM_WEBHOOK_SECRET = env.str('TELEGRAM_WEBHOOK_SECRET', default='')
+
+# Broadcasts: Telegram allows roughly 30 messages per second per bot. The limit is enforced inside each
+# bot process; runbot --workers splits it between workers, other setups must split it by hand
+TELEGRAM_BROADCAST_RATE = env.float('TELEGRAM_BROADCAST_RATE', default=30.0)
+TELEGRAM_BROADCAST_CONCURRENCY = env.int('TELEGRAM_BROADCAST_CONCURRENCY', default=20)
+TELEGRAM_BROADCAST_MAX_RETRIES = env.int('TELEGRAM_BROADCAST_MAX_RETRIES', default=3)
+# Exponential backoff with jitter for transient errors (network, 5xx): base * 2 ** attempt, capped
+TELEGRAM_RETRY_BASE_DELAY = env.float('TELEGRAM_RETRY_BASE_DELAY', default=1.0)
+TELEGRAM_RETRY_MAX_DELAY = env.float('TELEGRAM_RETRY_MAX_DELAY', default=30.0)
+# Telegram throttles bursts to a single chat: about one message per second
+TELEGRAM_CHAT_RATE = env.float('TELEGRAM_CHAT_RATE', default=1.0)
+# Short bursts to one chat are allowed: this many messages go out back to back before pacing kicks in
+TELEGRAM_CHAT_BURST = env.int('TELEGRAM_CHAT_BURST', default=3)
+# Share of the rate limit bulk sends (broadcasts, reminders) may use; the rest is kept for replies
+TELEGRAM_BULK_SHARE = env.float('TELEGRAM_BULK_SHARE', default=0.8)
+TELEGRAM_SEND_STATS_INTERVAL = env.float('TELEGRAM_SEND_STATS_INTERVAL', default=60.0)
+RECIPIENT_CHUNK_SIZE = env.int('RECIPIENT_CHUNK_SIZE', default=1000)
+# Failed deliveries in a row ("chat not found" etc.) before a user is skipped by broadcasts
+DELIVERY_FAILURE_THRESHOLD = env.int('DELIVERY_FAILURE_THRESHOLD', default=3)
+
+# Background jobs (admin broadcasts): run by the leader bot process, or by runjobs while the bot is down
+JOB_POLL_INTERVAL = env.float('JOB_POLL_INTERVAL', default=2.0)
+JOB_PROGRESS_INTERVAL = env.float('JOB_PROGRESS_INTERVAL', default=1.0)
+JOB_STALE_AFTER = env.int('JOB_STALE_AFTER', default=300)
+
+# Event reminders: how often the scheduler picks up events edited in other processes
+REMINDER_RESYNC_INTERVAL = env.float('REMINDER_RESYNC_INTERVAL', default=300.0)
+# Only one bot process runs the scheduler; standby processes take over after the lease expires
+LEADER_LEASE_TTL = env.float('LEADER_LEASE_TTL', default=30.0)
+
+# Bot: FSM states are kept in the database ('db') so they survive restarts and are shared by all
+# bot processes; 'memory' keeps them in process memory. States idle longer than the TTL expire,
+# step-by-step flows (profile forms, browsing, questions) expire after the shorter session TTL
+FSM_STORAGE = env.str('FSM_STORAGE', default='db')
+FSM_STATE_TTL = env.int('FSM_STATE_TTL', default=86400)
+FSM_SESSION_TTL = env.int('FSM_SESSION_TTL', default=1800)
+
+# Bot: updates are sharded by sender across this many worker processes (runbot --workers);
+# each worker gets an equal share of TELEGRAM_BROADCAST_RATE
+BOT_WORKERS = env.int('BOT_WORKERS', default=1)
+# Bot: handlers for different chats run concurrently up to this limit; one chat's updates are serialized
+BOT_HANDLER_CONCURRENCY = env.int('BOT_HANDLER_CONCURRENCY', default=100)
+# Bot and job worker: on shutdown, running handlers and sends get this many seconds to finish;
+# sends still running after that are saved and resent after the restart
+BOT_SHUTDOWN_TIMEOUT = env.float('BOT_SHUTDOWN_TIMEOUT', default=25.0)
+
+# Bot: users resolved once per update and cached by Telegram id
+USER_CACHE_SIZE = env.int('USER_CACHE_SIZE', default=10000)
+USER_CACHE_TTL = env.float('USER_CACHE_TTL', default=60.0)
+# How often the bot drops cached users changed by other processes (admin), seconds
+USER_CACHE_SYNC_INTERVAL = env.float('USER_CACHE_SYNC_INTERVAL', default=5.0)
+
+# Networking: new profiles are announced as a periodic digest, at most once per cooldown per user
+NETWORKING_DIGEST_INTERVAL = env.float('NETWORKING_DIGEST_INTERVAL', default=300.0)
+NETWORKING_DIGEST_COOLDOWN = env.int('NETWORKING_DIGEST_COOLDOWN', default=3600)
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env.bool('DJANGO_DEBUG', default=True)
 
@@ -84,10 +152,18 @@ WSGI_APPLICATION = 'pythonmeetup_service.wsgi.application'
 DATABASES = {
     'default': env.dj_db_url(
         'DATABASE_URL',
-        default=f'sqlite:///{BASE_DIR / "db.sqlite3"}'
+        default=f'sqlite:///{BASE_DIR / "db.sqlite3"}',
+        conn_max_age=env.int('DB_CONN_MAX_AGE', default=0)
     )
 }
 
+# Bot: thread pool for DB transactions and bulk operations, each thread holds its own connection.
+# SQLite serializes writers, so there the pool defaults to a single thread
+DB_POOL_SIZE = env.int(
+    'DB_POOL_SIZE', default=1 if DATABASES['default']['ENGINE'].endswith('sqlite3') else 4
+)
+DB_POOL_STATS_INTERVAL = env.float('DB_POOL_STATS_INTERVAL', default=60.0)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,6 +202,10 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'static'
 
+# Uploaded files (broadcast attachments)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
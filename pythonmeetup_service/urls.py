@@ -14,9 +14,14 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
 
+from app_core.views import telegram_webhook
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-]
+    path(settings.TELEGRAM_WEBHOOK_PATH.lstrip('/'), telegram_webhook, name='telegram_webhook'),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)